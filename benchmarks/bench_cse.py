@@ -0,0 +1,57 @@
+# Times the CSE machine on recursive workloads. Compilation is timed apart
+# from evaluation, since a program is compiled once and then only evaluated.
+#
+#   python -m benchmarks.bench_cse [scale]
+import io
+import sys
+import time
+
+from src.cse_machine import Machine, compile_tree
+from src.parser import parse
+from src.standardizer import standardize
+
+FACTORIAL = """
+let rec f n = n eq 0 -> 1 | n * f (n - 1)
+within rec loop i = i eq 0 -> 0 | f 50 + loop (i - 1)
+in Print (loop {count} ge 0)
+"""
+
+FIBONACCI = """
+let rec fib n = n ls 2 -> n | fib (n - 1) + fib (n - 2)
+in Print (fib {count})
+"""
+
+LISTS = """
+let rec range (t, i, n) = i gr n -> t | range (t aug i, i + 1, n)
+and rec total (t, i) = i eq 0 -> 0 | t i + total (t, i - 1)
+in let t = range (nil, 1, {count}) in Print (total (t, Order t))
+"""
+
+STRINGS = """
+let rec count s = s eq '' -> 0 | (Stem s eq 'a' -> 1 | 0) + count (Stern s)
+in Print (count '{text}')
+"""
+
+
+def bench(name, template, count):
+    code = template.format(count=count, text="ab" * (count // 2))
+    start = time.perf_counter()
+    program = compile_tree(standardize(parse(code)))
+    compiled = time.perf_counter()
+    Machine(program, io.StringIO()).run()
+    finished = time.perf_counter()
+    print(
+        f"{name:>10} n={count:<6} compile {compiled - start:7.4f}s  "
+        f"run {finished - compiled:7.3f}s"
+    )
+
+
+def main(scale):
+    bench("factorial", FACTORIAL, 2000 * scale)
+    bench("fibonacci", FIBONACCI, 20 + scale)
+    bench("lists", LISTS, 20000 * scale)
+    bench("strings", STRINGS, 20000 * scale)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
@@ -0,0 +1,90 @@
+# Times lexing + parsing of large generated RPAL programs.
+#
+#   python -m benchmarks.bench_parser [scale]
+import os
+import sys
+import tempfile
+import time
+
+from src.incremental import Document
+from src.lexer import Lexer
+from src.parser import Parser
+
+DEFINITION = (
+    "let f{i} (a, b) = a eq 0 -> b | f{i} (a - 1, b * 2 + a ** 2) "
+    "where c{i} = not a < b & b ge 3 or (x aug 'str{i}') in\n"
+)
+
+
+def wide_program(count):
+    # A long chain of definitions; exercises every expression level
+    return "".join(DEFINITION.format(i=i) for i in range(count)) + "0\n"
+
+
+def deep_program(depth):
+    # Deep let chains, long conditional chains and long operator chains
+    return "let x = 1 in " * depth + "a -> b | " * depth + " + ".join(["x"] * depth)
+
+
+def bench(name, code):
+    lexer = Lexer(code, skip_comments=True)
+    start = time.perf_counter()
+    tokens = lexer.tokenize()
+    lexed = time.perf_counter()
+    Parser(tokens).parse()
+    parsed = time.perf_counter()
+    print(
+        f"{name:>6}: {len(code) / 1e6:6.2f} MB {len(tokens):>9} tokens  "
+        f"lex {lexed - start:6.3f}s  parse {parsed - lexed:6.3f}s  "
+        f"({len(tokens) / (parsed - lexed):,.0f} tokens/s)"
+    )
+
+
+def bench_file(name, code):
+    # Reading and decoding the file against mapping and scanning its bytes
+    with tempfile.NamedTemporaryFile("w", suffix=".rpal", delete=False) as source:
+        source.write(code)
+    try:
+        start = time.perf_counter()
+        with open(source.name, encoding="utf-8") as text:
+            read = Lexer(text.read(), skip_comments=True).tokenize_columnar()
+        middle = time.perf_counter()
+        mapped = Lexer(None, skip_comments=True).tokenize_mapped(source.name)
+        end = time.perf_counter()
+    finally:
+        os.unlink(source.name)
+    print(
+        f"{name:>6}: {len(mapped):>9} tokens  "
+        f"read {middle - start:6.3f}s  mapped {end - middle:6.3f}s"
+    )
+    assert len(read) == len(mapped)
+
+
+def bench_edits(name, code, count=100):
+    # Typing inside one definition of a large program, against parsing it all
+    document = Document(code)
+    offset = code.index("b * 2", len(code) // 2)
+    start = time.perf_counter()
+    for _ in range(count):
+        document.edit(offset, 1, "bb")
+        document.edit(offset, 2, "b")
+    edited = time.perf_counter()
+    Parser(Lexer(code, skip_comments=True).tokenize_columnar()).parse()
+    parsed = time.perf_counter()
+    print(
+        f"{name:>6}: edit {(edited - start) / (2 * count) * 1e3:7.3f}ms  "
+        f"full parse {(parsed - edited) * 1e3:9.3f}ms"
+    )
+
+
+def main(scale):
+    bench("wide", wide_program(2000 * scale))
+    bench("deep", deep_program(20000 * scale))
+    bench_file("file", wide_program(20000 * scale))
+    # Several sizes, so an edit whose cost grows with the program shows up
+    for count in (2000, 8000, 32000):
+        bench_edits(f"edit{count // 1000}k", wide_program(count * scale))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
@@ -0,0 +1,51 @@
+# Times standardization of deeply nested let/where chains of growing size and
+# reports the extra memory it allocates. Time per node should stay flat and
+# extra memory should stay a small constant number of bytes per node.
+#
+#   python -m benchmarks.bench_standardizer [scale]
+import sys
+import time
+import tracemalloc
+
+from src.parser import parse
+from src.standardizer import standardize
+
+
+def let_where_program(depth):
+    # A let chain whose definitions each contain a where
+    return "let x = y where y = 1 in " * depth + "x"
+
+
+def mixed_program(depth):
+    # Function forms, rec, and, within and @ under a let chain
+    return "let rec f a b = a @ g b and h = 2 within k (p, q) = p in " * depth + "f 1 2"
+
+
+def bench(name, code):
+    root = parse(code)
+    nodes = len(root.tree)
+    start = time.perf_counter()
+    standardize(root)
+    elapsed = time.perf_counter() - start
+    # Memory is measured on a second run, since tracing slows everything down
+    root = parse(code)
+    tracemalloc.start()
+    standardize(root)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:>10} {nodes:>9} nodes  {elapsed:7.3f}s  "
+        f"{elapsed / nodes * 1e9:6.0f} ns/node  "
+        f"peak extra {peak / nodes:6.1f} B/node"
+    )
+
+
+def main(scale):
+    for depth in (10000, 20000, 40000, 80000):
+        bench("let/where", let_where_program(depth * scale))
+    for depth in (5000, 10000, 20000, 40000):
+        bench("mixed", mixed_program(depth * scale))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
@@ -0,0 +1,278 @@
+# Times every pipeline stage on generated RPAL workloads and on the sample
+# programs, and compares throughput with a stored baseline.
+#
+#   python -m benchmarks.suite [--scale N] [--baseline FILE] [--update]
+#
+# Throughput is measured per stage: tokens/s for lexing, AST nodes/s for
+# parsing and standardizing, instructions/s for compiling and CSE steps/s
+# for evaluation. Each timed run is also measured against a fixed calibration
+# loop timed just before it, and the baseline keeps these relative rates, so
+# a machine that is faster, slower or busier as a whole does not move them.
+# With --baseline, a stage slower than the baseline by more than --tolerance
+# is a regression and the exit status is 1; --update writes the current
+# figures to the baseline file instead. A baseline from another machine
+# (see fingerprint) is still compared, but only as advice.
+import argparse
+import contextlib
+import gc
+import glob
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from src.cse_machine import Machine, compile_tree
+from src.lexer import Lexer
+from src.parser import Parser
+from src.profiling import Profiler, profile_source
+from src.standardizer import standardize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+MIN_SECONDS = 0.5
+
+# Iterations of the calibration loop timed before each run
+CALIBRATION_STEPS = 20000
+
+# stage -> (count the rate is measured in, unit)
+RATES = {
+    "lex": ("tokens", "tokens/s"),
+    "parse": ("ast_nodes", "nodes/s"),
+    "standardize": ("standardized_nodes", "nodes/s"),
+    "compile": ("instructions", "instr/s"),
+    "evaluate": ("cse_steps", "steps/s"),
+}
+
+
+def token_stream(scale):
+    # One long expression: many tokens, little nesting
+    terms = " + ".join(f"x * {i}" for i in range(20000 * scale))
+    return f"let x = 1 in Print ({terms})"
+
+
+def nested_definitions(scale):
+    return "let x = y where y = 1 in " * (2000 * scale) + "Print x"
+
+
+def wide_tuples(scale):
+    items = ", ".join(str(i) for i in range(20000 * scale))
+    return f"let t = ({items}) in Print (Order t, t 1, t (Order t))"
+
+
+def deep_recursion(scale):
+    return (
+        "let rec sum n = n eq 0 -> 0 | n + sum (n - 1)"
+        f" in Print (sum {50000 * scale})"
+    )
+
+
+def tail_recursion(scale):
+    return (
+        "let rec loop (n, total) = n eq 0 -> total | loop (n - 1, total + n)"
+        f" in Print (loop ({100000 * scale}, 0))"
+    )
+
+
+def strings(scale):
+    text = "abc" * (3000 * scale)
+    return (
+        "let rec count (s, c) = s eq '' -> 0"
+        " | (Stem s eq c -> 1 | 0) + count (Stern s, c)"
+        " and rec double s = s eq '' -> '' | Conc (Stem s) (Conc (Stem s) (double (Stern s)))"
+        f" in let s = '{text}' in Print (count (s, 'a'), Order (nil aug double 'xyz'))"
+    )
+
+
+def lists(scale):
+    return (
+        "let rec build (t, n) = n eq 0 -> t | build (t aug n, n - 1)"
+        " and rec total (t, i) = i eq 0 -> 0 | t i + total (t, i - 1)"
+        f" in let t = build (nil, {50000 * scale}) in Print (total (t, Order t))"
+    )
+
+
+GENERATED = {
+    "tokens": token_stream,
+    "let/where": nested_definitions,
+    "tuples": wide_tuples,
+    "recursion": deep_recursion,
+    "tail calls": tail_recursion,
+    "strings": strings,
+    "lists": lists,
+}
+
+
+def workloads(scale):
+    for name, generate in GENERATED.items():
+        yield name, generate(scale)
+    for path in sorted(glob.glob(os.path.join(ROOT, "samples", "*.rpal"))):
+        with open(path, encoding="utf-8") as source:
+            yield os.path.basename(path), source.read()
+
+
+def measure(code, repeat):
+    # Stage rates from the best of several timed runs, with the counts from
+    # one run with machine counters, and the stage rates relative to the
+    # calibration loop. The front end and the machine are timed apart: a long
+    # evaluation leaves caches cold for the next lex, which would swamp the
+    # times of small programs. Small programs are repeated until MIN_SECONDS
+    # have passed, so their best time is not timer noise.
+    counts = profile_source(code, io.StringIO(), profiler=Profiler(False)).counts
+    best = {}
+    # stage -> rate of each run over the calibration rate just before it;
+    # the machine may change speed between runs, but hardly within one
+    relative = {stage: [] for stage in RATES}
+
+    def record(profiler, calibration):
+        for event in profiler.events:
+            best[event.name] = min(best.get(event.name, event.seconds), event.seconds)
+            rate = counts[RATES[event.name][0]] / max(event.seconds, 1e-9)
+            relative[event.name].append(rate / calibration)
+
+    runs = 0
+    start = time.perf_counter()
+    while runs < repeat or time.perf_counter() - start < MIN_SECONDS:
+        runs += 1
+        profiler = Profiler(trace_memory=False)
+        with _collected():
+            calibration = calibrate()
+            with profiler.phase("lex"):
+                tokens = Lexer(code, skip_comments=True).tokenize()
+            with profiler.phase("parse"):
+                tree = Parser(tokens).parse()
+            with profiler.phase("standardize"):
+                tree = standardize(tree)
+            with profiler.phase("compile"):
+                program = compile_tree(tree)
+        record(profiler, calibration)
+
+    runs = 0
+    start = time.perf_counter()
+    while runs < repeat or time.perf_counter() - start < MIN_SECONDS:
+        runs += 1
+        profiler = Profiler(trace_memory=False)
+        machine = Machine(program, io.StringIO())
+        with _collected():
+            calibration = calibrate()
+            with profiler.phase("evaluate"):
+                machine.run()
+        record(profiler, calibration)
+
+    rates = {
+        stage: counts[count] / max(best[stage], 1e-9)
+        for stage, (count, _) in RATES.items()
+    }
+    return rates, {stage: statistics.median(relative[stage]) for stage in RATES}
+
+
+def calibrate():
+    # Iterations/s of a fixed loop doing the kind of work the interpreter
+    # does: tuples pushed and popped, integer tests and dictionary lookups
+    start = time.perf_counter()
+    _calibration_loop(CALIBRATION_STEPS)
+    return CALIBRATION_STEPS / max(time.perf_counter() - start, 1e-9)
+
+
+def _calibration_loop(steps):
+    stack = []
+    table = {}
+    for step in range(steps):
+        stack.append((step & 7, step))
+        op, value = stack.pop()
+        if op == 3:
+            table[value & 255] = value
+        else:
+            table.get(value & 255)
+
+
+def fingerprint():
+    # The machine and Python a baseline was recorded with
+    return " ".join(
+        (
+            platform.system(),
+            platform.machine(),
+            platform.python_implementation(),
+            platform.python_version(),
+            f"{os.cpu_count()} cpus",
+        )
+    )
+
+
+@contextlib.contextmanager
+def _collected():
+    # Like timeit, collect garbage before a timed run and not during it
+    gc.collect()
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.enable()
+
+
+def compare(results, baseline, tolerance):
+    # Stages whose relative rate fell below (1 - tolerance) of the baseline
+    regressions = []
+    for name, rates in results.items():
+        for stage, rate in rates.items():
+            expected = baseline.get(name, {}).get(stage)
+            if expected and rate < expected * (1 - tolerance):
+                regressions.append((name, stage, rate, expected))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks.suite")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", metavar="FILE")
+    parser.add_argument("--update", action="store_true", help="rewrite the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    header = "".join(f"{stage:>14}" for stage in RATES)
+    print(f"{'workload':<16}{header}")
+    print(f"{'':<16}" + "".join(f"{unit:>14}" for _, unit in RATES.values()))
+    results = {}
+    for name, code in workloads(args.scale):
+        rates, results[name] = measure(code, args.repeat)
+        print(f"{name:<16}" + "".join(f"{rates[stage]:>14,.0f}" for stage in RATES))
+
+    if not args.baseline:
+        return 0
+    if args.update:
+        with open(args.baseline, "w") as output:
+            rates = {
+                name: {stage: float(f"{rate:.4g}") for stage, rate in stages.items()}
+                for name, stages in results.items()
+            }
+            baseline = {"scale": args.scale, "machine": fingerprint(), "rates": rates}
+            json.dump(baseline, output, indent=2)
+            output.write("\n")
+        print(f"\nbaseline written to {args.baseline}")
+        return 0
+    with open(args.baseline) as source:
+        baseline = json.load(source)
+    if baseline.get("scale") != args.scale:
+        print(f"\nbaseline was recorded at scale {baseline.get('scale')}")
+        return 1
+    regressions = compare(results, baseline["rates"], args.tolerance)
+    for name, stage, rate, expected in regressions:
+        print(f"REGRESSION {name} {stage}: {rate / expected - 1:+.0%} against baseline")
+    if not regressions:
+        print(f"\nno stage slower than the baseline by more than {args.tolerance:.0%}")
+        return 0
+    if baseline.get("machine") != fingerprint():
+        print(
+            f"\nthe baseline was recorded on {baseline.get('machine')}, not on"
+            f" {fingerprint()}; regressions are advisory"
+        )
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
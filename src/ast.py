@@ -0,0 +1,315 @@
+from array import array
+
+# Node type codes. A tree stores one code per node; LABELS maps a code back to
+# the label printed by -ast and -st.
+IDENTIFIER = 0
+INTEGER = 1
+STRING = 2
+TRUE = 3
+FALSE = 4
+NIL = 5
+DUMMY = 6
+YSTAR = 7
+EMPTY = 8
+LET = 9
+LAMBDA = 10
+WHERE = 11
+TAU = 12
+AUG = 13
+CONDITIONAL = 14
+OR = 15
+AMPERSAND = 16
+NOT = 17
+GR = 18
+GE = 19
+LS = 20
+LE = 21
+EQ = 22
+NE = 23
+PLUS = 24
+MINUS = 25
+NEG = 26
+MULTIPLY = 27
+DIVIDE = 28
+POWER = 29
+AT = 30
+GAMMA = 31
+EQUAL = 32
+WITHIN = 33
+AND = 34
+REC = 35
+FUNCTION_FORM = 36
+COMMA = 37
+# Placeholder for input a recovering parse skipped
+ERROR = 38
+
+LABELS = (
+    "identifier",
+    "integer",
+    "string",
+    "true",
+    "false",
+    "nil",
+    "dummy",
+    "Y*",
+    "()",
+    "let",
+    "lambda",
+    "where",
+    "tau",
+    "aug",
+    "->",
+    "or",
+    "&",
+    "not",
+    "gr",
+    "ge",
+    "ls",
+    "le",
+    "eq",
+    "ne",
+    "+",
+    "-",
+    "neg",
+    "*",
+    "/",
+    "**",
+    "@",
+    "gamma",
+    "=",
+    "within",
+    "and",
+    "rec",
+    "function_form",
+    ",",
+    "error",
+)
+
+CODES = {label: code for code, label in enumerate(LABELS)}
+
+# Leaf codes that carry a token value, and how they are printed
+VALUE_LEAVES = {IDENTIFIER: "ID", INTEGER: "INT", STRING: "STR"}
+
+# Leaf codes printed in angle brackets without a value
+PLAIN_LEAVES = frozenset((TRUE, FALSE, NIL, DUMMY, YSTAR, ERROR))
+
+# Index used for a missing child or sibling
+NONE = -1
+
+_DISPLAY_ESCAPES = str.maketrans({"\\": "\\\\", "\n": "\\n", "\t": "\\t", "'": "\\'"})
+
+
+class AST:
+    # Flat tree storage. Node i is described by kinds[i], values[i],
+    # first_child[i] and next_sibling[i]; children form a singly linked list
+    # through next_sibling. Nodes are never freed, so passes can rewire links
+    # in place and reuse nodes.
+    def __init__(self):
+        self.kinds = array("B")
+        self.values = []
+        self.first_child = array("l")
+        self.next_sibling = array("l")
+        self.root = NONE
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def add(self, kind, children=(), value=None):
+        # Children must be roots of their own (not yet attached) subtrees
+        index = len(self.kinds)
+        self.kinds.append(kind)
+        self.values.append(value)
+        self.next_sibling.append(NONE)
+        self.first_child.append(self._link(children))
+        return index
+
+    def _link(self, children):
+        next_sibling = self.next_sibling
+        first = previous = NONE
+        for child in children:
+            if previous == NONE:
+                first = child
+            else:
+                next_sibling[previous] = child
+            previous = child
+        if previous != NONE:
+            next_sibling[previous] = NONE
+        return first
+
+    def children(self, index):
+        result = []
+        child = self.first_child[index]
+        next_sibling = self.next_sibling
+        while child != NONE:
+            result.append(child)
+            child = next_sibling[child]
+        return result
+
+    def set_children(self, index, children):
+        self.first_child[index] = self._link(children)
+
+    def node(self, index=None):
+        return Node(self, self.root if index is None else index)
+
+    def preorder(self, start=None):
+        # Node indices of a subtree in pre-order. The next sibling is pushed
+        # before the first child, so the child's subtree is finished first.
+        if start is None:
+            start = self.root
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        yield start
+        stack = []
+        child = first_child[start]
+        if child != NONE:
+            stack.append(child)
+        while stack:
+            index = stack.pop()
+            yield index
+            sibling = next_sibling[index]
+            if sibling != NONE:
+                stack.append(sibling)
+            child = first_child[index]
+            if child != NONE:
+                stack.append(child)
+
+    def postorder(self, start=None):
+        # Node indices of a subtree in post-order, children before parents.
+        # Visiting each node before its children taken right to left gives
+        # the reverse of post-order.
+        if start is None:
+            start = self.root
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        order = array("l")
+        stack = [start]
+        while stack:
+            index = stack.pop()
+            order.append(index)
+            child = first_child[index]
+            while child != NONE:
+                stack.append(child)
+                child = next_sibling[child]
+        order.reverse()
+        return order
+
+    def copy(self, start=None):
+        # Copy the subtree at start (the whole tree by default) into a new,
+        # compact AST whose root is the copy of start
+        if start is None:
+            start = self.root
+        tree = AST()
+        kinds = self.kinds
+        values = self.values
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        order = array("l", self.preorder(start))
+        # Old index -> new index. Links to nodes outside the subtree (such as
+        # the siblings of start) and the spare last slot, which is what
+        # mapping[NONE] reads, stay NONE.
+        mapping = array("l", [NONE]) * (len(kinds) + 1)
+        for new, old in enumerate(order):
+            mapping[old] = new
+            tree.kinds.append(kinds[old])
+            tree.values.append(values[old])
+        for old in order:
+            tree.first_child.append(mapping[first_child[old]])
+            tree.next_sibling.append(mapping[next_sibling[old]])
+        tree.root = 0
+        return tree
+
+    def format(self, start=None):
+        # Pre-order listing with one leading dot per level, as printed by -ast
+        if start is None:
+            start = self.root
+        kinds = self.kinds
+        values = self.values
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        lines = []
+        nodes = [start]
+        depths = [0]
+        while nodes:
+            index = nodes.pop()
+            depth = depths.pop()
+            lines.append("." * depth + node_text(kinds[index], values[index]))
+            if index != start:
+                sibling = next_sibling[index]
+                if sibling != NONE:
+                    nodes.append(sibling)
+                    depths.append(depth)
+            child = first_child[index]
+            if child != NONE:
+                nodes.append(child)
+                depths.append(depth + 1)
+        return "\n".join(lines)
+
+
+class Node:
+    # Lightweight view of one node of an AST, for code that prefers objects
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def kind(self):
+        return self.tree.kinds[self.index]
+
+    @kind.setter
+    def kind(self, kind):
+        self.tree.kinds[self.index] = kind
+
+    @property
+    def label(self):
+        return LABELS[self.tree.kinds[self.index]]
+
+    @property
+    def value(self):
+        return self.tree.values[self.index]
+
+    @value.setter
+    def value(self, value):
+        self.tree.values[self.index] = value
+
+    @property
+    def children(self):
+        tree = self.tree
+        return [Node(tree, child) for child in tree.children(self.index)]
+
+    @children.setter
+    def children(self, children):
+        self.tree.set_children(self.index, [child.index for child in children])
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Node)
+            and self.tree is other.tree
+            and self.index == other.index
+        )
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    def __str__(self):
+        return node_text(self.kind, self.value)
+
+    def __repr__(self):
+        return f"Node({self.label!r}, {self.value!r}, index={self.index})"
+
+
+def node_text(kind, value):
+    leaf = VALUE_LEAVES.get(kind)
+    if leaf is not None:
+        if kind == STRING:
+            # String values are stored unescaped; print them as written
+            value = "'" + value[1:-1].translate(_DISPLAY_ESCAPES) + "'"
+        return f"<{leaf}:{value}>"
+    if kind in PLAIN_LEAVES:
+        return f"<{LABELS[kind]}>"
+    return LABELS[kind]
+
+
+def format_tree(node):
+    return node.tree.format(node.index)
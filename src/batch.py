@@ -0,0 +1,91 @@
+import io
+import os
+import sys
+from functools import partial
+
+from src.cache import compile_source
+from src.cse_machine import Machine
+
+EXTENSION = ".rpal"
+
+
+class Result:
+    # What one program of a batch printed, and the error that stopped it
+    def __init__(self, path, output, error=None):
+        self.path = path
+        self.output = output
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def find_programs(paths):
+    # Files are taken as given; directories contribute every .rpal file
+    # below them, in sorted order
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, subdirectories, names in os.walk(path):
+            subdirectories.sort()
+            for name in sorted(names):
+                if name.endswith(EXTENSION):
+                    yield os.path.join(directory, name)
+
+
+def read_paths(stream):
+    # Newline-delimited paths, as produced by find or ls
+    for line in stream:
+        path = line.strip()
+        if path:
+            yield path
+
+
+def run_program(path, cache_dir=None, memo_size=0, level=0):
+    # Any failure is caught and reported in the result, so one bad program
+    # never stops the rest of a batch
+    output = io.StringIO()
+    try:
+        with open(path, "rb") as source:
+            data = source.read()
+        program = compile_source(data, cache_dir, level)
+        Machine(program, output, memo_size).run()
+    except Exception as error:
+        return Result(path, _finish(output.getvalue()), str(error) or repr(error))
+    return Result(path, _finish(output.getvalue()))
+
+
+def _finish(text):
+    # Output ends with a newline if the program printed anything
+    return text + "\n" if text else text
+
+
+def run_batch(paths, jobs=1, cache_dir=None, memo_size=0, level=0):
+    # Results in the order of paths. With jobs > 1 programs run in a pool of
+    # worker processes; map keeps the order whatever finishes first.
+    run = partial(run_program, cache_dir=cache_dir, memo_size=memo_size, level=level)
+    if jobs <= 1:
+        for path in paths:
+            yield run(path)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(run, paths)
+
+
+def write_results(results, stream=None):
+    # One block per program, headed by its path; returns the number of
+    # programs that failed
+    stream = stream or sys.stdout
+    failed = 0
+    for result in results:
+        stream.write(f"==> {result.path} <==\n")
+        stream.write(result.output)
+        if not result.ok:
+            stream.write(f"Error: {result.error}\n")
+            failed += 1
+        stream.flush()
+    return failed
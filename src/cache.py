@@ -0,0 +1,153 @@
+import hashlib
+import marshal
+import os
+import sys
+
+from src.cse_machine import Code, Program
+
+# Compiled programs are stored as MAGIC followed by a marshal dump of
+# (key, codes). Programs are plain data (opcodes, ints, strings, tuples and
+# lists), which marshal reads back far faster than re-running the front end.
+MAGIC = b"RPALC\x01"
+
+# Modules whose code decides what a program compiles to. Their contents are
+# part of every key, so editing the interpreter invalidates old entries.
+_FRONT_END = (
+    "lexer.py",
+    "parser.py",
+    "ast.py",
+    "standardizer.py",
+    "optimizer.py",
+    "cse_machine.py",
+)
+
+_version = None
+
+
+def default_directory():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "rpal")
+
+
+def interpreter_version():
+    # Hash of the front end sources and the Python build that reads the file
+    global _version
+    if _version is None:
+        digest = hashlib.sha256()
+        digest.update(sys.implementation.cache_tag.encode())
+        digest.update(str(marshal.version).encode())
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in _FRONT_END:
+            with open(os.path.join(directory, name), "rb") as source:
+                digest.update(source.read())
+        _version = digest.hexdigest()
+    return _version
+
+
+def source_key(source, level=0):
+    # source is the program as bytes, compiled at optimization level
+    digest = hashlib.sha256(interpreter_version().encode())
+    if level:
+        digest.update(b"-O%d" % level)
+    digest.update(source)
+    return digest.hexdigest()
+
+
+class ProgramCache:
+    # One file per key in directory. Every failure to read an entry counts
+    # as a miss and every failure to write one is ignored, so a damaged or
+    # unwritable cache only costs the time of compiling again.
+    def __init__(self, directory=None):
+        self.directory = directory or default_directory()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".rpalc")
+
+    def load(self, key):
+        try:
+            with open(self.path(key), "rb") as entry:
+                data = entry.read()
+        except OSError:
+            return None
+        if not data.startswith(MAGIC):
+            return None
+        try:
+            stored_key, codes = marshal.loads(data[len(MAGIC) :])
+            if stored_key != key:
+                return None
+            return program_from_codes(codes)
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    def store(self, key, program):
+        try:
+            data = MAGIC + marshal.dumps((key, program_codes(program)))
+        except ValueError:
+            # Nesting deeper than marshal supports
+            return False
+        path = self.path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written under a temporary name and renamed, so readers never
+            # see a partial file
+            import tempfile
+
+            handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(handle, "wb") as entry:
+                    entry.write(data)
+                os.replace(temporary, path)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+        except OSError:
+            return False
+        return True
+
+
+def compile_source(data, cache_dir=None, level=0):
+    # Compile the program in data (bytes) through the cache in cache_dir;
+    # None disables the cache and "" selects the default directory. level
+    # is the optimization level of myrpal -O. The front end is only
+    # imported when there is something to compile.
+    if cache_dir is None:
+        return _compile(data, level)
+    cache = ProgramCache(cache_dir)
+    key = source_key(data, level)
+    program = cache.load(key)
+    if program is None:
+        program = _compile(data, level)
+        cache.store(key, program)
+    return program
+
+
+def _compile(data, level=0):
+    from src.cse_machine import compile_tree
+    from src.parser import parse
+    from src.standardizer import standardize
+
+    tree = standardize(parse(data.decode("utf-8")))
+    if level:
+        from src.optimizer import optimize
+
+        tree = optimize(tree, level)
+    return compile_tree(tree)
+
+
+def program_codes(program):
+    # The program as plain data (lists, tuples, ints and strings)
+    return [
+        (code.index, code.names, code.arity, code.instructions)
+        for code in program.codes
+    ]
+
+
+def program_from_codes(codes):
+    result = []
+    for index, names, arity, instructions in codes:
+        code = Code(index, names, arity)
+        code.instructions = instructions
+        result.append(code)
+    return Program(result)
@@ -0,0 +1,1033 @@
+import operator
+import sys
+from array import array
+from collections import OrderedDict
+
+from src import ast
+
+# RPAL integers have arbitrary precision, but Python refuses to convert one of
+# more than sys.get_int_max_str_digits() digits to or from text. Long integers
+# are converted in pieces of _DIGITS digits, below the smallest limit Python
+# allows, so the interpreter works whatever the limit and leaves it alone.
+_DIGITS = 600
+_PIECE = 10**_DIGITS
+
+# Opcodes. An instruction is an (opcode, argument) pair; a control structure
+# is a list of instructions stored in reverse, so it can be pushed onto the
+# control stack with a single extend and executed by popping.
+PUSH = 0  # value
+LOAD_LOCAL = 1  # slot in the current frame
+LOAD = 2  # (depth, slot)
+LAMBDA = 3  # index of the control structure of the body
+GAMMA = 4
+TAU = 5  # number of elements
+BETA = 6  # (then branch, else branch), both reversed instruction lists
+RESTORE = 7  # environment to return to; only created at run time
+UNBOUND = 8  # identifier name
+BUILTIN = 9  # name; replaced by PUSH when a program is linked
+ADD = 10
+SUBTRACT = 11
+MULTIPLY = 12
+DIVIDE = 13
+POWER = 14
+GR = 15
+GE = 16
+LS = 17
+LE = 18
+EQ = 19
+NE = 20
+OR = 21
+AND = 22
+AUG = 23
+NEG = 24
+NOT = 25
+TIE = 26  # frame of a recursive tuple definition; only created at run time
+MEMO = 27  # (cache key, Print count at the call); only created at run time
+
+_BINARY = {
+    ast.PLUS: ADD,
+    ast.MINUS: SUBTRACT,
+    ast.MULTIPLY: MULTIPLY,
+    ast.DIVIDE: DIVIDE,
+    ast.POWER: POWER,
+    ast.GR: GR,
+    ast.GE: GE,
+    ast.LS: LS,
+    ast.LE: LE,
+    ast.EQ: EQ,
+    ast.NE: NE,
+    ast.OR: OR,
+    ast.AMPERSAND: AND,
+    ast.AUG: AUG,
+}
+
+_UNARY = {ast.NEG: NEG, ast.NOT: NOT}
+
+_CONSTANTS = {ast.TRUE: True, ast.FALSE: False, ast.NIL: ()}
+
+_GAMMA = (GAMMA, None)
+
+# Nodes compiled to a single instruction of their own
+_LEAVES = frozenset(
+    (ast.IDENTIFIER, ast.INTEGER, ast.STRING, ast.DUMMY, ast.YSTAR, *_CONSTANTS)
+)
+
+# Default number of results kept by the memoization cache
+MEMO_SIZE = 100000
+
+
+class CSEError(Exception):
+    pass
+
+
+class Code:
+    # One control structure: the body of a lambda (or the whole program for
+    # index 0) and the names it binds. arity is 1 for a single variable, the
+    # number of names for a tuple of variables and 0 for '()'.
+    __slots__ = ("index", "names", "arity", "instructions")
+
+    def __init__(self, index, names, arity):
+        self.index = index
+        self.names = names
+        self.arity = arity
+        self.instructions = []
+
+
+class Program:
+    # Compiled control structures; codes[0] is the program itself
+    def __init__(self, codes):
+        self.codes = codes
+
+
+class Compiler:
+    # Flattens a standardized tree into control structures in one pre-order
+    # walk with an explicit stack. Emitting a node before its children, in
+    # their natural order, yields each structure already reversed. Variables
+    # are resolved to (depth, slot) here, so the machine never searches
+    # environments by name.
+    _NODE = 0
+    _ENTER = 1
+    _EXIT = 2
+
+    def __init__(self, tree):
+        self.tree = tree
+
+    def compile(self, root=None):
+        tree = self.tree
+        if root is None:
+            root = tree.root
+        kinds = tree.kinds
+        codes = [Code(0, (), 0)]
+        # name -> stack of (lambda level, slot) for the bindings in scope
+        scopes = {}
+        level = 0
+        work = [(self._NODE, root, codes[0].instructions)]
+
+        while work:
+            tag, node, out = work.pop()
+            if tag == self._ENTER:
+                level += 1
+                _enter_scope(scopes, node, level)
+                continue
+            if tag == self._EXIT:
+                level -= 1
+                _exit_scope(scopes, node)
+                continue
+
+            kind = kinds[node]
+            if kind == ast.LAMBDA:
+                self._lambda(node, codes, out, work)
+            elif kind == ast.CONDITIONAL:
+                self._conditional(node, out, work)
+            elif kind in _LEAVES:
+                out.append(self._leaf(node, scopes, level))
+            else:
+                out.append(self._operation(node))
+                for child in reversed(tree.children(node)):
+                    work.append((self._NODE, child, out))
+
+        return Program(codes)
+
+    def _lambda(self, node, codes, out, work):
+        # Compile the body into a new Code, with the parameters bound
+        tree = self.tree
+        parameter = tree.first_child[node]
+        body = tree.next_sibling[parameter]
+        names, arity = self._parameters(parameter)
+        # The optimizer numbers lambdas as they were before it ran, so
+        # closures print the same numbers; the structures of the lambdas it
+        # dropped are left empty
+        number = tree.values[node]
+        if number is not None:
+            # Numbers only grow in the order lambdas are compiled
+            while len(codes) < number:
+                codes.append(Code(len(codes), (), 0))
+        code = Code(len(codes), names, arity)
+        codes.append(code)
+        out.append((LAMBDA, code.index))
+        work.append((self._EXIT, names, None))
+        work.append((self._NODE, body, code.instructions))
+        work.append((self._ENTER, names, None))
+
+    def _conditional(self, node, out, work):
+        # The condition, then a BETA holding both branches
+        condition = self.tree.first_child[node]
+        consequent = self.tree.next_sibling[condition]
+        alternative = self.tree.next_sibling[consequent]
+        then_branch = []
+        else_branch = []
+        out.append((BETA, (then_branch, else_branch)))
+        work.append((self._NODE, alternative, else_branch))
+        work.append((self._NODE, consequent, then_branch))
+        work.append((self._NODE, condition, out))
+
+    def _leaf(self, node, scopes, level):
+        kind = self.tree.kinds[node]
+        value = self.tree.values[node]
+        if kind == ast.IDENTIFIER:
+            bindings = scopes.get(value)
+            if bindings:
+                binding_level, slot = bindings[-1]
+                depth = level - binding_level
+                if depth == 0:
+                    return LOAD_LOCAL, slot
+                return LOAD, (depth, slot)
+            if value in BUILTINS:
+                return BUILTIN, value
+            return UNBOUND, value
+        if kind == ast.INTEGER:
+            return PUSH, parse_integer(value)
+        if kind == ast.STRING:
+            return PUSH, value[1:-1]
+        if kind in _CONSTANTS:
+            return PUSH, _CONSTANTS[kind]
+        return BUILTIN, ast.LABELS[kind]
+
+    def _operation(self, node):
+        # The instruction that follows the operands of node
+        kind = self.tree.kinds[node]
+        if kind == ast.GAMMA:
+            return _GAMMA
+        if kind == ast.TAU:
+            return TAU, len(self.tree.children(node))
+        if kind in _BINARY:
+            return _BINARY[kind], None
+        if kind in _UNARY:
+            return _UNARY[kind], None
+        raise CSEError(f"Cannot evaluate '{ast.LABELS[kind]}'")
+
+    def _parameters(self, index):
+        tree = self.tree
+        kind = tree.kinds[index]
+        if kind == ast.IDENTIFIER:
+            return (tree.values[index],), 1
+        if kind == ast.EMPTY:
+            return (), 0
+        names = tuple(tree.values[child] for child in tree.children(index))
+        return names, len(names)
+
+
+def _enter_scope(scopes, names, level):
+    # Parameters of the lambda at level take slots 1, 2, ...
+    for slot, name in enumerate(names, 1):
+        scopes.setdefault(name, []).append((level, slot))
+
+
+def _exit_scope(scopes, names):
+    for name in names:
+        scopes[name].pop()
+
+
+# Run-time values. Integers and truth values are plain Python int and bool,
+# converted once when the program is compiled or linked; strings and tuples
+# are the String and Tuple views below, with nil as the empty Tuple.
+
+
+# Range of the integers an integer tuple can hold
+_INT_MIN = -(1 << 63)
+_INT_MAX = (1 << 63) - 1
+
+
+class Tuple:
+    # The first length items of a list. aug appends to the list in place when
+    # this tuple is its longest view, so a list built by repeated aug shares
+    # one list between all its prefixes and costs O(n) in total. An aug on
+    # any other view copies its items first.
+    #
+    # A tuple built by aug from nil keeps its items in an array("q") while
+    # they are all integers that fit in 64 bits: 8 bytes per element instead
+    # of a pointer and an int object, and a buffer that Sum and Map hand to
+    # numpy whole. The first other value appended converts the items to a
+    # list. A tuple literal starts as a list, since checking its values would
+    # slow every one down; packed() converts it when Sum or Map asks. Either
+    # way the items index, slice and iterate alike, so nothing outside this
+    # class needs to know which it has.
+    __slots__ = ("items", "length")
+
+    def __init__(self, items, length=None):
+        self.items = items
+        self.length = len(items) if length is None else length
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(self.values())
+
+    def values(self):
+        items = self.items
+        return items if len(items) == self.length else items[: self.length]
+
+    def packed(self):
+        # The items, in an array("q") if they are all integers that fit in 64
+        # bits. The tuple keeps the array, so only the first call pays.
+        items = self.values()
+        if type(items) is list:
+            array_items = _integer_array(items)
+            if array_items is not None:
+                self.items = items = array_items
+        return items
+
+    def aug(self, value):
+        items = self.items
+        length = self.length
+        integer = type(value) is int and _INT_MIN <= value <= _INT_MAX
+        if not length:
+            items = array("q") if integer else []
+        elif len(items) != length:
+            items = items[:length]
+        if not integer and type(items) is array:
+            items = items.tolist()
+        items.append(value)
+        return Tuple(items, length + 1)
+
+    def __eq__(self, other):
+        if type(other) is not Tuple:
+            return NotImplemented
+        if self.length != other.length:
+            return False
+        values = self.values()
+        others = other.values()
+        if type(values) is not type(others):
+            # An array never equals a list
+            return list(values) == list(others)
+        return values == others
+
+    def __hash__(self):
+        return hash(tuple(self.values()))
+
+    def __repr__(self):
+        return f"Tuple({self.values()!r})"
+
+
+NIL = Tuple([], 0)
+
+
+class String:
+    # text[start:]. Stern only moves start, so walking a string one
+    # character at a time never copies it.
+    __slots__ = ("text", "start")
+
+    def __init__(self, text, start=0):
+        self.text = text
+        self.start = start
+
+    def __str__(self):
+        return self.text[self.start :] if self.start else self.text
+
+    def __len__(self):
+        return len(self.text) - self.start
+
+    def __eq__(self, other):
+        if type(other) is not String:
+            return NotImplemented
+        # Lengths differ in most failed comparisons, such as s eq ''
+        if len(self) != len(other):
+            return False
+        return self.text.startswith(str(other), self.start)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __repr__(self):
+        return f"String({str(self)!r})"
+
+
+class Closure:
+    __slots__ = ("code", "env")
+
+    def __init__(self, code, env):
+        self.code = code
+        self.env = env
+
+
+class Eta:
+    # Result of Y* applied to a lambda whose body is not itself a lambda
+    __slots__ = ("closure",)
+
+    def __init__(self, closure):
+        self.closure = closure
+
+
+class Builtin:
+    # A primitive function, possibly with some curried arguments collected
+    __slots__ = ("name", "function", "arity", "args")
+
+    def __init__(self, name, function, arity, args=()):
+        self.name = name
+        self.function = function
+        self.arity = arity
+        self.args = args
+
+    def apply(self, argument):
+        args = self.args + (argument,)
+        if len(args) < self.arity:
+            return Builtin(self.name, self.function, self.arity, args)
+        return self.function(*args)
+
+
+class _Dummy:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "dummy"
+
+
+DUMMY = _Dummy()
+
+
+def _is_function(value):
+    return type(value) in (Closure, Eta, Builtin)
+
+
+def _expect(test, message):
+    if not test:
+        raise CSEError(message)
+
+
+def _conc(left, right):
+    _expect(type(left) is String and type(right) is String, "Conc expects two strings")
+    return String(str(left) + str(right))
+
+
+def _stem(value):
+    _expect(type(value) is String, "Stem expects a string")
+    start = value.start
+    return String(value.text[start : start + 1])
+
+
+def _stern(value):
+    _expect(type(value) is String, "Stern expects a string")
+    text = value.text
+    return String(text, min(value.start + 1, len(text)))
+
+
+def _order(value):
+    _expect(type(value) is Tuple, "Order expects a tuple")
+    return value.length
+
+
+def _null(value):
+    _expect(type(value) is Tuple, "Null expects a tuple")
+    return value.length == 0
+
+
+def _aug(values, value):
+    _expect(type(values) is Tuple, "aug expects a tuple on the left")
+    return values.aug(value)
+
+
+def _itos(value):
+    _expect(type(value) is int, "ItoS expects an integer")
+    return String(format_integer(value))
+
+
+def _sum(values):
+    _expect(type(values) is Tuple, "Sum expects a tuple of integers")
+    numpy = _numpy()
+    # Without numpy an array would not pay for the copy
+    items = values.values() if numpy is None else values.packed()
+    if type(items) is array:
+        if numpy is not None and items:
+            view = numpy.frombuffer(items, numpy.int64)
+            # No int64 overflow when length * largest magnitude fits
+            if _magnitude(view) * len(items) <= _INT_MAX:
+                return int(view.sum())
+        return sum(items)
+    _expect(all(type(item) is int for item in items), "Sum expects a tuple of integers")
+    return sum(items)
+
+
+def _map(name, values, other):
+    # Map '+' T X: T's elements combined by an operator with X's elements,
+    # or with X itself when it is not a tuple. Same results and errors as
+    # applying the operator to each pair.
+    _expect(
+        type(name) is String and str(name) in _MAP_OPERATORS,
+        "Map expects an operator name such as '+'",
+    )
+    _expect(type(values) is Tuple, "Map expects a tuple")
+    op = _MAP_OPERATORS[str(name)]
+    packed = _numpy() is not None and op in _VECTOR_OPERATIONS
+    items = values.packed() if packed else values.values()
+    if type(other) is Tuple:
+        _expect(other.length == values.length, "Map expects tuples of equal length")
+        others = other.packed() if packed else other.values()
+    else:
+        others = None
+    if type(items) is array and (others is None or type(others) is array):
+        result = _map_integers(op, items, other if others is None else others)
+        if result is not None:
+            return result
+    if others is None:
+        return _tuple([_binary(op, item, other) for item in items])
+    return _tuple([_binary(op, item, right) for item, right in zip(items, others)])
+
+
+def _map_integers(op, items, other):
+    # _map over an integer array and an integer or an integer array, run by
+    # numpy; None when numpy is missing or the results may need more than
+    # 64 bits, for _map to compute in Python
+    numpy = _numpy()
+    if numpy is None or not items or op not in _VECTOR_OPERATIONS:
+        return None
+    left = numpy.frombuffer(items, numpy.int64)
+    if type(other) is array:
+        right = numpy.frombuffer(other, numpy.int64)
+    elif type(other) is int and _INT_MIN <= other <= _INT_MAX:
+        right = other
+    else:
+        return None
+    if op == DIVIDE and not numpy.all(right):
+        # Left to _binary, which reports the division by zero
+        return None
+    if _bound(op, left, right) > _INT_MAX:
+        return None
+    if op == DIVIDE:
+        # RPAL division truncates towards zero; numpy's floors
+        result = numpy.abs(left) // numpy.abs(right)
+        result = numpy.where((left < 0) != (right < 0), -result, result)
+    else:
+        result = _VECTOR_OPERATIONS[op](left, right)
+    if result.dtype == numpy.bool_:
+        return Tuple(result.tolist())
+    return Tuple(array("q", result.astype(numpy.int64).tobytes()))
+
+
+def _bound(op, left, right):
+    # Largest magnitude op can give on items of the numpy arrays left and
+    # right, or of left and the integer right
+    if op == DIVIDE:
+        return _magnitude(left)
+    if op != ADD and op != SUBTRACT and op != MULTIPLY:
+        return 0
+    right_magnitude = abs(right) if type(right) is int else _magnitude(right)
+    if op == MULTIPLY:
+        return _magnitude(left) * right_magnitude
+    return _magnitude(left) + right_magnitude
+
+
+def _magnitude(view):
+    # Largest absolute value in a numpy integer array, as a Python int
+    return max(int(view.max()), -int(view.min()))
+
+
+def _tuple(values):
+    # A Tuple of values, integers kept in an array when they all fit
+    items = _integer_array(values)
+    return Tuple(values if items is None else items)
+
+
+def _integer_array(values):
+    # values in an array("q"), or None unless they are all 64-bit integers
+    for value in values:
+        if type(value) is not int or not _INT_MIN <= value <= _INT_MAX:
+            return None
+    return array("q", values)
+
+
+_numpy_module = None
+
+
+def _numpy():
+    # numpy, or None if it is not installed. Imported on first use: it takes
+    # longer to import than most programs take to run.
+    global _numpy_module
+    if _numpy_module is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy_module = numpy
+    return _numpy_module or None
+
+
+def _ystar(value):
+    # Y* f where f = fn name. fn x. body: build the inner closure over a frame
+    # that binds name to the closure itself, which is what every unfolding of
+    # the eta closure would produce. Other bodies keep the eta closure.
+    _expect(type(value) is Closure, "Y* expects a lambda closure")
+    code = value.code
+    instructions = code.instructions
+    if code.arity == 1 and len(instructions) == 1 and instructions[0][0] == LAMBDA:
+        frame = [value.env, None]
+        closure = Closure(instructions[0][1], frame)
+        frame[1] = closure
+        return closure
+    return Eta(value)
+
+
+# name -> (function, arity); Print is bound per machine to its output
+BUILTINS = {
+    "Print": (None, 1),
+    "Conc": (_conc, 2),
+    "Stem": (_stem, 1),
+    "Stern": (_stern, 1),
+    "Order": (_order, 1),
+    "Null": (_null, 1),
+    "Aug": (_aug, 2),
+    "ItoS": (_itos, 1),
+    "Sum": (_sum, 1),
+    "Map": (_map, 3),
+    "Isinteger": (lambda value: type(value) is int, 1),
+    "Istruthvalue": (lambda value: type(value) is bool, 1),
+    "Isstring": (lambda value: type(value) is String, 1),
+    "Istuple": (lambda value: type(value) is Tuple, 1),
+    "Isfunction": (_is_function, 1),
+    "Isdummy": (lambda value: value is DUMMY, 1),
+}
+
+
+class _Text:
+    # Literal text queued between the elements of a tuple being formatted
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+_CLOSE = _Text(")")
+_SEPARATOR = _Text(", ")
+
+
+def format_value(value):
+    # Text written by Print; nested tuples are expanded with an explicit stack
+    parts = []
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        kind = type(value)
+        if kind is Tuple:
+            if not value.length:
+                parts.append("nil")
+                continue
+            items = value.items
+            stack.append(_CLOSE)
+            for index in range(value.length - 1, -1, -1):
+                stack.append(items[index])
+                if index:
+                    stack.append(_SEPARATOR)
+            parts.append("(")
+        elif kind is _Text:
+            parts.append(value.text)
+        else:
+            parts.append(_format_item(value))
+    return "".join(parts)
+
+
+def _format_item(value):
+    # Text of any value but a tuple
+    kind = type(value)
+    if kind is String:
+        return str(value)
+    if kind is bool:
+        return "true" if value else "false"
+    if value is DUMMY:
+        return "dummy"
+    if kind is Closure:
+        code = value.code
+        return f"[lambda closure: {_names(code)}: {code.index}]"
+    if kind is Eta:
+        code = value.closure.code
+        return f"[eta closure: {_names(code)}: {code.index}]"
+    if kind is Builtin:
+        return f"[primitive function: {value.name}]"
+    if kind is int:
+        return format_integer(value)
+    return str(value)
+
+
+def parse_integer(text):
+    # The integer written in decimal as text, of any length
+    if len(text) <= _DIGITS:
+        return int(text)
+    if text[0] == "-":
+        return -parse_integer(text[1:])
+    head = len(text) % _DIGITS or _DIGITS
+    value = int(text[:head])
+    for start in range(head, len(text), _DIGITS):
+        value = value * _PIECE + int(text[start : start + _DIGITS])
+    return value
+
+
+def format_integer(value):
+    # Decimal text of an integer of any size
+    if -_PIECE < value < _PIECE:
+        return str(value)
+    if value < 0:
+        return "-" + format_integer(-value)
+    pieces = []
+    while value >= _PIECE:
+        value, piece = divmod(value, _PIECE)
+        pieces.append(f"{piece:0{_DIGITS}d}")
+    pieces.append(str(value))
+    return "".join(reversed(pieces))
+
+
+def _names(code):
+    return ", ".join(code.names) if code.names else "()"
+
+
+class Machine:
+    # Evaluates a compiled program. The control stack holds instructions, the
+    # value stack holds run-time values and an environment is a list
+    # [parent, slot 1, slot 2, ...] for one lambda application. Calls never
+    # recurse in Python, so recursion depth is bounded only by memory.
+    #
+    # With memo_size > 0, results of closure applications are cached on
+    # (closure, argument) in an LRU of that many entries. RPAL is pure apart
+    # from Print, so a result is only stored if no Print ran during the call.
+    def __init__(self, program, output=None, memo_size=0):
+        self.output = output if output is not None else sys.stdout
+        self.memo_size = memo_size
+        self.memo = OrderedDict() if memo_size > 0 else None
+        self.prints = 0
+        self.builtins = self._builtins()
+        self.codes = self._link(program)
+
+    def _builtins(self):
+        write = self.output.write
+
+        def print_value(value):
+            self.prints += 1
+            write(format_value(value))
+            return DUMMY
+
+        builtins = {
+            name: Builtin(name, function, arity)
+            for name, (function, arity) in BUILTINS.items()
+        }
+        builtins["Print"] = Builtin("Print", print_value, 1)
+        builtins["Y*"] = Builtin("Y*", _ystar, 1)
+        builtins["dummy"] = DUMMY
+        return builtins
+
+    def _link(self, program):
+        # Copy the control structures with structure indices and builtin
+        # names resolved to objects. The program itself stays plain data, so
+        # it can be stored and linked again by another machine.
+        builtins = self.builtins
+        codes = [Code(code.index, code.names, code.arity) for code in program.codes]
+        pending = [
+            (code.instructions, linked.instructions)
+            for code, linked in zip(program.codes, codes)
+        ]
+        while pending:
+            source, instructions = pending.pop()
+            for op, arg in source:
+                if op == LAMBDA:
+                    arg = codes[arg]
+                elif op == BUILTIN:
+                    op, arg = PUSH, builtins[arg]
+                elif op == PUSH and type(arg) is str:
+                    arg = String(arg)
+                elif op == PUSH and type(arg) is tuple:
+                    arg = NIL
+                elif op == BETA:
+                    then_branch, else_branch = arg
+                    arg = ([], [])
+                    pending.append((then_branch, arg[0]))
+                    pending.append((else_branch, arg[1]))
+                instructions.append((op, arg))
+        return codes
+
+    def _stacks(self):
+        # The control and value stacks for run; a profiler can override this
+        # to count steps without slowing down ordinary runs
+        return list(self.codes[0].instructions), []
+
+    # One loop dispatches every instruction. Moving the cases into methods
+    # would add a call to each step of the hottest loop in the interpreter,
+    # so the complexity check is waived here.
+    def run(self):  # noqa: C901
+        control, stack = self._stacks()
+        env = [None]
+        pop = control.pop
+        push = stack.append
+        pop_value = stack.pop
+        ystar = self.builtins["Y*"]
+        memo = self.memo
+
+        while control:
+            op, arg = pop()
+            if op == LOAD_LOCAL:
+                push(env[arg])
+            elif op == PUSH:
+                push(arg)
+            elif op == GAMMA:
+                rator = pop_value()
+                rand = pop_value()
+                kind = type(rator)
+                if kind is Closure:
+                    if memo is not None:
+                        key = _memo_key(rator, rand)
+                        if key is not None:
+                            result = memo.get(key, _MISSING)
+                            if result is not _MISSING:
+                                memo.move_to_end(key)
+                                push(result)
+                                continue
+                            control.append((MEMO, (key, self.prints)))
+                    code = rator.code
+                    # A call in tail position is followed directly by the
+                    # RESTORE of its caller (or by the end of the program),
+                    # which makes its own RESTORE redundant. Skipping it
+                    # keeps the control stack flat and lets the caller's
+                    # frame be freed as soon as the call starts.
+                    if control and control[-1][0] != RESTORE:
+                        control.append((RESTORE, env))
+                    env = _bind(code, rator.env, rand)
+                    control.extend(code.instructions)
+                elif kind is Builtin:
+                    if rator is ystar and type(rand) is Closure and rand.code.arity > 1:
+                        # rec (f, g) = E: evaluate E in a frame whose slots
+                        # are filled with its own elements afterwards
+                        code = rand.code
+                        frame = [rand.env] + [None] * code.arity
+                        control.append((TIE, frame))
+                        control.append((RESTORE, env))
+                        env = frame
+                        control.extend(code.instructions)
+                    else:
+                        push(rator.apply(rand))
+                elif kind is Tuple:
+                    push(_select(rator, rand))
+                elif kind is Eta:
+                    # gamma eta R => gamma (gamma lambda eta) R
+                    push(rand)
+                    push(rator)
+                    push(rator.closure)
+                    control.append(_GAMMA)
+                    control.append(_GAMMA)
+                else:
+                    raise CSEError(f"Cannot apply {format_value(rator)}")
+            elif op == LOAD:
+                depth, slot = arg
+                frame = env[0]
+                while depth > 1:
+                    frame = frame[0]
+                    depth -= 1
+                push(frame[slot])
+            elif op == RESTORE:
+                env = arg
+            elif op == LAMBDA:
+                push(Closure(arg, env))
+            elif op == BETA:
+                condition = pop_value()
+                if condition is True:
+                    control.extend(arg[0])
+                elif condition is False:
+                    control.extend(arg[1])
+                else:
+                    raise CSEError("Condition must be a truth value")
+            elif op == TAU:
+                values = stack[-arg:]
+                del stack[-arg:]
+                values.reverse()
+                push(Tuple(values))
+            elif ADD <= op <= AUG:
+                left = pop_value()
+                right = pop_value()
+                if type(left) is int and type(right) is int:
+                    operation = _INTEGER_OPERATIONS[op]
+                    if operation is not None:
+                        push(operation(left, right))
+                        continue
+                push(_binary(op, left, right))
+            elif op == NEG:
+                value = pop_value()
+                _expect(type(value) is int, "neg expects an integer")
+                push(-value)
+            elif op == NOT:
+                value = pop_value()
+                _expect(type(value) is bool, "not expects a truth value")
+                push(not value)
+            elif op == TIE:
+                values = stack[-1]
+                _expect(
+                    type(values) is Tuple and values.length == len(arg) - 1,
+                    "rec expects a tuple for its names",
+                )
+                arg[1:] = values.values()
+            elif op == MEMO:
+                key, prints = arg
+                if prints == self.prints:
+                    memo[key] = stack[-1]
+                    if len(memo) > self.memo_size:
+                        memo.popitem(last=False)
+            elif op == UNBOUND:
+                raise CSEError(f"Undeclared identifier '{arg}'")
+            else:
+                raise CSEError(f"Unknown instruction {op}")
+
+        return stack[-1] if stack else DUMMY
+
+
+_MISSING = object()
+
+# Types whose values can appear in a tuple used as a memoization key
+_FLAT = frozenset((int, String, Closure, Eta, Builtin, _Dummy))
+
+
+def _memo_key(closure, argument):
+    # None for tuples holding tuples or truth values: hashing nested tuples
+    # can cost as much as the call, and 1 == True would conflate elements
+    kind = type(argument)
+    if kind is Tuple and type(argument.items) is not array:
+        for value in argument.values():
+            if type(value) not in _FLAT:
+                return None
+    return (closure, kind, argument)
+
+
+def _bind(code, parent, argument):
+    arity = code.arity
+    if arity == 1:
+        return [parent, argument]
+    if arity == 0:
+        return [parent]
+    _expect(
+        type(argument) is Tuple and argument.length == arity,
+        f"Expected a tuple of {arity} values for ({', '.join(code.names)})",
+    )
+    return [parent, *argument.values()]
+
+
+def _select(values, index):
+    _expect(type(index) is int, "Tuple index must be an integer")
+    _expect(1 <= index <= values.length, f"Tuple index {index} out of range")
+    return values.items[index - 1]
+
+
+# Integer operations done inline by the machine, indexed by opcode. Division
+# and powers need checks, and are left to _binary like all other types.
+_INTEGER_OPERATIONS = [None] * (AUG + 1)
+_INTEGER_OPERATIONS[ADD] = operator.add
+_INTEGER_OPERATIONS[SUBTRACT] = operator.sub
+_INTEGER_OPERATIONS[MULTIPLY] = operator.mul
+_INTEGER_OPERATIONS[GR] = operator.gt
+_INTEGER_OPERATIONS[GE] = operator.ge
+_INTEGER_OPERATIONS[LS] = operator.lt
+_INTEGER_OPERATIONS[LE] = operator.le
+_INTEGER_OPERATIONS[EQ] = operator.eq
+_INTEGER_OPERATIONS[NE] = operator.ne
+
+
+# Operators Map accepts, by name
+_MAP_OPERATORS = {
+    "+": ADD,
+    "-": SUBTRACT,
+    "*": MULTIPLY,
+    "/": DIVIDE,
+    "**": POWER,
+    "gr": GR,
+    "ge": GE,
+    "ls": LS,
+    "le": LE,
+    "eq": EQ,
+    "ne": NE,
+    "or": OR,
+    "&": AND,
+}
+
+# Operations _map_integers hands to numpy, which maps them over whole arrays
+_VECTOR_OPERATIONS = {
+    ADD: operator.add,
+    SUBTRACT: operator.sub,
+    MULTIPLY: operator.mul,
+    DIVIDE: None,
+    GR: operator.gt,
+    GE: operator.ge,
+    LS: operator.lt,
+    LE: operator.le,
+    EQ: operator.eq,
+    NE: operator.ne,
+}
+
+
+def _binary(op, left, right):
+    left_type = type(left)
+    if left_type is int and type(right) is int:
+        operation = _INTEGER_OPERATIONS[op]
+        if operation is not None:
+            return operation(left, right)
+        if op == DIVIDE:
+            return _divide(left, right)
+        if op == POWER:
+            return _power(left, right)
+    if op == EQ or op == NE:
+        _expect(
+            left_type is type(right) and left_type in (int, bool, String),
+            "eq and ne expect two values of the same basic type",
+        )
+        return (left == right) == (op == EQ)
+    if op == AUG:
+        return _aug(left, right)
+    if op == OR or op == AND:
+        _expect(
+            left_type is bool and type(right) is bool,
+            "or and & expect truth values",
+        )
+        return (left or right) if op == OR else (left and right)
+    if left_type is String and type(right) is String and GR <= op <= LE:
+        # Strings compare with the same operators as integers
+        return _INTEGER_OPERATIONS[op](str(left), str(right))
+    raise CSEError(f"Invalid operands for {_OPERATOR_NAMES[op]}")
+
+
+def _divide(left, right):
+    # Integer division truncates toward zero
+    _expect(right != 0, "Division by zero")
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+
+def _power(left, right):
+    if right < 0:
+        _expect(left != 0, "Division by zero")
+        # 1 / left ** -right, truncated: only 1 and -1 are not 0
+        if left == -1:
+            return -1 if right % 2 else 1
+        return 1 if left == 1 else 0
+    return left**right
+
+
+_OPERATOR_NAMES = {
+    ADD: "+",
+    SUBTRACT: "-",
+    MULTIPLY: "*",
+    DIVIDE: "/",
+    POWER: "**",
+    GR: "gr",
+    GE: "ge",
+    LS: "ls",
+    LE: "le",
+}
+
+
+def compile_tree(node):
+    return Compiler(node.tree).compile(node.index)
+
+
+def evaluate(node, output=None, memo_size=0):
+    return Machine(compile_tree(node), output, memo_size).run()
@@ -0,0 +1,55 @@
+# Default number of diagnostics kept by one recovering run
+MAX_DIAGNOSTICS = 100
+
+
+class Diagnostic:
+    __slots__ = ("message", "line", "column")
+
+    def __init__(self, message, line, column):
+        self.message = message
+        self.line = line
+        self.column = column
+
+    def __str__(self):
+        # Same text as the LexerError or ParserError it stands for
+        return f"{self.message} at line {self.line}, column {self.column}"
+
+    def __repr__(self):
+        return f"Diagnostic({self.message!r}, {self.line}, {self.column})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Diagnostic):
+            return NotImplemented
+        return (self.message, self.line, self.column) == (
+            other.message,
+            other.line,
+            other.column,
+        )
+
+
+class Diagnostics:
+    # Errors collected by a Lexer and Parser that recover instead of raising.
+    # At most limit are kept; the lexer stops scanning once the list is full,
+    # so a file full of errors costs no more than the first limit of them.
+    def __init__(self, limit=MAX_DIAGNOSTICS):
+        self.limit = limit
+        self.items = []
+
+    @property
+    def full(self):
+        return len(self.items) >= self.limit
+
+    def report(self, message, line, column):
+        if len(self.items) < self.limit:
+            self.items.append(Diagnostic(message, line, column))
+
+    def sorted(self):
+        # The lexer runs a token ahead of the parser, so reports can arrive
+        # slightly out of order
+        return sorted(self.items, key=lambda item: (item.line, item.column))
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
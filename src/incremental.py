@@ -0,0 +1,210 @@
+from array import array
+from bisect import bisect_right
+
+from src.lexer import Lexer
+from src.parser import Parser, ParserError
+
+
+class _SpanParser(Parser):
+    # Records the token range of every definition (Db) it parses, as
+    # (node, first token, token after the last)
+    def __init__(self, tokens, start=0, tree=None):
+        self.index = start
+        self.spans = []
+        super().__init__(self._track(tokens, start))
+        if tree is not None:
+            # Parse into an existing tree
+            self.tree = tree
+            self._add = tree.add
+
+    def _track(self, tokens, start):
+        for index in range(start, len(tokens)):
+            self.index = index
+            yield tokens[index]
+
+    def _db_started(self):
+        return self.index
+
+    def _db_finished(self, node, first):
+        self.spans.append((node, first, self.index))
+
+
+class Document:
+    # A program kept lexed and parsed across edits. An edit re-lexes only the
+    # tokens it touches (TokenBuffer.edit) and re-parses only the smallest
+    # definition around them, falling back to a full parse when the change
+    # reaches past that definition. The tree is the parser's flat AST, with
+    # the re-parsed definition written over its old root node; standardize a
+    # copy (parse the text again) rather than this tree, which is rewritten
+    # in place.
+    def __init__(self, text):
+        self.tokens = Lexer(text, skip_comments=True).tokenize_columnar()
+        self.tree = None
+        self._parse()
+
+    @property
+    def text(self):
+        return self.tokens.source
+
+    @property
+    def root(self):
+        return self.tree.node(self.tree.root)
+
+    def edit(self, offset, removed, inserted):
+        # Replace text[offset:offset + removed] with inserted; returns the
+        # root node. Errors are raised as by lex and parse; after a
+        # ParserError the next edit parses the whole text again.
+        first, old_stop, new_stop = self.tokens.edit(offset, removed, inserted)
+        if (
+            self.tree is None
+            or len(self.tree) > self._limit
+            or not self._reparse(first, old_stop, new_stop)
+        ):
+            self._parse()
+        return self.root
+
+    def _parse(self):
+        self.tree = None
+        parser = _SpanParser(self.tokens)
+        root = parser.parse()
+        self.tree = root.tree
+        # Nodes replaced by a re-parse stay in the tree; parse afresh once
+        # they outnumber the live ones, which keeps edits cheap on average
+        self._limit = 2 * len(self.tree)
+        self._set_spans(sorted(parser.spans, key=lambda span: span[1]))
+
+    def _set_spans(self, spans):
+        # Spans in order of their first token; nested definitions follow the
+        # one around them, one level deeper
+        self.span_nodes = array("l", [span[0] for span in spans])
+        self.span_firsts = array("q", [span[1] for span in spans])
+        self.span_ends = array("q", [span[2] for span in spans])
+        self.span_depths = array("l", _depths(spans, 0))
+        # Spans from index moved on are delta tokens further on than
+        # span_firsts and span_ends say. As in TokenBuffer, the shift is
+        # applied as spans are read, so an edit costs the definition it
+        # re-parses and the spans between it and the previous edit.
+        self.moved = len(spans)
+        self.delta = 0
+
+    def first_of(self, position):
+        if position >= self.moved:
+            return self.span_firsts[position] + self.delta
+        return self.span_firsts[position]
+
+    def end_of(self, position):
+        if position >= self.moved:
+            return self.span_ends[position] + self.delta
+        return self.span_ends[position]
+
+    def _parent(self, position):
+        # The span around the one at position, or -1 for an outermost one
+        depths = self.span_depths
+        depth = depths[position]
+        if not depth:
+            return -1
+        position -= 1
+        while depths[position] >= depth:
+            position -= 1
+        return position
+
+    def _reparse(self, first, old_stop, new_stop):
+        # Parse the definition around old tokens first:old_stop again; False
+        # if there is none or it no longer ends where it did
+        if first == old_stop == new_stop:
+            # Only positions moved
+            return True
+        # The last definition starting at or before the change, or the
+        # innermost one around that which reaches over it
+        position = bisect_right(range(len(self.span_firsts)), first, key=self.first_of)
+        position -= 1
+        while position >= 0 and self.end_of(position) < old_stop:
+            position = self._parent(position)
+        if position < 0:
+            return False
+        start = self.first_of(position)
+        old_end = self.end_of(position)
+        shift = new_stop - old_stop
+        parser = _SpanParser(self.tokens, start, self.tree)
+        try:
+            node = parser._db()
+        except ParserError:
+            return False
+        if parser.index != old_end + shift:
+            return False
+
+        # Write the new definition over the old root node, which keeps its
+        # place among its siblings
+        tree = self.tree
+        target = self.span_nodes[position]
+        tree.kinds[target] = tree.kinds[node]
+        tree.values[target] = tree.values[node]
+        tree.first_child[target] = tree.first_child[node]
+        spans = sorted(
+            (
+                (target if span[0] == node else span[0], span[1], span[2])
+                for span in parser.spans
+            ),
+            key=lambda span: span[1],
+        )
+        self._replace_spans(position, old_end, spans, shift)
+        return True
+
+    def _replace_spans(self, position, old_end, spans, shift):
+        # Put spans in place of those inside the definition at position,
+        # which ended at old_end, and move the later ones by shift
+        firsts = self.span_firsts
+        ends = self.span_ends
+        inner = bisect_right(
+            range(len(firsts)), old_end - 1, position, key=self.first_of
+        )
+        after = position + len(spans)
+        # The pending shift must not cover the new spans
+        moved = self.moved
+        if moved < position:
+            _shift(firsts, moved, position, self.delta)
+            _shift(ends, moved, position, self.delta)
+            moved = inner
+        elif moved < inner:
+            moved = inner
+        moved += after - inner
+        depths = _depths(spans, self.span_depths[position])
+        self.span_nodes[position:inner] = array("l", [span[0] for span in spans])
+        firsts[position:inner] = array("q", [span[1] for span in spans])
+        ends[position:inner] = array("q", [span[2] for span in spans])
+        self.span_depths[position:inner] = array("l", depths)
+        self.moved = moved
+        if shift:
+            # Fold the shift into the pending one, which then starts right
+            # after the new spans
+            _shift(firsts, after, moved, -self.delta)
+            _shift(ends, after, moved, -self.delta)
+            self.moved = after
+            self.delta += shift
+            # Definitions around this one end later or earlier too
+            parent = self._parent(position)
+            while parent >= 0:
+                ends[parent] += shift
+                parent = self._parent(parent)
+        if not self.delta:
+            self.moved = len(firsts)
+
+
+def _depths(spans, depth):
+    # Nesting depth of each of spans, sorted by first token, below depth
+    depths = []
+    ends = []
+    for _, first, end in spans:
+        while ends and ends[-1] <= first:
+            ends.pop()
+        depths.append(depth + len(ends))
+        ends.append(end)
+    return depths
+
+
+def _shift(values, begin, end, amount):
+    # Add amount to values[begin:end]
+    if amount and begin < end:
+        values[begin:end] = array(
+            values.typecode, map(amount.__add__, values[begin:end])
+        )
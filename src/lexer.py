@@ -1,3 +1,8 @@
+import mmap
+import re
+import sys
+from array import array
+from bisect import bisect_left
 from enum import Enum, auto
 
 
@@ -13,9 +18,13 @@ class TokenType(Enum):
     COMMENT = auto()
     WHITESPACE = auto()
     EOF = auto()
+    # Text the lexer could not make sense of; only emitted when recovering
+    ERROR = auto()
 
 
 class Token:
+    __slots__ = ("type", "value", "line", "column")
+
     def __init__(self, type_, value, line, column):
         self.type = type_
         self.value = value
@@ -29,22 +38,649 @@ class Token:
         return self.__str__()
 
 
+class TokenView:
+    # Read-only view of one token stored in a TokenBuffer
+    __slots__ = ("buffer", "index")
+
+    def __init__(self, buffer, index):
+        self.buffer = buffer
+        self.index = index
+
+    @property
+    def type(self):
+        return _TYPES_BY_CODE[self.buffer.types[self.index]]
+
+    @property
+    def value(self):
+        return self.buffer.value_of(self.index)
+
+    @property
+    def line(self):
+        return self.buffer.line_of(self.index)
+
+    @property
+    def column(self):
+        return self.buffer.columns[self.index]
+
+    def __str__(self):
+        return f"Token({self.type.name}, '{self.value}', {self.line}, {self.column})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class TokenBuffer:
+    # Columnar token stream: parallel arrays of (type code, start offset, end
+    # offset, line, column). Values are sliced out of the source only when
+    # read, so a token costs a few machine words instead of two objects.
+    def __init__(self, source, skip_comments=False):
+        # source is a str, or ASCII bytes or an mmap for Lexer.tokenize_mapped
+        self.source = source
+        self.skip_comments = skip_comments
+        self.encoded = not isinstance(source, str)
+        self.types = array("B")
+        self.starts = array("q")
+        self.ends = array("q")
+        self.lines = array("i")
+        self.columns = array("I")
+        # Values of tokens that are not backed by a slice of the source
+        self.values = {}
+        # After edit(), tokens from index moved on are delta characters and
+        # line_delta lines further on than starts, ends and lines say. The
+        # shift is applied as tokens are read, so an edit costs no more than
+        # the tokens it changes and those between it and the previous edit.
+        self.moved = 0
+        self.delta = 0
+        self.line_delta = 0
+
+    def append(self, type_code, start, end, line, column):
+        self.types.append(type_code)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+        self.columns.append(column)
+
+    def append_token(self, token):
+        self.values[len(self.types)] = token.value
+        self.append(token.type.value, -1, -1, token.line, token.column)
+
+    def value_of(self, index):
+        if index < 0:
+            index += len(self.types)
+        value = self.values.get(index)
+        if value is not None:
+            return value
+        start = self.starts[index]
+        end = self.ends[index]
+        if index >= self.moved:
+            start += self.delta
+            end += self.delta
+        value = self.source[start:end]
+        if self.encoded:
+            value = value.decode("ascii")
+        if self.types[index] == _STRING_CODE and "\\" in value:
+            value = _ESCAPE_RE.sub(_unescape, value)
+        return value
+
+    def start_of(self, index):
+        if index >= self.moved:
+            return self.starts[index] + self.delta
+        return self.starts[index]
+
+    def end_of(self, index):
+        if index >= self.moved:
+            return self.ends[index] + self.delta
+        return self.ends[index]
+
+    def line_of(self, index):
+        if index >= self.moved:
+            return self.lines[index] + self.line_delta
+        return self.lines[index]
+
+    def settle(self):
+        # Apply any pending shift, so starts, ends and lines hold the
+        # positions themselves
+        self._move(self.moved, len(self.types), self.delta, self.line_delta)
+        self.moved = len(self.types)
+        self.delta = self.line_delta = 0
+
+    def _move(self, begin, end, delta, line_delta):
+        if delta:
+            _shift(self.starts, begin, end, delta)
+            _shift(self.ends, begin, end, delta)
+        if line_delta:
+            _shift(self.lines, begin, end, line_delta)
+
+    def edit(self, offset, removed, inserted):
+        # Replace source[offset:offset + removed] with inserted and re-lex in
+        # place. Scanning starts at the token before the edit and stops at the
+        # first token that starts at the same place in the unchanged rest of
+        # the source; tokens after that are only moved. Returns (first,
+        # old_stop, new_stop): tokens first:old_stop were replaced by
+        # first:new_stop. On a LexerError the buffer is left as it was.
+        source = self._text()
+        text = source[:offset] + inserted + source[offset + removed :]
+        if self.values or not inserted.isascii():
+            # Tokens without source offsets; lex everything again
+            return self._replace_all(text)
+        delta = len(inserted) - removed
+        rescanned = self._rescan(text, offset, offset + len(inserted), delta)
+        if rescanned is None:
+            # Let a full scan raise the error
+            return self._replace_all(text)
+        first, stop, scanned, line, column = rescanned
+
+        # Tokens ahead of the edit that came out as before are kept
+        skip = self._kept(scanned, first, stop, offset)
+        first += skip
+        if stop < len(self.types):
+            old_line = self.line_of(stop)
+            line_shift = line - old_line
+            column_shift = column - self.columns[stop]
+        else:
+            line_shift = column_shift = 0
+        new_stop = first + len(scanned) - skip
+
+        # The pending shift must not cover the new tokens
+        moved = self.moved
+        if moved < first:
+            self._move(moved, first, self.delta, self.line_delta)
+            moved = stop
+        elif moved < stop:
+            moved = stop
+        for name in ("types", "starts", "ends", "lines", "columns"):
+            getattr(self, name)[first:stop] = getattr(scanned, name)[skip:]
+        moved += new_stop - stop
+        self.moved = moved
+        self.source = text
+
+        # Later tokens on the line where scanning stopped also move sideways
+        if column_shift:
+            self._shift_columns(new_stop, old_line, column_shift)
+
+        # Fold this edit's shift into the pending one, which then starts
+        # right after the new tokens
+        if delta or line_shift:
+            self._move(new_stop, moved, -self.delta, -self.line_delta)
+            self.moved = new_stop
+            self.delta += delta
+            self.line_delta += line_shift
+        if not (self.delta or self.line_delta):
+            self.moved = len(self.types)
+        return first, stop, new_stop
+
+    def _text(self):
+        # The source as a str. A mapped buffer holds ASCII bytes, whose
+        # offsets are those of the same text decoded.
+        if self.encoded:
+            self.source = bytes(self.source).decode("ascii")
+            self.encoded = False
+        return self.source
+
+    def _rescan(self, text, offset, unchanged, delta):
+        # Scan text from the token before offset to the first token at or
+        # after unchanged that starts where an old one did, delta characters
+        # earlier. Returns (first, stop, scanned, line, column): old tokens
+        # first:stop give way to the scanned ones, and the old token at stop
+        # is now at line and column. None if the text does not lex.
+        length = len(self.types)
+        tokens = range(length)
+        first = bisect_left(tokens, offset, key=self.end_of)
+        if first:
+            first -= 1
+            position = self.start_of(first)
+            line = self.line_of(first)
+            line_start = position - self.columns[first] + 1
+        else:
+            position = line_start = 0
+            line = 1
+        match = _TOKEN_RE.match
+        skip_comments = self.skip_comments
+        scanned = TokenBuffer(text)
+        stop = first
+        while True:
+            m = match(text, position)
+            if m is None:
+                end = _SPACE_RE.match(text, position).end()
+                if end < len(text):
+                    return None
+                newlines = text.count("\n", position, end)
+                if newlines:
+                    line += newlines
+                    line_start = text.rindex("\n", position, end)
+                scanned.append(_EOF_CODE, end, end, line, end - line_start + 1)
+                return first, length, scanned, line, None
+            if m.start(1) >= 0:
+                ws_start, ws_end = m.span(1)
+                line += text.count("\n", ws_start, ws_end)
+                line_start = text.rindex("\n", ws_start, ws_end)
+            group = m.lastindex
+            start, position = m.span(group)
+            if start >= unchanged:
+                # The old token here begins the same text, so it and all
+                # after it scan as before. The old EOF token starts beyond
+                # any such place, so the search always ends inside the buffer.
+                old = start - delta
+                stop = bisect_left(tokens, old, stop, key=self.start_of)
+                if self.start_of(stop) == old:
+                    return first, stop, scanned, line, start - line_start + 1
+            if group == _COMMENT_GROUP and skip_comments:
+                continue
+            scanned.append(
+                _GROUP_TYPES[group].value, start, position, line, start - line_start + 1
+            )
+
+    def _kept(self, scanned, first, stop, offset):
+        # How many scanned tokens, ending before offset, are the same as the
+        # old tokens from first on
+        count = len(scanned)
+        skip = 0
+        while (
+            skip < count
+            and first < stop
+            and scanned.ends[skip] <= offset
+            and scanned.types[skip] == self.types[first]
+            and scanned.starts[skip] == self.start_of(first)
+            and scanned.ends[skip] == self.end_of(first)
+            and scanned.lines[skip] == self.line_of(first)
+            and scanned.columns[skip] == self.columns[first]
+        ):
+            skip += 1
+            first += 1
+        return skip
+
+    def _shift_columns(self, index, line, amount):
+        # Move the tokens from index on that are still on line by amount
+        columns = self.columns
+        while index < len(columns) and self.line_of(index) == line:
+            columns[index] += amount
+            index += 1
+
+    def _replace_all(self, text):
+        old_length = len(self.types)
+        tokens = Lexer(text, skip_comments=self.skip_comments).tokenize_columnar()
+        self.__dict__.update(tokens.__dict__)
+        self.skip_comments = tokens.skip_comments
+        return 0, old_length, len(self.types)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.types)
+        if not 0 <= index < len(self.types):
+            raise IndexError("token index out of range")
+        return TokenView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.types)):
+            yield TokenView(self, index)
+
+
 class LexerError(Exception):
     def __init__(self, message, line, column):
         super().__init__(f"{message} at line {line}, column {column}")
+        self.message = message
         self.line = line
         self.column = column
 
 
+class _Stop(Exception):
+    # Raised once the diagnostics are full to end a recovering scan
+    pass
+
+
+# Characters that may appear in an operator symbol
+OPERATOR_CHARS = frozenset('+-*<>&.@/:=~|$!#%_^[]{}"`?')
+
+# Escape sequences allowed inside string literals
+ESCAPES = {"t": "\t", "n": "\n", "\\": "\\", "'": "'"}
+
+ENGINES = ("fast", "reference")
+
+# Master pattern for the fast engine. Each match is the whitespace before a
+# token (group 1 holds it when it contains a newline) followed by the token
+# itself; the number of the token group that matched gives its type. The
+# alternatives follow the order of the checks in the reference loop, so `//`
+# wins over the `/` operator and maximal munch applies to identifiers,
+# integers and operator runs. It is only used on ASCII input, where the
+# character classes agree with str.isalpha() and friends.
+_TOKEN_RE = re.compile(
+    r"[ \t]*(\n[ \t\n]*)?"
+    r"(?:(//[^\n]*)"
+    r"|('[^'\\]*(?:\\[tn\\'][^'\\]*)*')"
+    r"|([A-Za-z]\w*)"
+    r"|([0-9]+)"
+    r"|(\()|(\))|(;)|(,)"
+    r"|([-+*<>&.@/:=~|$!#%_^\[\]{}\"`?]+))"
+)
+
+_SPACE_RE = re.compile(r"[ \t\n]*")
+
+# The same patterns for ASCII bytes, used on memory-mapped files
+_TOKEN_BYTES_RE = re.compile(_TOKEN_RE.pattern.encode("ascii"))
+_SPACE_BYTES_RE = re.compile(_SPACE_RE.pattern.encode("ascii"))
+_NON_ASCII_RE = re.compile(rb"[\x80-\xff]")
+
+_ESCAPE_RE = re.compile(r"\\(.)")
+
+_STRING_GROUP = 3
+_COMMENT_GROUP = 2
+
+# Groups whose values are interned, so repeated names share one string
+_INTERNED_GROUPS = frozenset((4, 10))
+
+# Token type for each token group of _TOKEN_RE, indexed by group number
+_GROUP_TYPES = (
+    None,
+    None,
+    TokenType.COMMENT,
+    TokenType.STRING,
+    TokenType.IDENTIFIER,
+    TokenType.INTEGER,
+    TokenType.LPAREN,
+    TokenType.RPAREN,
+    TokenType.SEMICOLON,
+    TokenType.COMMA,
+    TokenType.OPERATOR,
+)
+
+_TYPES_BY_CODE = {token_type.value: token_type for token_type in TokenType}
+_STRING_CODE = TokenType.STRING.value
+_EOF_CODE = TokenType.EOF.value
+
+
+# Number of characters read at a time from file objects
+CHUNK_SIZE = 1 << 16
+
+
+def _shift(values, begin, end, amount):
+    # Add amount to values[begin:end]
+    values[begin:end] = array(values.typecode, map(amount.__add__, values[begin:end]))
+
+
+def _starts_token(char):
+    # Whether char can begin a token or whitespace in the reference loop
+    return (
+        char in " \t\n'(),;"
+        or char in OPERATOR_CHARS
+        or char.isalpha()
+        or char.isdigit()
+    )
+
+
+def _unescape(match):
+    return ESCAPES[match.group(1)]
+
+
+def _read_chunks(source):
+    if isinstance(source, str):
+        return (source,)
+    read = getattr(source, "read", None)
+    if read is not None:
+        return iter(lambda: read(CHUNK_SIZE), "")
+    return source
+
+
+def _read_all(source):
+    if isinstance(source, str):
+        return source
+    return "".join(_read_chunks(source))
+
+
 class Lexer:
-    def __init__(self, source_code):
+    def __init__(
+        self, source_code, engine="fast", skip_comments=False, diagnostics=None
+    ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown lexer engine '{engine}'")
         self.source_code = source_code
+        self.engine = engine
+        # Drop COMMENT tokens as they are scanned; WHITESPACE is never emitted
+        self.skip_comments = skip_comments
+        # With a Diagnostics, errors are recorded there and scanning resumes
+        # after them (see _fail); without one the first error is raised
+        self.diagnostics = diagnostics
         self.position = 0
         self.line = 1
         self.column = 1
         self.tokens = []
 
     def tokenize(self):
+        if self.engine == "reference":
+            self.source_code = _read_all(self.source_code)
+            return self._tokenize_reference()
+        self.tokens.extend(self.iter_tokens())
+        return self.tokens
+
+    def iter_tokens(self):
+        # Lazily yield tokens from a string, a text file object or an iterable
+        # of text chunks. Tokens may span chunk boundaries; input is only read
+        # as far as needed to finish the current token.
+        if self.engine == "reference":
+            yield from self.tokenize()
+            return
+        yield from self._scan(_read_chunks(self.source_code))
+
+    def tokenize_columnar(self):
+        # Scan the whole source into a TokenBuffer without creating a Token
+        # object per token
+        source = self.source_code = _read_all(self.source_code)
+        tokens = TokenBuffer(source, self.skip_comments)
+        if self.engine == "reference" or not source.isascii():
+            for token in self.tokenize():
+                tokens.append_token(token)
+            return tokens
+        return self._scan_columnar(source, tokens, _TOKEN_RE, _SPACE_RE, "\n")
+
+    def tokenize_mapped(self, path):
+        # Like tokenize_columnar, but for a file that is memory-mapped and
+        # scanned as bytes, so it is never read or decoded as a whole; only
+        # the values of tokens that are looked at get decoded. Files that are
+        # not pure ASCII are decoded and scanned as text instead, which keeps
+        # columns counted in characters.
+        with open(path, "rb") as source:
+            try:
+                data = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # An empty file cannot be mapped
+                data = b""
+        if self.engine == "reference" or _NON_ASCII_RE.search(data):
+            self.source_code = bytes(data).decode("utf-8")
+            return self.tokenize_columnar()
+        self.source_code = data
+        tokens = TokenBuffer(data, self.skip_comments)
+        return self._scan_columnar(
+            data, tokens, _TOKEN_BYTES_RE, _SPACE_BYTES_RE, b"\n"
+        )
+
+    def _scan_columnar(self, source, tokens, token_re, space_re, newline):
+        # source is an ASCII str, or bytes-like (bytes or mmap) with the
+        # bytes patterns; only slicing, len() and rfind() are used on it
+        match = token_re.match
+        codes = [None if t is None else t.value for t in _GROUP_TYPES]
+        skip_comments = self.skip_comments
+        append_type = tokens.types.append
+        append_start = tokens.starts.append
+        append_end = tokens.ends.append
+        append_line = tokens.lines.append
+        append_column = tokens.columns.append
+        length = len(source)
+        position = self.position
+        line = self.line
+        line_start = position - self.column + 1
+
+        while True:
+            m = match(source, position)
+            if m is None:
+                end = space_re.match(source, position).end()
+                newlines = source[position:end].count(newline)
+                if newlines:
+                    line += newlines
+                    line_start = source.rfind(newline, position, end)
+                position = end
+                if position < length:
+                    # Raises the same error as the other engines, or recovers
+                    # from it and finishes the input
+                    text = source[position:]
+                    if not isinstance(text, str):
+                        text = text.decode("ascii")
+                    for token in self._resume_reference(
+                        text, position, line, line_start
+                    ):
+                        tokens.append_token(token)
+                    return tokens
+                break
+            if m.start(1) >= 0:
+                ws_start, ws_end = m.span(1)
+                line += source[ws_start:ws_end].count(newline)
+                line_start = source.rfind(newline, ws_start, ws_end)
+            group = m.lastindex
+            start, position = m.span(group)
+            if group == _COMMENT_GROUP and skip_comments:
+                continue
+            append_type(codes[group])
+            append_start(start)
+            append_end(position)
+            append_line(line)
+            append_column(start - line_start + 1)
+
+        self.position = position
+        self.line = line
+        self.column = position - line_start + 1
+        tokens.append(_EOF_CODE, position, position, self.line, self.column)
+        return tokens
+
+    # The whole scan is one loop over locals, since a method call per token
+    # would cost much of what this engine gains over the reference loop;
+    # the complexity check is waived here.
+    def _scan(self, chunks):  # noqa: C901
+        match = _TOKEN_RE.match
+        intern = sys.intern
+        skip_comments = self.skip_comments
+        chunks = iter(chunks)
+        buffer = ""
+        length = 0
+        more = True
+        # Absolute offset of buffer[0]; positions inside the buffer are relative
+        base = self.position
+        position = 0
+        line = self.line
+        # Columns are derived from the absolute offset of the current line start
+        line_start = base - self.column + 1
+
+        while True:
+            m = match(buffer, position)
+            if m is not None:
+                group = m.lastindex
+                start, end = m.span(group)
+                # A token that touches the end of the buffer may continue in
+                # the next chunk
+                if end < length or not more:
+                    if m.start(1) >= 0:
+                        ws_start, ws_end = m.span(1)
+                        line += buffer.count("\n", ws_start, ws_end)
+                        # The reference loop resets the column to 1 and then
+                        # advances past the newline, so columns after the first
+                        # line are measured from the newline itself
+                        line_start = base + buffer.rindex("\n", ws_start, ws_end)
+                    position = end
+                    if group == _COMMENT_GROUP and skip_comments:
+                        continue
+                    value = buffer[start:end]
+                    if group in _INTERNED_GROUPS:
+                        value = intern(value)
+                    elif group == _STRING_GROUP and "\\" in value:
+                        value = _ESCAPE_RE.sub(_unescape, value)
+                    yield Token(
+                        _GROUP_TYPES[group], value, line, base + start - line_start + 1
+                    )
+                    continue
+            else:
+                # Whitespace with no token after it (yet), or something the
+                # pattern rejects
+                end = _SPACE_RE.match(buffer, position).end()
+                newlines = buffer.count("\n", position, end)
+                if newlines:
+                    line += newlines
+                    line_start = base + buffer.rindex("\n", position, end)
+                position = end
+                # Only a string can still be completed by more input
+                if position < length and (not more or buffer[position] != "'"):
+                    text = buffer[position:]
+                    if self.diagnostics is not None and more:
+                        # Recovery goes on past the error to the end of input
+                        text += _read_all(chunks)
+                    yield from self._resume_reference(
+                        text, base + position, line, line_start
+                    )
+                    return
+
+            if not more:
+                break
+
+            # Read until the buffer has at least doubled its pending text, so
+            # a token spanning many chunks is rescanned a bounded number of times
+            pending = buffer[position:]
+            parts = [pending]
+            size = 0
+            for chunk in chunks:
+                if not chunk.isascii():
+                    parts.append(chunk)
+                    parts.extend(chunks)
+                    yield from self._resume_reference(
+                        "".join(parts), base + position, line, line_start
+                    )
+                    return
+                parts.append(chunk)
+                size += len(chunk)
+                if size > len(pending):
+                    break
+            else:
+                more = False
+            base += position
+            buffer = "".join(parts)
+            length = len(buffer)
+            position = 0
+
+        self.position = base + position
+        self.line = line
+        self.column = self.position - line_start + 1
+        yield Token(TokenType.EOF, "", self.line, self.column)
+
+    def _resume_reference(self, text, offset, line, line_start):
+        # Finish the remaining text with the reference loop. It is used for
+        # non-ASCII input and for errors, so the messages stay identical.
+        lexer = Lexer(text, "reference", self.skip_comments, self.diagnostics)
+        lexer.line = line
+        lexer.column = offset - line_start + 1
+        try:
+            yield from lexer._tokenize_reference()
+        finally:
+            self.position = offset + lexer.position
+            self.line = lexer.line
+            self.column = lexer.column
+
+    def _tokenize_reference(self):
+        try:
+            self._scan_reference()
+        except _Stop:
+            pass
+        # Add EOF token
+        self.tokens.append(Token(TokenType.EOF, "", self.line, self.column))
+        return self.tokens
+
+    def _fail(self, message, line, column):
+        # Raise the error, or record it so the caller can skip the bad text
+        # and carry on
+        if self.diagnostics is None:
+            raise LexerError(message, line, column)
+        self.diagnostics.report(message, line, column)
+        if self.diagnostics.full:
+            raise _Stop
+
+    def _scan_reference(self):
         while self.position < len(self.source_code):
             current_char = self.source_code[self.position]
 
@@ -88,45 +724,13 @@ class Lexer:
                 continue
 
             # Handle operators
-            if current_char in {
-                "+",
-                "-",
-                "*",
-                "<",
-                ">",
-                "&",
-                ".",
-                "@",
-                "/",
-                ":",
-                "=",
-                "~",
-                "|",
-                "$",
-                "!",
-                "#",
-                "%",
-                "_",
-                "^",
-                "[",
-                "]",
-                "{",
-                "}",
-                '"',
-                "`",
-                "?",
-            }:
+            if current_char in OPERATOR_CHARS:
                 self._handle_operator()
                 continue
 
             # If we get here, it's an invalid character
-            raise LexerError(
-                f"Invalid character '{current_char}'", self.line, self.column
-            )
-
-        # Add EOF token
-        self.tokens.append(Token(TokenType.EOF, "", self.line, self.column))
-        return self.tokens
+            self._fail(f"Invalid character '{current_char}'", self.line, self.column)
+            self._handle_invalid()
 
     def _advance(self):
         self.position += 1
@@ -152,12 +756,30 @@ class Lexer:
             value += self.source_code[self.position]
             self._advance()
 
-        self.tokens.append(Token(TokenType.COMMENT, value, start_line, start_column))
+        if not self.skip_comments:
+            self.tokens.append(
+                Token(TokenType.COMMENT, value, start_line, start_column)
+            )
+
+    def _handle_invalid(self):
+        # One ERROR token for a run of invalid characters
+        start_line = self.line
+        start_column = self.column
+        start = self.position
+        self._advance()
+        while self.position < len(self.source_code) and not _starts_token(
+            self.source_code[self.position]
+        ):
+            self._advance()
+        value = self.source_code[start : self.position]
+        self.tokens.append(Token(TokenType.ERROR, value, start_line, start_column))
 
     def _handle_string(self):
         start_line = self.line
         start_column = self.column
+        start = self.position
         value = "'"
+        token_type = TokenType.STRING
         self._advance()  # Skip opening quote
 
         while self.position < len(self.source_code):
@@ -171,32 +793,34 @@ class Lexer:
                 self._advance()  # Skip the backslash
 
                 if self.position >= len(self.source_code):
-                    raise LexerError(
+                    self._fail(
                         "Unterminated escape sequence", self.line, escape_start_col
                     )
+                    self._skip_string(start, start_line, start_column)
+                    return
 
                 next_char = self.source_code[self.position]
-                escape_map = {"t": "\t", "n": "\n", "\\": "\\", "'": "'"}
-
-                if next_char in escape_map:
+                if next_char in ESCAPES:
                     # Add the actual escaped character
-                    value += escape_map[next_char]
+                    value += ESCAPES[next_char]
                     self._advance()  # Skip the escaped character
                 else:
-                    raise LexerError(
+                    self._fail(
                         f"Invalid escape sequence '\\{next_char}'",
                         self.line,
                         escape_start_col,
                     )
+                    # The rest of the string is still scanned as a string
+                    token_type = TokenType.ERROR
+                    value += next_char
+                    self._advance()
                 continue
 
             # Check for closing quote
             if current_char == "'":
                 value += "'"
                 self._advance()
-                self.tokens.append(
-                    Token(TokenType.STRING, value, start_line, start_column)
-                )
+                self.tokens.append(Token(token_type, value, start_line, start_column))
                 return
 
             # Add regular characters
@@ -204,7 +828,23 @@ class Lexer:
             self._advance()
 
         # If we get here, we didn't find a closing quote
-        raise LexerError("Unterminated string", start_line, start_column)
+        self._fail("Unterminated string", start_line, start_column)
+        self._skip_string(start, start_line, start_column)
+
+    def _skip_string(self, start, line, column):
+        # An unterminated string becomes an ERROR token running to the end of
+        # its first line, and scanning resumes on the next line. Each one
+        # rescans the rest of the input once, which the diagnostics limit
+        # bounds.
+        end = self.source_code.find("\n", start)
+        if end < 0:
+            end = len(self.source_code)
+        self.tokens.append(
+            Token(TokenType.ERROR, self.source_code[start:end], line, column)
+        )
+        self.position = end
+        self.line = line
+        self.column = column + end - start
 
     def _handle_identifier(self):
         start_line = self.line
@@ -261,34 +901,7 @@ class Lexer:
         # Handle multi-character operators (like '>=', '<=', '==', etc.)
         while self.position < len(self.source_code):
             current_char = self.source_code[self.position]
-            if current_char in {
-                "+",
-                "-",
-                "*",
-                "<",
-                ">",
-                "&",
-                ".",
-                "@",
-                "/",
-                ":",
-                "=",
-                "~",
-                "|",
-                "$",
-                "!",
-                "#",
-                "%",
-                "_",
-                "^",
-                "[",
-                "]",
-                "{",
-                "}",
-                '"',
-                "`",
-                "?",
-            }:
+            if current_char in OPERATOR_CHARS:
                 value += current_char
                 self._advance()
             else:
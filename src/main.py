@@ -0,0 +1,11 @@
+import os
+import sys
+
+if __name__ == "__main__":
+    # Same entry point as myrpal.py, kept for the Makefile's run target
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from src.myrpal import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+import os
+import sys
+
+if __name__ == "__main__":
+    # Run as a script, this directory comes first on sys.path, where ast.py
+    # would shadow the standard library module; import from the project root
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only what running one program needs is imported up front. Option parsing,
+# tree printing, batch mode and the front end (which a cached program skips)
+# are imported by the code paths that use them.
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if len(argv) == 1 and not argv[0].startswith("-"):
+        # myrpal.py file.rpal: argparse takes longer to import than a small
+        # cached program takes to run, so the plain case goes without it
+        return run(argv[0], os.environ.get("RPAL_CACHE_DIR") or "")
+
+    import argparse
+
+    from src.cse_machine import MEMO_SIZE
+
+    parser = argparse.ArgumentParser(prog="myrpal", description="RPAL interpreter")
+    parser.add_argument(
+        "files",
+        nargs="*",
+        metavar="file",
+        help="RPAL source file; with --batch, files and directories",
+    )
+    parser.add_argument("-ast", action="store_true", help="print the AST and stop")
+    parser.add_argument("-st", action="store_true", help="print the standardized tree")
+    parser.set_defaults(level=0)
+    parser.add_argument(
+        "-O",
+        "-O1",
+        dest="level",
+        action="store_const",
+        const=1,
+        help="fold constant operators and conditions before compiling",
+    )
+    parser.add_argument(
+        "-O2",
+        dest="level",
+        action="store_const",
+        const=2,
+        help="also drop bindings that are never used",
+    )
+    parser.add_argument(
+        "-O0", dest="level", action="store_const", const=0, help="do not optimize"
+    )
+    parser.add_argument(
+        "--memo", action="store_true", help="cache the results of function calls"
+    )
+    parser.add_argument(
+        "--memo-size",
+        type=int,
+        default=MEMO_SIZE,
+        metavar="N",
+        help=f"number of results kept by --memo (default {MEMO_SIZE})",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="always compile from source"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        default=os.environ.get("RPAL_CACHE_DIR"),
+        help="where compiled programs are kept (default ~/.cache/rpal)",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="run many programs in this process, read from stdin if none given",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="with --batch, run programs in N worker processes (0: one per CPU)",
+    )
+    parser.add_argument(
+        "--warm-cache",
+        action="store_true",
+        help="with --batch, compile programs into the cache without running them",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="report every syntax error in files and directories without running them",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="compile from source and report time, memory and counts per phase",
+    )
+    parser.add_argument(
+        "--profile-format",
+        choices=("text", "json"),
+        default="text",
+        help="format of the --profile report, written to stderr",
+    )
+    args = parser.parse_args(argv)
+    cache_dir = None if args.no_cache else args.cache_dir or ""
+    memo_size = args.memo_size if args.memo else 0
+
+    if args.check:
+        from src.batch import read_paths
+
+        return lint(args.files or read_paths(sys.stdin))
+    if args.warm_cache and (cache_dir is None or not args.batch):
+        parser.error("--warm-cache needs --batch and the cache")
+    if args.batch:
+        from src.batch import find_programs, read_paths, run_batch, write_results
+
+        paths = find_programs(args.files or read_paths(sys.stdin))
+        jobs = args.jobs or os.cpu_count() or 1
+        if args.ast or args.st or args.warm_cache:
+            stage = "compile" if args.warm_cache else "st" if args.st else "ast"
+            return front_end(paths, stage, jobs, cache_dir, args.level)
+        results = run_batch(paths, jobs, cache_dir, memo_size, args.level)
+        return 1 if write_results(results) else 0
+    if len(args.files) != 1:
+        parser.error("expected one file; use --batch to run several")
+    if args.profile:
+        return profile(args.files[0], memo_size, args.profile_format, args.level)
+    return run(args.files[0], cache_dir, memo_size, args.ast, args.st, args.level)
+
+
+def run(path, cache_dir, memo_size=0, ast=False, st=False, level=0):
+    # Runs one program, or prints its tree for -ast/-st; returns the status.
+    # level is the -O level, which -st shows the effect of.
+    try:
+        if ast or st:
+            _print_tree(path, st, level)
+            return 0
+        with open(path, "rb") as source:
+            data = source.read()
+        from src.cache import compile_source
+        from src.cse_machine import Machine
+
+        program = compile_source(data, cache_dir, level)
+        output = _Output(sys.stdout)
+        Machine(program, output, memo_size).run()
+        if output.written:
+            sys.stdout.write("\n")
+    except (OSError, UnicodeDecodeError) as error:
+        print(f"myrpal: {error}", file=sys.stderr)
+        return 1
+    except Exception as error:
+        if not isinstance(error, _errors()):
+            raise
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def front_end(paths, stage, jobs, cache_dir, level=0):
+    # -ast/-st dumps of many programs, or compiling them into the cache,
+    # with the work spread over jobs processes
+    from src.batch import Result, write_results
+    from src.pipeline import run_front_end
+
+    results = run_front_end(paths, stage, jobs, True, cache_dir, level)
+    if stage == "compile":
+        status = 0
+        for result in results:
+            if not result.ok:
+                print(f"myrpal: {result.path}: {result.error}", file=sys.stderr)
+                status = 1
+        return status
+    dumps = (
+        Result(result.path, result.value + "\n" if result.ok else "", result.error)
+        for result in results
+    )
+    return 1 if write_results(dumps) else 0
+
+
+def lint(paths):
+    # Writes path:line:column: message for each syntax error in the programs
+    # under paths; returns 1 if any program has errors
+    from src.batch import find_programs
+    from src.parser import check
+
+    status = 0
+    for path in find_programs(paths):
+        try:
+            with open(path, encoding="utf-8") as source:
+                diagnostics = check(source.read())
+        except (OSError, UnicodeDecodeError) as error:
+            print(f"myrpal: {error}", file=sys.stderr)
+            status = 1
+            continue
+        for diagnostic in diagnostics:
+            print(f"{path}:{diagnostic.line}:{diagnostic.column}: {diagnostic.message}")
+            status = 1
+    return status
+
+
+def profile(path, memo_size=0, report_format="text", level=0):
+    # Runs one program under the profiler and writes the report to stderr
+    from src.profiling import format_json, format_report, profile_source
+
+    try:
+        with open(path, encoding="utf-8") as source:
+            text = source.read()
+        output = _Output(sys.stdout)
+        profiler = profile_source(text, output, memo_size, level=level)
+        if output.written:
+            sys.stdout.write("\n")
+    except (OSError, UnicodeDecodeError) as error:
+        print(f"myrpal: {error}", file=sys.stderr)
+        return 1
+    except Exception as error:
+        if not isinstance(error, _errors()):
+            raise
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    report = profiler.report()
+    formatted = (
+        format_json(report) if report_format == "json" else format_report(report)
+    )
+    print(formatted, file=sys.stderr)
+    return 0
+
+
+def _print_tree(path, standardized, level=0):
+    from src.ast import format_tree
+    from src.parser import parse_file
+    from src.standardizer import standardize
+
+    tree = parse_file(path)
+    if standardized:
+        tree = standardize(tree)
+        if level:
+            from src.optimizer import optimize
+
+            tree = optimize(tree, level)
+    print(format_tree(tree))
+
+
+def _errors():
+    # Errors reported as RPAL errors rather than crashes. Only loaded once
+    # something has failed, so a cached run never imports the front end.
+    from src.cse_machine import CSEError
+    from src.lexer import LexerError
+    from src.parser import ParserError
+    from src.standardizer import StandardizerError
+
+    return (LexerError, ParserError, StandardizerError, CSEError)
+
+
+class _Output:
+    # Remembers whether the program printed anything, so the final newline is
+    # only added after output
+    def __init__(self, stream):
+        self.stream = stream
+        self.written = False
+
+    def write(self, text):
+        self.written = True
+        self.stream.write(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
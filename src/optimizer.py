@@ -0,0 +1,349 @@
+from src import ast
+from src.ast import NONE
+from src.cse_machine import (
+    _BINARY,
+    BUILTINS,
+    POWER,
+    CSEError,
+    String,
+    _binary,
+    format_integer,
+    parse_integer,
+)
+
+# Levels of myrpal -O. Level 1 folds operators applied to literals, Conc of
+# two literal strings and conditionals on constant truth values; level 2 also
+# drops let and where bindings that are never used. Neither changes what a
+# program prints, errors included: an operation that would fail is left for
+# the machine to report, and only a binding whose value can neither print
+# nor fail is dropped.
+LEVELS = (0, 1, 2)
+FOLD = 1
+DEAD_BINDINGS = 2
+
+# Largest integer, in bits, that folding may produce. Bigger ones, such as
+# 9 ** 9 ** 9, are left to the run, which may never need them.
+MAX_FOLDED_BITS = 4096
+
+# Leaves whose evaluation only pushes a value. A lambda only builds a closure.
+_PURE = frozenset(
+    (
+        ast.INTEGER,
+        ast.STRING,
+        ast.TRUE,
+        ast.FALSE,
+        ast.NIL,
+        ast.DUMMY,
+        ast.YSTAR,
+        ast.LAMBDA,
+    )
+)
+
+
+class Optimizer:
+    # Rewrites a standardized tree in place, like the standardizer: a folded
+    # node becomes the literal (or the branch) it evaluates to at the same
+    # index, so its parent's links stay valid.
+    def __init__(self, tree):
+        self.tree = tree
+        self.kinds = tree.kinds
+        self.values = tree.values
+        self.first_child = tree.first_child
+        self.next_sibling = tree.next_sibling
+        self._last = None
+        self._binders = None
+        self._uses = None
+        self._unbound = None
+
+    def optimize(self, root=None, level=DEAD_BINDINGS):
+        if root is None:
+            root = self.tree.root
+        if level:
+            self._number_lambdas(root)
+        if level >= FOLD:
+            self.fold(root)
+        if level >= DEAD_BINDINGS:
+            self.drop_dead_bindings(root)
+        return self.tree.node(root)
+
+    def _number_lambdas(self, root):
+        # Store in each lambda the number the compiler gives it now, which it
+        # keeps after the lambdas before it are folded or dropped away (see
+        # Compiler.compile). Closures print their number.
+        kinds = self.kinds
+        values = self.values
+        number = 0
+        for index in self.tree.preorder(root):
+            if kinds[index] == ast.LAMBDA:
+                number += 1
+                values[index] = number
+
+    def fold(self, root):
+        # In post-order, so operands are folded before their operator
+        kinds = self.kinds
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        conc = "Conc" not in self._bound_names(root)
+        # Last element of each tuple built from an aug, so a chain of augs
+        # extends it without walking the elements again
+        self._last = {}
+        for index in self.tree.postorder(root):
+            kind = kinds[index]
+            if kind in _BINARY:
+                left = first_child[index]
+                right = next_sibling[left]
+                if kind == ast.AUG:
+                    self._aug(index, left, right)
+                else:
+                    self._binary(index, _BINARY[kind], left, right)
+            elif kind == ast.NEG or kind == ast.NOT:
+                self._unary(index, kind)
+            elif kind == ast.CONDITIONAL:
+                self._conditional(index)
+            elif kind == ast.GAMMA and conc:
+                self._conc(index)
+        self._last = None
+
+    def _unary(self, index, kind):
+        value = self._literal(self.first_child[index])
+        if kind == ast.NEG and type(value) is int:
+            self._set_literal(index, -value)
+        elif kind == ast.NOT and type(value) is bool:
+            self._set_literal(index, not value)
+
+    def _conditional(self, index):
+        # B -> E1 | E2 with a literal B is the branch it selects
+        condition = self.first_child[index]
+        consequent = self.next_sibling[condition]
+        if self.kinds[condition] == ast.TRUE:
+            self._replace(index, consequent)
+        elif self.kinds[condition] == ast.FALSE:
+            self._replace(index, self.next_sibling[consequent])
+
+    def _binary(self, index, op, left, right):
+        left_value = self._literal(left)
+        right_value = self._literal(right)
+        if left_value is None or right_value is None:
+            return
+        if (
+            op == POWER
+            and type(left_value) is int
+            and type(right_value) is int
+            and (abs(left_value).bit_length() - 1) * right_value > MAX_FOLDED_BITS
+        ):
+            return
+        try:
+            value = _binary(op, left_value, right_value)
+        except CSEError:
+            return
+        self._set_literal(index, value)
+
+    def _aug(self, index, left, right):
+        # T aug E => tau(elements of T, E) when T is nil or a tau. Both
+        # evaluate E first and then the elements, and build the same tuple.
+        kind = self.kinds[left]
+        if kind == ast.NIL:
+            self.kinds[index] = ast.TAU
+            self.first_child[index] = right
+        elif kind == ast.TAU:
+            last = self._last.get(left)
+            if last is None:
+                last = self.tree.children(left)[-1]
+            self.kinds[index] = ast.TAU
+            self.first_child[index] = self.first_child[left]
+            self.next_sibling[last] = right
+        else:
+            return
+        self._last[index] = right
+
+    def _conc(self, index):
+        # gamma(gamma(Conc, 'a'), 'b') => 'ab'
+        kinds = self.kinds
+        values = self.values
+        rator = self.first_child[index]
+        rand = self.next_sibling[rator]
+        if kinds[rator] != ast.GAMMA or kinds[rand] != ast.STRING:
+            return
+        function = self.first_child[rator]
+        left = self.next_sibling[function]
+        if (
+            kinds[function] == ast.IDENTIFIER
+            and values[function] == "Conc"
+            and kinds[left] == ast.STRING
+        ):
+            self._set_literal(index, String(values[left][1:-1] + values[rand][1:-1]))
+
+    def _literal(self, index):
+        # The run-time value of a literal leaf, or None
+        kind = self.kinds[index]
+        if kind == ast.INTEGER:
+            return parse_integer(self.values[index])
+        if kind == ast.STRING:
+            return String(self.values[index][1:-1])
+        if kind == ast.TRUE:
+            return True
+        if kind == ast.FALSE:
+            return False
+        return None
+
+    def _set_literal(self, index, value):
+        kind = type(value)
+        if kind is bool:
+            self.kinds[index] = ast.TRUE if value else ast.FALSE
+            self.values[index] = None
+        elif kind is int:
+            if value.bit_length() > MAX_FOLDED_BITS:
+                return
+            self.kinds[index] = ast.INTEGER
+            self.values[index] = format_integer(value)
+        else:
+            self.kinds[index] = ast.STRING
+            self.values[index] = f"'{value}'"
+        self.first_child[index] = NONE
+
+    def _bound_names(self, root):
+        kinds = self.kinds
+        names = set()
+        for index in self.tree.preorder(root):
+            if kinds[index] == ast.LAMBDA:
+                names.update(self._parameters(self.first_child[index]))
+        return names
+
+    def _parameters(self, index):
+        kind = self.kinds[index]
+        if kind == ast.IDENTIFIER:
+            return (self.values[index],)
+        if kind == ast.COMMA:
+            return tuple(self.values[child] for child in self.tree.children(index))
+        return ()
+
+    def drop_dead_bindings(self, root):
+        # gamma(lambda(X, P), E) => P when P never uses X and E is pure.
+        # Every use of X is inside P, so going from inner bindings out, the
+        # uses in the values of bindings already dropped have been taken off
+        # X's count by the time its own binding is looked at.
+        kinds = self.kinds
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        applications = self._scan(root)
+        uses = self._uses
+        for index in reversed(applications):
+            function = first_child[index]
+            parameter = first_child[function]
+            value = next_sibling[function]
+            if (
+                kinds[parameter] == ast.IDENTIFIER
+                and not uses.get(function)
+                and self._is_pure(value)
+            ):
+                self._forget(value)
+                self._replace(index, next_sibling[parameter])
+        self._uses = self._binders = self._unbound = None
+
+    def _scan(self, root):
+        # Resolves identifiers as the compiler does. Sets _binders to the
+        # lambda binding each identifier, _uses to the number of identifiers
+        # each lambda binds and _unbound to the identifiers no lambda or
+        # builtin binds; returns the applications of lambdas, outer ones
+        # before the ones they contain.
+        kinds = self.kinds
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        self._binders = {}
+        self._uses = {}
+        self._unbound = set()
+        applications = []
+        # name -> stack of the lambdas binding it in scope
+        scopes = {}
+        # Node indices, and tuples of names whose scope ends there
+        work = [root]
+        while work:
+            item = work.pop()
+            if type(item) is tuple:
+                for name in item:
+                    scopes[name].pop()
+                continue
+            kind = kinds[item]
+            if kind == ast.IDENTIFIER:
+                self._resolve(item, scopes)
+            elif kind == ast.LAMBDA:
+                parameter = first_child[item]
+                names = self._parameters(parameter)
+                for name in names:
+                    scopes.setdefault(name, []).append(item)
+                work.append(names)
+                work.append(next_sibling[parameter])
+            else:
+                child = first_child[item]
+                if kind == ast.GAMMA and kinds[child] == ast.LAMBDA:
+                    applications.append(item)
+                while child != NONE:
+                    work.append(child)
+                    child = next_sibling[child]
+        return applications
+
+    def _resolve(self, index, scopes):
+        # Record the lambda binding the identifier at index, if any
+        name = self.values[index]
+        bindings = scopes.get(name)
+        if bindings:
+            binder = self._binders[index] = bindings[-1]
+            self._uses[binder] = self._uses.get(binder, 0) + 1
+        elif name not in BUILTINS:
+            self._unbound.add(index)
+
+    def _forget(self, index):
+        # Take the uses in the subtree at index, which is being dropped, off
+        # the counts of the lambdas they refer to
+        kinds = self.kinds
+        binders = self._binders
+        uses = self._uses
+        for child in self.tree.preorder(index):
+            if kinds[child] == ast.IDENTIFIER and child in binders:
+                uses[binders[child]] -= 1
+
+    def _is_pure(self, index):
+        # True if evaluating the subtree at index can neither print nor fail:
+        # literals, lambdas, bound identifiers, tuples of those, and Y* on a
+        # one-variable lambda (rec f = ...), which only builds a closure
+        kinds = self.kinds
+        first_child = self.first_child
+        pending = [index]
+        while pending:
+            index = pending.pop()
+            kind = kinds[index]
+            if kind == ast.IDENTIFIER:
+                if index in self._unbound:
+                    return False
+            elif kind == ast.TAU:
+                pending.extend(self.tree.children(index))
+            elif kind == ast.GAMMA:
+                rator = first_child[index]
+                rand = self.next_sibling[rator]
+                if (
+                    kinds[rator] != ast.YSTAR
+                    or kinds[rand] != ast.LAMBDA
+                    or kinds[first_child[rand]] != ast.IDENTIFIER
+                ):
+                    return False
+            elif kind not in _PURE:
+                return False
+        return True
+
+    def _replace(self, index, other):
+        # Make index a copy of node other, keeping its own place among its
+        # siblings
+        self.kinds[index] = self.kinds[other]
+        self.values[index] = self.values[other]
+        self.first_child[index] = self.first_child[other]
+        if self._last is not None and other in self._last:
+            self._last[index] = self._last[other]
+        if self._binders is not None:
+            if other in self._binders:
+                self._binders[index] = self._binders[other]
+            if other in self._unbound:
+                self._unbound.add(index)
+
+
+def optimize(node, level=DEAD_BINDINGS):
+    return Optimizer(node.tree).optimize(node.index, level)
@@ -0,0 +1,697 @@
+from src import ast
+from src.diagnostics import MAX_DIAGNOSTICS, Diagnostics
+from src.lexer import Lexer, TokenType
+
+# Identifiers reserved by the grammar; they never start an operand
+KEYWORDS = frozenset(
+    (
+        "let",
+        "in",
+        "fn",
+        "where",
+        "aug",
+        "or",
+        "not",
+        "gr",
+        "ge",
+        "ls",
+        "le",
+        "eq",
+        "ne",
+        "true",
+        "false",
+        "nil",
+        "dummy",
+        "within",
+        "and",
+        "rec",
+    )
+)
+
+# Keywords that are operands on their own (Rn -> 'true' | 'false' | ...)
+_LITERALS = frozenset(("true", "false", "nil", "dummy"))
+
+# Levels of the constructs an operand can go on with, loosest first: E
+# (let, fn), Ew (where), T (','), Ta (aug), Tc ('->'), the binary operators
+# of B .. Af, Ap ('@'), R (application) and Rn
+_EXPRESSION = -4
+_WHERE = -3
+_TUPLE = -2
+_AUG = -1
+_CONDITION = 0
+_OR = 1
+_AND = 2
+_NOT = 3
+_COMPARE = 4
+_ADD = 5
+_MULTIPLY = 6
+_POWER = 7
+_AT = 8
+_APPLY = 9
+_ATOM = 10
+_UNLIMITED = _ATOM
+# Nothing goes on after a let, fn or where, whose last part took it all
+_CLOSED = _EXPRESSION - 1
+
+# Binary operators of the B .. Af levels:
+# symbol -> (precedence, node code, right associative, non-associative)
+BINARY_OPERATORS = {
+    "or": (_OR, ast.OR, False, False),
+    "&": (_AND, ast.AMPERSAND, False, False),
+    "gr": (_COMPARE, ast.GR, False, True),
+    ">": (_COMPARE, ast.GR, False, True),
+    "ge": (_COMPARE, ast.GE, False, True),
+    ">=": (_COMPARE, ast.GE, False, True),
+    "ls": (_COMPARE, ast.LS, False, True),
+    "<": (_COMPARE, ast.LS, False, True),
+    "le": (_COMPARE, ast.LE, False, True),
+    "<=": (_COMPARE, ast.LE, False, True),
+    "eq": (_COMPARE, ast.EQ, False, True),
+    "ne": (_COMPARE, ast.NE, False, True),
+    "+": (_ADD, ast.PLUS, False, False),
+    "-": (_ADD, ast.MINUS, False, False),
+    "*": (_MULTIPLY, ast.MULTIPLY, False, False),
+    "/": (_MULTIPLY, ast.DIVIDE, False, False),
+    "**": (_POWER, ast.POWER, True, False),
+}
+
+# Symbols that go on with the operand before them, by level. Other keywords
+# end the operand (None); any other identifier is applied to it.
+_SYMBOL_LEVELS = {
+    **dict.fromkeys(KEYWORDS - _LITERALS),
+    **{symbol: operator[0] for symbol, operator in BINARY_OPERATORS.items()},
+    "where": _WHERE,
+    "aug": _AUG,
+    "->": _CONDITION,
+    "@": _AT,
+}
+
+# Symbols that start an operand with a prefix, by the loosest level the
+# operand may be at
+_PREFIXES = {"let": _EXPRESSION, "fn": _EXPRESSION, "not": _NOT, "-": _ADD, "+": _ADD}
+
+_SYMBOLS = (TokenType.IDENTIFIER, TokenType.OPERATOR)
+# Levels of the other tokens that go on with an operand. Anything but an
+# identifier that begins an Rn is applied to it; ERROR tokens only reach
+# the parser from a recovering lexer and stand for a bad operand.
+_TOKEN_LEVELS = {
+    TokenType.INTEGER: _APPLY,
+    TokenType.STRING: _APPLY,
+    TokenType.LPAREN: _APPLY,
+    TokenType.ERROR: _APPLY,
+    TokenType.COMMA: _TUPLE,
+}
+
+# Kinds of the frames on the parse stack; each is an index into
+# Parser._reducers
+(
+    _ROOT_FRAME,
+    _RECOVER_FRAME,
+    _GROUP_FRAME,
+    _LET_FRAME,
+    _LAMBDA_FRAME,
+    _NOT_FRAME,
+    _NEG_FRAME,
+    _BINARY_FRAME,
+    _AT_FRAME,
+    _APPLY_FRAME,
+    _TUPLE_FRAME,
+    _CONDITION_FRAME,
+    _WHERE_FRAME,
+    _D_FRAME,
+    _REC_FRAME,
+    _DB_GROUP_FRAME,
+    _DB_FRAME,
+) = range(17)
+
+# Tokens a recovering parse skips to after an error in a definition. Every
+# skip also stops at ';', at a ')' closing an open group and at the end of
+# input.
+_DEFINITION_SYNC = frozenset(("and", "within", "in"))
+_LET_SYNC = frozenset(("in",))
+_NO_SYNC = frozenset()
+
+
+class ParserError(Exception):
+    def __init__(self, message, line, column):
+        super().__init__(f"{message} at line {line}, column {column}")
+        self.message = message
+        self.line = line
+        self.column = column
+
+
+class Parser:
+    # Expressions and definitions are parsed without recursion, so nesting
+    # is only bounded by memory. A stack holds a frame for every construct
+    # waiting for a part: a step starts a part (_operand, _start_d and the
+    # like) or goes on from one just parsed (_operator, _defined), and
+    # returns the next step. A frame is [kind, level, limit, ...], where
+    # level is the loosest construct its part may extend to and limit the
+    # tightest that may follow the node it makes, kept in self._limit. As in
+    # precedence climbing, a binary operator keeps the limit of the operand
+    # before it, except that a non-associative one bars its own level.
+    def __init__(self, tokens, diagnostics=None):
+        # Any iterable of tokens: a list, Lexer.iter_tokens() or a TokenBuffer.
+        # Tokens are pulled one at a time, so parsing overlaps with scanning.
+        self._tokens = iter(tokens)
+        # With a Diagnostics, syntax errors are recorded there and parsing
+        # goes on in panic mode: the input is skipped up to a point where
+        # the grammar can resume, and an error node stands in for it
+        self.diagnostics = diagnostics
+        # Position where the last skip stopped; an error there is a knock-on
+        # of the one already reported
+        self._resync = None
+        # Parenthesized groups being parsed, so a skip can tell a ')' that
+        # closes one of them from a stray one
+        self._groups = 0
+        self._limit = _UNLIMITED
+        # Indexed by frame kind
+        self._reducers = (
+            self._reduce_root,
+            self._reduce_recover,
+            self._reduce_group,
+            self._reduce_let,
+            self._reduce_lambda,
+            self._reduce_not,
+            self._reduce_neg,
+            self._reduce_binary,
+            self._reduce_at,
+            self._reduce_apply,
+            self._reduce_tuple,
+            self._reduce_conditional,
+            self._reduce_where,
+            self._reduce_d,
+            self._reduce_rec,
+            self._reduce_db_group,
+            self._reduce_db,
+        )
+        self.tree = ast.AST()
+        self._add = self.tree.add
+        self.type = None
+        self.value = None
+        self.line = 1
+        self.column = 1
+        self._advance()
+
+    def parse(self):
+        # Returns a view of the root node; the flat tree is self.tree
+        root = self._e(_NO_SYNC)
+        if self.type is not TokenType.EOF:
+            if self.diagnostics is None:
+                self._error("Expected end of input")
+            self._recover_trailing()
+        self.tree.root = root
+        return self.tree.node(root)
+
+    def _e(self, sync=None):
+        return self._parse(self._operand, _EXPRESSION, sync, None)
+
+    def _db(self):
+        return self._parse(self._start_db, None, None, self._defined)
+
+    def _parse(self, step, argument, sync, defined):
+        # Runs steps from the first until the root frame takes the node.
+        # defined is None for an expression and _defined for a definition.
+        stack = [[_ROOT_FRAME, _EXPRESSION, _UNLIMITED]]
+        if sync is not None:
+            self._protect(stack, sync, defined)
+        while True:
+            try:
+                while stack:
+                    step, argument = step(stack, argument)
+                return argument
+            except ParserError as error:
+                step, argument = self._recover(stack, error)
+
+    # Error recovery
+
+    def _protect(self, stack, sync, defined):
+        # When recovering, an error in the part parsed above this frame is
+        # reported and the part replaced by an error node, after skipping to
+        # the next token in sync (see _recover)
+        if self.diagnostics is not None:
+            stack.append(
+                [_RECOVER_FRAME, _EXPRESSION, _UNLIMITED, sync, self._groups, defined]
+            )
+
+    def _recover(self, stack, error):
+        # Drop the frames above the innermost recovery frame and give it an
+        # error node in place of its part, or raise error if there is none
+        if self.diagnostics is not None:
+            for index in range(len(stack) - 1, -1, -1):
+                frame = stack[index]
+                if frame[0] == _RECOVER_FRAME:
+                    del stack[index:]
+                    self._groups = frame[4]
+                    self._report(error)
+                    self._skip(frame[3])
+                    self._limit = _CLOSED
+                    return frame[5] or self._operator, self._add(ast.ERROR)
+        raise error
+
+    def _recover_trailing(self):
+        # Input left after the program: report it, and parse whatever
+        # follows each ';' or stray ')' for further errors
+        while self.type is not TokenType.EOF:
+            try:
+                self._error("Expected end of input")
+            except ParserError as error:
+                self._report(error)
+            self._skip(_NO_SYNC)
+            if self.type is not TokenType.EOF:
+                self._advance()
+                self._e(_NO_SYNC)
+
+    def _report(self, error):
+        # Errors at an ERROR token were reported by the lexer
+        if self.type is TokenType.ERROR or (error.line, error.column) == self._resync:
+            return
+        self.diagnostics.report(error.message, error.line, error.column)
+        if self.diagnostics.full:
+            # Nothing more can be reported; end the input here
+            self._tokens = iter(())
+            self._advance()
+
+    def _skip(self, sync):
+        # Panic mode: drop tokens up to one in sync outside parentheses, a
+        # ';', a ')' closing an open group or the end of input. Tokens are
+        # only ever skipped forward, so recovery keeps the parse linear.
+        depth = 0
+        while True:
+            token_type = self.type
+            if token_type is TokenType.EOF:
+                break
+            if token_type is TokenType.LPAREN:
+                depth += 1
+            elif token_type is TokenType.RPAREN:
+                if depth:
+                    depth -= 1
+                elif self._groups:
+                    break
+            elif not depth and (
+                token_type is TokenType.SEMICOLON
+                or (token_type is TokenType.IDENTIFIER and self.value in sync)
+            ):
+                break
+            self._advance()
+        self._resync = (self.line, self.column)
+
+    # Token handling
+
+    def _advance(self):
+        for token in self._tokens:
+            if token.type is not TokenType.COMMENT:
+                break
+        else:
+            # Input without an EOF token ends here
+            self.type = TokenType.EOF
+            self.value = ""
+            return
+        self.type = token.type
+        self.value = token.value
+        self.line = token.line
+        self.column = token.column
+
+    def _error(self, message):
+        found = "end of input" if self.type is TokenType.EOF else f"'{self.value}'"
+        raise ParserError(f"{message} but found {found}", self.line, self.column)
+
+    def _at(self, symbol):
+        return self.value == symbol and self.type in _SYMBOLS
+
+    def _expect(self, symbol):
+        if self.value != symbol or self.type not in _SYMBOLS:
+            self._error(f"Expected '{symbol}'")
+        self._advance()
+
+    def _expect_punctuation(self, token_type, symbol):
+        if self.type is not token_type:
+            self._error(f"Expected '{symbol}'")
+        self._advance()
+
+    def _identifier(self):
+        if self.type is not TokenType.IDENTIFIER or self.value in KEYWORDS:
+            self._error("Expected an identifier")
+        index = self._add(ast.IDENTIFIER, value=self.value)
+        self._advance()
+        return index
+
+    def _leaf(self):
+        # An Rn other than a parenthesized E
+        token_type = self.type
+        value = self.value
+        if token_type is TokenType.IDENTIFIER:
+            if value in _LITERALS:
+                index = self._add(ast.CODES[value])
+            elif value in KEYWORDS:
+                self._error("Expected an operand")
+            else:
+                index = self._add(ast.IDENTIFIER, value=value)
+        elif token_type is TokenType.INTEGER:
+            index = self._add(ast.INTEGER, value=value)
+        elif token_type is TokenType.STRING:
+            index = self._add(ast.STRING, value=value)
+        elif token_type is TokenType.ERROR:
+            index = self._add(ast.ERROR)
+        else:
+            self._error("Expected an operand")
+        self._advance()
+        return index
+
+    def _level(self):
+        # Level of the construct the current token goes on with the operand
+        # before it, or None if the token ends the operand
+        token_type = self.type
+        if token_type is TokenType.IDENTIFIER:
+            return _SYMBOL_LEVELS.get(self.value, _APPLY)
+        if token_type is TokenType.OPERATOR:
+            return _SYMBOL_LEVELS.get(self.value)
+        return _TOKEN_LEVELS.get(token_type)
+
+    # Expressions
+
+    def _operand(self, stack, level):
+        # An operand that may be as loose as level. Prefixes push a frame
+        # for the operand after them: E -> 'let' D 'in' E | 'fn' Vb+ '.' E,
+        # Bs -> 'not' Bp and A -> ('+' | '-') At.
+        while self.type in _SYMBOLS and _PREFIXES.get(self.value, _CLOSED) >= level:
+            prefix = self.value
+            self._advance()
+            if prefix == "let":
+                stack.append([_LET_FRAME, _EXPRESSION, _CLOSED, None])
+                self._protect(stack, _LET_SYNC, self._defined)
+                return self._start_d(stack, None)
+            if prefix == "fn":
+                variables = [self._vb()]
+                while not self._at("."):
+                    variables.append(self._vb())
+                self._advance()
+                stack.append([_LAMBDA_FRAME, _EXPRESSION, _CLOSED, variables])
+            elif prefix == "not":
+                stack.append([_NOT_FRAME, _COMPARE, _AND])
+            else:
+                stack.append([_NEG_FRAME, _MULTIPLY, _ADD, prefix == "-"])
+            level = stack[-1][1]
+        if self.type is TokenType.LPAREN:
+            # Rn -> '(' E ')'
+            self._advance()
+            self._groups += 1
+            stack.append([_GROUP_FRAME, _EXPRESSION, _UNLIMITED])
+            self._protect(stack, _NO_SYNC, None)
+            return self._operand, _EXPRESSION
+        self._limit = _UNLIMITED
+        return self._operator(stack, self._leaf())
+
+    def _operator(self, stack, tree):
+        # Go on from the operand tree with the constructs that may follow
+        # it, or hand it to the frames waiting for it
+        # Reducers that return no step leave the current token alone, so
+        # its level holds until an operand is taken
+        reducers = self._reducers
+        level = self._level()
+        while stack:
+            frame = stack[-1]
+            if level is not None and frame[1] <= level <= self._limit:
+                if level == _APPLY and self.type is not TokenType.LPAREN:
+                    # R -> R Rn
+                    tree = self._add(ast.GAMMA, [tree, self._leaf()])
+                else:
+                    level = self._extend(stack, tree, level)
+                    if level is None:
+                        return self._start_dr(stack, None)
+                    if not self._plain():
+                        return self._operand, level
+                    # The usual operand needs no step of its own
+                    self._limit = _UNLIMITED
+                    tree = self._leaf()
+                level = self._level()
+                continue
+            step, tree = reducers[frame[0]](stack, frame, tree)
+            if step is not None:
+                return step, tree
+        return None, tree
+
+    def _plain(self):
+        # Whether the current token is an operand without prefix or group
+        if self.type in _SYMBOLS:
+            return self.value not in _PREFIXES
+        return self.type is not TokenType.LPAREN
+
+    def _extend(self, stack, tree, level):
+        # Push a frame for the construct at the current token, which goes on
+        # with tree. Returns the level of the operand that comes next, or
+        # None for the definition after 'where'.
+        if level == _APPLY:
+            stack.append([_APPLY_FRAME, _ATOM, self._limit, tree])
+            return _ATOM
+        symbol = self.value
+        self._advance()
+        if _OR <= level <= _POWER:
+            precedence, kind, right_associative, non_associative = BINARY_OPERATORS[
+                symbol
+            ]
+            frame = [
+                _BINARY_FRAME,
+                precedence if right_associative else precedence + 1,
+                precedence - 1 if non_associative else self._limit,
+                tree,
+                kind,
+            ]
+        elif level == _AT:
+            # Ap -> Ap '@' '<IDENTIFIER>' R
+            frame = [_AT_FRAME, _APPLY, self._limit, tree, self._identifier()]
+        elif level == _TUPLE:
+            # T -> Ta (',' Ta)+
+            frame = [_TUPLE_FRAME, _AUG, _TUPLE, [tree]]
+        elif level == _CONDITION:
+            # Tc -> B '->' Tc '|' Tc
+            frame = [_CONDITION_FRAME, _CONDITION, _CONDITION, tree, None]
+        elif level == _AUG:
+            # Ta -> Ta 'aug' Tc
+            frame = [_BINARY_FRAME, _CONDITION, _AUG, tree, ast.AUG]
+        else:
+            # Ew -> T 'where' Dr
+            stack.append([_WHERE_FRAME, _EXPRESSION, _CLOSED, tree])
+            return None
+        stack.append(frame)
+        return frame[1]
+
+    # Each reducer takes the part its frame waits for. It returns the next
+    # step and its argument, or None and a node that goes on as an operand.
+
+    def _reduce_root(self, stack, frame, tree):
+        stack.pop()
+        return None, tree
+
+    def _reduce_recover(self, stack, frame, tree):
+        stack.pop()
+        return frame[5], tree
+
+    def _reduce_group(self, stack, frame, tree):
+        self._expect_punctuation(TokenType.RPAREN, ")")
+        self._groups -= 1
+        stack.pop()
+        self._limit = _UNLIMITED
+        return self._operator, tree
+
+    def _reduce_let(self, stack, frame, tree):
+        if frame[3] is None:
+            # The definition; the body follows 'in'
+            self._expect("in")
+            frame[3] = tree
+            return self._operand, _EXPRESSION
+        stack.pop()
+        self._limit = _CLOSED
+        return None, self._add(ast.LET, [frame[3], tree])
+
+    def _reduce_lambda(self, stack, frame, tree):
+        stack.pop()
+        self._limit = _CLOSED
+        frame[3].append(tree)
+        return None, self._add(ast.LAMBDA, frame[3])
+
+    def _reduce_not(self, stack, frame, tree):
+        stack.pop()
+        self._limit = frame[2]
+        return None, self._add(ast.NOT, [tree])
+
+    def _reduce_neg(self, stack, frame, tree):
+        stack.pop()
+        self._limit = frame[2]
+        if frame[3]:
+            tree = self._add(ast.NEG, [tree])
+        return None, tree
+
+    def _reduce_binary(self, stack, frame, tree):
+        stack.pop()
+        self._limit = frame[2]
+        return None, self._add(frame[4], [frame[3], tree])
+
+    def _reduce_at(self, stack, frame, tree):
+        stack.pop()
+        self._limit = frame[2]
+        return None, self._add(ast.AT, [frame[3], frame[4], tree])
+
+    def _reduce_apply(self, stack, frame, tree):
+        stack.pop()
+        self._limit = frame[2]
+        return None, self._add(ast.GAMMA, [frame[3], tree])
+
+    def _reduce_tuple(self, stack, frame, tree):
+        frame[3].append(tree)
+        if self.type is TokenType.COMMA:
+            self._advance()
+            return self._operand, _AUG
+        stack.pop()
+        self._limit = frame[2]
+        return None, self._add(ast.TAU, frame[3])
+
+    def _reduce_conditional(self, stack, frame, tree):
+        if frame[4] is None:
+            # The consequent; the alternative follows '|'
+            self._expect("|")
+            frame[4] = tree
+            return self._operand, _CONDITION
+        stack.pop()
+        self._limit = frame[2]
+        return None, self._add(ast.CONDITIONAL, [frame[3], frame[4], tree])
+
+    def _reduce_where(self, stack, frame, tree):
+        stack.pop()
+        self._limit = _CLOSED
+        return None, self._add(ast.WHERE, [frame[3], tree])
+
+    # Definitions
+
+    def _start_d(self, stack, argument):
+        # D -> Da 'within' D | Da and Da -> Dr ('and' Dr)+ | Dr, in one
+        # frame holding the Da parts before 'within' and the Dr parts of
+        # the current Da
+        stack.append([_D_FRAME, _EXPRESSION, _UNLIMITED, [], []])
+        return self._start_dr(stack, None)
+
+    def _start_dr(self, stack, argument):
+        # Dr -> 'rec' Db | Db
+        if self._at("rec"):
+            self._advance()
+            stack.append([_REC_FRAME, _EXPRESSION, _UNLIMITED])
+        self._protect(stack, _DEFINITION_SYNC, self._defined)
+        return self._start_db(stack, None)
+
+    def _start_db(self, stack, argument):
+        # Db -> Vl '=' E | '<IDENTIFIER>' Vb+ '=' E | '(' D ')'
+        mark = self._db_started()
+        if self.type is TokenType.LPAREN:
+            self._advance()
+            self._groups += 1
+            stack.append([_DB_GROUP_FRAME, _EXPRESSION, _UNLIMITED, mark])
+            self._protect(stack, _NO_SYNC, self._defined)
+            return self._start_d, None
+        name = self._identifier()
+        if self.type is TokenType.COMMA or self._at("="):
+            children = [self._vl(name)]
+            self._expect("=")
+            kind = ast.EQUAL
+        else:
+            children = [name, self._vb()]
+            while not self._at("="):
+                children.append(self._vb())
+            self._advance()
+            kind = ast.FUNCTION_FORM
+        stack.append([_DB_FRAME, _EXPRESSION, _UNLIMITED, mark, kind, children])
+        return self._operand, _EXPRESSION
+
+    def _defined(self, stack, tree):
+        # A definition is complete; the frame waiting for it takes it
+        frame = stack[-1]
+        step, tree = self._reducers[frame[0]](stack, frame, tree)
+        return step or self._operator, tree
+
+    def _reduce_d(self, stack, frame, tree):
+        children = frame[4]
+        children.append(tree)
+        if self._at("and"):
+            self._advance()
+            return self._start_dr(stack, None)
+        if len(children) > 1:
+            tree = self._add(ast.AND, children)
+        parts = frame[3]
+        if self._at("within"):
+            self._advance()
+            parts.append(tree)
+            frame[4] = []
+            return self._start_dr(stack, None)
+        stack.pop()
+        while parts:
+            tree = self._add(ast.WITHIN, [parts.pop(), tree])
+        return self._defined, tree
+
+    def _reduce_rec(self, stack, frame, tree):
+        stack.pop()
+        return self._defined, self._add(ast.REC, [tree])
+
+    def _reduce_db_group(self, stack, frame, tree):
+        self._expect_punctuation(TokenType.RPAREN, ")")
+        self._groups -= 1
+        stack.pop()
+        self._db_finished(tree, frame[3])
+        return self._defined, tree
+
+    def _reduce_db(self, stack, frame, tree):
+        stack.pop()
+        frame[5].append(tree)
+        node = self._add(frame[4], frame[5])
+        self._db_finished(node, frame[3])
+        return self._defined, node
+
+    def _db_started(self):
+        # Hooks around each Db for subclasses: the value returned here is
+        # passed to _db_finished with the Db's node
+        return None
+
+    def _db_finished(self, node, mark):
+        pass
+
+    # Variables
+
+    def _vb(self):
+        # Vb -> '<IDENTIFIER>' | '(' Vl ')' | '(' ')'
+        if self.type is TokenType.LPAREN:
+            self._advance()
+            if self.type is TokenType.RPAREN:
+                self._advance()
+                return self._add(ast.EMPTY)
+            tree = self._vl(self._identifier())
+            self._expect_punctuation(TokenType.RPAREN, ")")
+            return tree
+        return self._identifier()
+
+    def _vl(self, first):
+        # Vl -> '<IDENTIFIER>' list ','
+        if self.type is not TokenType.COMMA:
+            return first
+        names = [first]
+        while self.type is TokenType.COMMA:
+            self._advance()
+            names.append(self._identifier())
+        return self._add(ast.COMMA, names)
+
+
+def parse(source_code):
+    return Parser(Lexer(source_code, skip_comments=True).iter_tokens()).parse()
+
+
+def check(source_code, limit=MAX_DIAGNOSTICS):
+    # Lex and parse source_code, recovering from errors, and return up to
+    # limit diagnostics in source order; an empty list means it parses
+    diagnostics = Diagnostics(limit)
+    lexer = Lexer(source_code, skip_comments=True, diagnostics=diagnostics)
+    Parser(lexer.iter_tokens(), diagnostics).parse()
+    return diagnostics.sorted()
+
+
+def parse_file(path):
+    # Parse a file through a memory-mapped, columnar scan; see
+    # Lexer.tokenize_mapped
+    tokens = Lexer(None, skip_comments=True).tokenize_mapped(path)
+    return Parser(tokens).parse()
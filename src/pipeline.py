@@ -0,0 +1,117 @@
+import os
+from functools import partial
+
+# Runs the front end (lex, parse, standardize, and optionally compile) over
+# many files in a pool of worker processes. Work is handed out in chunks of
+# files of about equal total size: small files share a round trip to a
+# worker and a large one is not stuck behind others. Results come back as
+# flat data (the AST arrays, a formatted dump or compiled codes), which
+# pickles as a few byte strings rather than an object per node.
+
+STAGES = ("ast", "st", "compile")
+
+# Chunks handed to each worker, so that workers finishing early find more
+CHUNKS_PER_JOB = 4
+
+# Smallest chunk, in bytes of source, worth a round trip to a worker
+MIN_CHUNK_BYTES = 1 << 16
+
+
+class Processed:
+    # What the front end made of one file. value is the flat AST for "ast"
+    # and "st", its dump with text=True, and the compiled codes for
+    # "compile"; error is the message of the error that stopped it.
+    __slots__ = ("path", "value", "error")
+
+    def __init__(self, path, value, error=None):
+        self.path = path
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def process_file(path, stage="st", text=False, cache_dir=None, level=0):
+    # Any failure is caught and reported in the result, as in a batch.
+    # level is the optimization level applied after standardizing.
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage '{stage}'")
+    try:
+        if stage == "compile":
+            from src.cache import compile_source, program_codes
+
+            with open(path, "rb") as source:
+                data = source.read()
+            program = compile_source(data, cache_dir, level)
+            return Processed(path, program_codes(program))
+        from src.parser import parse_file
+
+        tree = parse_file(path)
+        if stage == "st":
+            from src.standardizer import standardize
+
+            tree = standardize(tree)
+            if level:
+                from src.optimizer import optimize
+
+                tree = optimize(tree, level)
+        if text:
+            from src.ast import format_tree
+
+            return Processed(path, format_tree(tree))
+        return Processed(path, tree.tree)
+    except Exception as error:
+        return Processed(path, None, str(error) or repr(error))
+
+
+def _process_chunk(paths, stage, text, cache_dir, level):
+    return [process_file(path, stage, text, cache_dir, level) for path in paths]
+
+
+def chunks(paths, jobs):
+    # Split paths, keeping their order, into runs of about equal source size
+    sizes = [_size(path) for path in paths]
+    target = max(sum(sizes) / (jobs * CHUNKS_PER_JOB), MIN_CHUNK_BYTES)
+    chunk = []
+    size = 0
+    for path, path_size in zip(paths, sizes):
+        chunk.append(path)
+        size += path_size
+        if size >= target:
+            yield chunk
+            chunk = []
+            size = 0
+    if chunk:
+        yield chunk
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        # Reported when the file is read
+        return 0
+
+
+def run_front_end(paths, stage="st", jobs=None, text=False, cache_dir=None, level=0):
+    # Results in the order of paths. jobs defaults to the number of CPUs;
+    # with one job everything runs in this process.
+    paths = list(paths)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield process_file(path, stage, text, cache_dir, level)
+        return
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage '{stage}'")
+    from concurrent.futures import ProcessPoolExecutor
+
+    run = partial(
+        _process_chunk, stage=stage, text=text, cache_dir=cache_dir, level=level
+    )
+    work = list(chunks(paths, jobs))
+    with ProcessPoolExecutor(max_workers=min(jobs, len(work))) as pool:
+        for results in pool.map(run, work):
+            yield from results
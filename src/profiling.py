@@ -0,0 +1,239 @@
+import json
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from src.cse_machine import BETA, GAMMA, LAMBDA, Closure, Machine, compile_tree
+from src.lexer import Lexer
+from src.optimizer import optimize
+from src.parser import Parser
+from src.standardizer import standardize
+
+PHASES = ("lex", "parse", "standardize", "compile", "evaluate")
+
+
+class PhaseEvent:
+    # Sent to subscribers at the end of each phase. peak_memory is the peak
+    # number of bytes allocated during the phase, or None without tracing.
+    __slots__ = ("name", "seconds", "peak_memory")
+
+    def __init__(self, name, seconds, peak_memory):
+        self.name = name
+        self.seconds = seconds
+        self.peak_memory = peak_memory
+
+
+class Profiler:
+    # Times phases and collects counts. Embedding code can call subscribe()
+    # to receive a PhaseEvent as each phase finishes, and phase() to time its
+    # own steps the same way.
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.events = []
+        self.counts = {}
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def _finish(self, event):
+        self.events.append(event)
+        for callback in self._subscribers:
+            callback(event)
+
+    def report(self):
+        return {
+            "phases": [
+                {
+                    "name": event.name,
+                    "seconds": event.seconds,
+                    "peak_memory": event.peak_memory,
+                }
+                for event in self.events
+            ],
+            "total_seconds": sum(event.seconds for event in self.events),
+            "counts": dict(self.counts),
+        }
+
+
+class _Phase:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        if self.profiler.trace_memory:
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self._base = tracemalloc.get_traced_memory()[0]
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._start
+        peak = None
+        if self.profiler.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] - self._base
+            if self._started_tracing:
+                tracemalloc.stop()
+        self.profiler._finish(PhaseEvent(self.name, seconds, peak))
+        return False
+
+
+class _CountingControl(list):
+    # Control stack that counts the machine's steps as they are popped. The
+    # rator of a GAMMA is on top of the value stack when the GAMMA is popped,
+    # and its rand below it.
+    def __init__(self, instructions, stack, ystar):
+        super().__init__(instructions)
+        self.stack = stack
+        self.ystar = ystar
+        self.steps = 0
+        self.closures = 0
+        # Closure applications, and the frames Y* makes for rec (f, g) = E
+        self.applications = 0
+        self.tied = 0
+        self.max_control = 0
+        self.max_stack = 0
+
+    def pop(self):
+        if len(self) > self.max_control:
+            self.max_control = len(self)
+        instruction = list.pop(self)
+        self.steps += 1
+        op = instruction[0]
+        stack = self.stack
+        if op == LAMBDA:
+            self.closures += 1
+        elif op == GAMMA:
+            rator = stack[-1]
+            if type(rator) is Closure:
+                self.applications += 1
+            elif (
+                rator is self.ystar
+                and type(stack[-2]) is Closure
+                and stack[-2].code.arity > 1
+            ):
+                self.tied += 1
+        if len(stack) > self.max_stack:
+            self.max_stack = len(stack)
+        return instruction
+
+
+class _CountingMemo(OrderedDict):
+    # Memo that counts the applications it answers
+    def __init__(self):
+        super().__init__()
+        self.hits = 0
+
+    def get(self, key, default=None):
+        result = OrderedDict.get(self, key, default)
+        if result is not default:
+            self.hits += 1
+        return result
+
+
+class ProfilingMachine(Machine):
+    def __init__(self, program, output=None, memo_size=0):
+        super().__init__(program, output, memo_size)
+        if self.memo is not None:
+            self.memo = _CountingMemo()
+
+    def _stacks(self):
+        stack = []
+        instructions = self.codes[0].instructions
+        self.control = _CountingControl(instructions, stack, self.builtins["Y*"])
+        return self.control, stack
+
+
+def profile_source(
+    text, output=None, memo_size=0, profiler=None, count_steps=True, level=0
+):
+    # Runs the program in text phase by phase and returns the profiler. The
+    # machine counts slow evaluation down; count_steps=False leaves them out
+    # when only the timings matter. With an optimization level, an
+    # "optimize" phase runs between standardize and compile.
+    if profiler is None:
+        profiler = Profiler()
+    counts = profiler.counts
+    with profiler.phase("lex"):
+        tokens = Lexer(text, skip_comments=True).tokenize()
+    counts["tokens"] = len(tokens)
+    with profiler.phase("parse"):
+        tree = Parser(tokens).parse()
+    counts["ast_nodes"] = len(tree.tree)
+    with profiler.phase("standardize"):
+        tree = standardize(tree)
+    counts["standardized_nodes"] = len(tree.tree)
+    if level:
+        with profiler.phase("optimize"):
+            tree = optimize(tree, level)
+    with profiler.phase("compile"):
+        program = compile_tree(tree)
+    counts["control_structures"] = len(program.codes)
+    counts["instructions"] = _instructions(program)
+    if not count_steps:
+        with profiler.phase("evaluate"):
+            Machine(program, output, memo_size).run()
+        return profiler
+    machine = ProfilingMachine(program, output, memo_size)
+    try:
+        with profiler.phase("evaluate"):
+            machine.run()
+    finally:
+        control = machine.control
+        counts["cse_steps"] = control.steps
+        counts["closures_created"] = control.closures
+        # Every closure application binds a new environment frame, except
+        # those answered by the memo, which binds none
+        hits = machine.memo.hits if machine.memo is not None else 0
+        counts["environment_frames"] = control.applications - hits + control.tied
+        counts["memo_hits"] = hits
+        counts["max_control_depth"] = control.max_control
+        counts["max_stack_depth"] = control.max_stack
+    return profiler
+
+
+def _instructions(program):
+    total = 0
+    pending = [code.instructions for code in program.codes]
+    while pending:
+        instructions = pending.pop()
+        total += len(instructions)
+        for op, arg in instructions:
+            if op == BETA:
+                pending.extend(arg)
+    return total
+
+
+def format_report(report):
+    lines = [f"{'phase':<12} {'seconds':>10} {'peak memory':>14}"]
+    for phase in report["phases"]:
+        memory = phase["peak_memory"]
+        memory = "-" if memory is None else _bytes(memory)
+        lines.append(f"{phase['name']:<12} {phase['seconds']:>10.6f} {memory:>14}")
+    lines.append(f"{'total':<12} {report['total_seconds']:>10.6f}")
+    lines.append("")
+    for name, value in report["counts"].items():
+        lines.append(f"{name.replace('_', ' '):<22} {value:>12}")
+    return "\n".join(lines)
+
+
+def format_json(report):
+    return json.dumps(report, indent=2)
+
+
+def _bytes(count):
+    for unit in ("B", "KiB", "MiB"):
+        if count < 1024:
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GiB"
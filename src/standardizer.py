@@ -0,0 +1,170 @@
+from src import ast
+from src.ast import NONE
+
+
+class StandardizerError(Exception):
+    pass
+
+
+class Standardizer:
+    # Rewrites an AST into the standardized tree in place. Nodes are visited
+    # in post-order, so every child is already standard when its parent is
+    # rewritten. Each rule keeps the rewritten subtree rooted at the same
+    # index and relinks the existing nodes; new nodes are only allocated
+    # where the standard form has more nodes than the original.
+    def __init__(self, tree):
+        self.tree = tree
+        self.kinds = tree.kinds
+        self.first_child = tree.first_child
+        self.next_sibling = tree.next_sibling
+        self._rules = {
+            ast.LET: self._let,
+            ast.WHERE: self._where,
+            ast.FUNCTION_FORM: self._function_form,
+            ast.LAMBDA: self._lambda,
+            ast.WITHIN: self._within,
+            ast.REC: self._rec,
+            ast.AND: self._and,
+            ast.AT: self._at,
+        }
+
+    def standardize(self, root=None):
+        if root is None:
+            root = self.tree.root
+        kinds = self.kinds
+        rules = self._rules
+        for index in self.tree.postorder(root):
+            rule = rules.get(kinds[index])
+            if rule is not None:
+                rule(index)
+        return self.tree.node(root)
+
+    def _binding(self, index, context):
+        # The two children of a standardized '=' node
+        if self.kinds[index] != ast.EQUAL:
+            found = ast.LABELS[self.kinds[index]]
+            raise StandardizerError(f"Expected '=' in {context} but found '{found}'")
+        name = self.first_child[index]
+        return name, self.next_sibling[name]
+
+    def _let(self, index):
+        # let(=(X, E), P) => gamma(lambda(X, P), E)
+        binding = self.first_child[index]
+        body = self.next_sibling[binding]
+        self._apply_lambda(index, binding, body, "let")
+
+    def _where(self, index):
+        # where(P, =(X, E)) => gamma(lambda(X, P), E)
+        body = self.first_child[index]
+        binding = self.next_sibling[body]
+        self.first_child[index] = binding
+        self._apply_lambda(index, binding, body, "where")
+
+    def _apply_lambda(self, index, binding, body, context):
+        # index becomes gamma(binding, E) and binding becomes lambda(X, body)
+        next_sibling = self.next_sibling
+        name, value = self._binding(binding, context)
+        self.kinds[index] = ast.GAMMA
+        self.kinds[binding] = ast.LAMBDA
+        next_sibling[name] = body
+        next_sibling[body] = NONE
+        next_sibling[binding] = value
+        next_sibling[value] = NONE
+
+    def _function_form(self, index):
+        # function_form(P, V1, ..., Vn, E) => =(P, lambda(V1, ... lambda(Vn, E)))
+        name = self.first_child[index]
+        children = self.tree.children(index)
+        self.kinds[index] = ast.EQUAL
+        self.next_sibling[name] = self._curry(children[1:-1], children[-1])
+
+    def _lambda(self, index):
+        # lambda(V1, ..., Vn, E) => lambda(V1, lambda(V2, ... lambda(Vn, E)))
+        first = self.first_child[index]
+        rest = self.next_sibling[first]
+        if self.next_sibling[rest] == NONE:
+            return
+        children = self.tree.children(index)
+        self.next_sibling[first] = self._curry(children[1:-1], children[-1])
+
+    def _curry(self, variables, body):
+        add = self.tree.add
+        for variable in reversed(variables):
+            body = add(ast.LAMBDA, (variable, body))
+        return body
+
+    def _within(self, index):
+        # within(=(X1, E1), =(X2, E2)) => =(X2, gamma(lambda(X1, E2), E1))
+        next_sibling = self.next_sibling
+        inner = self.first_child[index]
+        outer = next_sibling[inner]
+        name1, value1 = self._binding(inner, "within")
+        name2, value2 = self._binding(outer, "within")
+        self.kinds[index] = ast.EQUAL
+        self.first_child[index] = name2
+        next_sibling[name2] = outer
+        next_sibling[outer] = NONE
+        self.kinds[outer] = ast.GAMMA
+        self.first_child[outer] = inner
+        next_sibling[inner] = value1
+        next_sibling[value1] = NONE
+        self.kinds[inner] = ast.LAMBDA
+        next_sibling[name1] = value2
+        next_sibling[value2] = NONE
+
+    def _rec(self, index):
+        # rec(=(X, E)) => =(X, gamma(<Y*>, lambda(X, E)))
+        binding = self.first_child[index]
+        name, _ = self._binding(binding, "rec")
+        add = self.tree.add
+        self.kinds[binding] = ast.LAMBDA
+        combinator = add(ast.GAMMA, (add(ast.YSTAR), binding))
+        self.kinds[index] = ast.EQUAL
+        self.first_child[index] = self._copy_names(name)
+        self.next_sibling[self.first_child[index]] = combinator
+
+    def _copy_names(self, index):
+        # Copy of a variable list: an identifier or ','(identifiers)
+        tree = self.tree
+        if self.kinds[index] != ast.COMMA:
+            return tree.add(self.kinds[index], value=tree.values[index])
+        names = [
+            tree.add(self.kinds[child], value=tree.values[child])
+            for child in tree.children(index)
+        ]
+        return tree.add(ast.COMMA, names)
+
+    def _and(self, index):
+        # and(=(X1, E1), ..., =(Xn, En)) => =(,(X1, ..., Xn), tau(E1, ..., En))
+        bindings = self.tree.children(index)
+        names = []
+        values = []
+        for binding in bindings:
+            name, value = self._binding(binding, "and")
+            names.append(name)
+            values.append(value)
+        names_node, values_node = bindings[0], bindings[1]
+        self.kinds[index] = ast.EQUAL
+        self.kinds[names_node] = ast.COMMA
+        self.kinds[values_node] = ast.TAU
+        self.tree.set_children(names_node, names)
+        self.tree.set_children(values_node, values)
+        self.tree.set_children(index, (names_node, values_node))
+
+    def _at(self, index):
+        # @(E1, N, E2) => gamma(gamma(N, E1), E2)
+        next_sibling = self.next_sibling
+        left = self.first_child[index]
+        name = next_sibling[left]
+        right = next_sibling[name]
+        next_sibling[name] = left
+        next_sibling[left] = NONE
+        inner = self.tree.add(ast.GAMMA)
+        self.first_child[inner] = name
+        self.kinds[index] = ast.GAMMA
+        self.first_child[index] = inner
+        next_sibling[inner] = right
+
+
+def standardize(node):
+    return Standardizer(node.tree).standardize(node.index)
@@ -0,0 +1,89 @@
+import unittest
+from src import ast
+from src.parser import parse
+
+
+def _build():
+    # let x = 1 in f x
+    tree = ast.AST()
+    x = tree.add(ast.IDENTIFIER, value="x")
+    one = tree.add(ast.INTEGER, value="1")
+    binding = tree.add(ast.EQUAL, [x, one])
+    f = tree.add(ast.IDENTIFIER, value="f")
+    x2 = tree.add(ast.IDENTIFIER, value="x")
+    call = tree.add(ast.GAMMA, [f, x2])
+    tree.root = tree.add(ast.LET, [binding, call])
+    return tree
+
+
+class TestAST(unittest.TestCase):
+    def test_arrays(self):
+        tree = _build()
+        self.assertEqual(len(tree), 7)
+        self.assertEqual(tree.kinds[tree.root], ast.LET)
+        self.assertEqual(tree.children(tree.root), [2, 5])
+        self.assertEqual(tree.first_child[2], 0)
+        self.assertEqual(tree.next_sibling[0], 1)
+        self.assertEqual(tree.next_sibling[1], ast.NONE)
+        self.assertEqual(tree.first_child[0], ast.NONE)
+
+    def test_traversals(self):
+        tree = _build()
+        self.assertEqual(list(tree.preorder()), [6, 2, 0, 1, 5, 3, 4])
+        self.assertEqual(list(tree.postorder()), [0, 1, 2, 3, 4, 5, 6])
+        self.assertEqual(list(tree.preorder(5)), [5, 3, 4])
+        self.assertEqual(list(tree.postorder(2)), [0, 1, 2])
+
+    def test_format(self):
+        self.assertEqual(
+            _build().format(),
+            "let\n.=\n..<ID:x>\n..<INT:1>\n.gamma\n..<ID:f>\n..<ID:x>",
+        )
+        self.assertEqual(_build().format(2), "=\n.<ID:x>\n.<INT:1>")
+
+    def test_leaf_text(self):
+        self.assertEqual(ast.node_text(ast.STRING, "'a\nb'"), "<STR:'a\\nb'>")
+        self.assertEqual(ast.node_text(ast.YSTAR, None), "<Y*>")
+        self.assertEqual(ast.node_text(ast.EMPTY, None), "()")
+        self.assertEqual(ast.node_text(ast.CONDITIONAL, None), "->")
+
+    def test_copy(self):
+        tree = _build()
+        whole = tree.copy()
+        self.assertEqual(whole.format(), tree.format())
+        part = tree.copy(5)
+        self.assertEqual(len(part), 3)
+        self.assertEqual(part.format(), "gamma\n.<ID:f>\n.<ID:x>")
+        # Sibling links of the copied root are not carried over
+        first = tree.copy(2)
+        self.assertEqual(first.next_sibling[first.root], ast.NONE)
+        # Copies are independent
+        whole.kinds[whole.root] = ast.WHERE
+        self.assertEqual(tree.kinds[tree.root], ast.LET)
+
+    def test_node_view(self):
+        tree = _build()
+        root = tree.node()
+        self.assertEqual(root.label, "let")
+        binding, call = root.children
+        self.assertEqual([str(child) for child in call.children], ["<ID:f>", "<ID:x>"])
+        binding.kind = ast.LAMBDA
+        root.kind = ast.GAMMA
+        root.children = [binding, call.children[1]]
+        self.assertEqual(tree.format(), "gamma\n.lambda\n..<ID:x>\n..<INT:1>\n.<ID:x>")
+        self.assertEqual(binding, tree.node(2))
+        self.assertEqual(len({binding, tree.node(2)}), 1)
+
+    def test_large_tree_without_recursion(self):
+        depth = 5000
+        tree = parse("fn x. " * depth + "x").tree
+        self.assertEqual(len(tree), 2 * depth + 1)
+        lines = tree.format().split("\n")
+        self.assertEqual(len(lines), 2 * depth + 1)
+        self.assertEqual(lines[-1], "." * depth + "<ID:x>")
+        self.assertEqual(len(tree.copy()), len(tree))
+        self.assertEqual(tree.postorder()[-1], tree.root)
+
+
+if __name__ == "__main__":
+    unittest.main()
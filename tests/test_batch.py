@@ -0,0 +1,104 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+import unittest.mock
+from src import myrpal
+from src.batch import find_programs, read_paths, run_batch, run_program, write_results
+from tests.test_parser import SUM_PROGRAM
+
+PROGRAMS = {
+    "a.rpal": SUM_PROGRAM,
+    "b.rpal": "Print x",
+    "c.rpal": "let rec f n = n eq 0 -> 1 | n * f (n - 1) in Print (f 10)",
+    "d.rpal": "let x = in",
+    "sub/e.rpal": "Print (1, 2)",
+    "sub/notes.txt": "not a program",
+}
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        for name, code in PROGRAMS.items():
+            path = os.path.join(self.directory, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as source:
+                source.write(code)
+        self.paths = [
+            self.path(name) for name in sorted(PROGRAMS) if name.endswith(".rpal")
+        ]
+
+    def path(self, name):
+        return os.path.join(self.directory, *name.split("/"))
+
+    def test_find_programs(self):
+        single = self.path("sub/notes.txt")
+        self.assertEqual(
+            list(find_programs([single, self.directory])), [single, *self.paths]
+        )
+
+    def test_read_paths(self):
+        stream = io.StringIO("a.rpal\n\n  b.rpal  \n")
+        self.assertEqual(list(read_paths(stream)), ["a.rpal", "b.rpal"])
+
+    def test_failures_are_isolated(self):
+        results = list(run_batch(self.paths))
+        self.assertEqual([result.path for result in results], self.paths)
+        self.assertEqual(
+            [(result.output, result.ok) for result in results],
+            [
+                ("15\n", True),
+                ("", False),
+                ("3628800\n", True),
+                ("", False),
+                ("(1, 2)\n", True),
+            ],
+        )
+        self.assertEqual(results[1].error, "Undeclared identifier 'x'")
+        self.assertIn("Expected an operand", results[3].error)
+
+    def test_output_before_an_error_is_kept(self):
+        path = self.path("b.rpal")
+        with open(path, "w") as source:
+            source.write("let f x = Print x in (Print y, f 'first')")
+        result = run_program(path)
+        self.assertEqual(
+            (result.output, result.error), ("first\n", "Undeclared identifier 'y'")
+        )
+
+    def test_missing_file(self):
+        result = run_program(self.path("missing.rpal"))
+        self.assertFalse(result.ok)
+
+    def test_jobs_keep_order(self):
+        serial = [(r.path, r.output, r.error) for r in run_batch(self.paths)]
+        pooled = [(r.path, r.output, r.error) for r in run_batch(self.paths, jobs=3)]
+        self.assertEqual(pooled, serial)
+
+    def test_write_results(self):
+        stream = io.StringIO()
+        failed = write_results(run_batch(self.paths[:2]), stream)
+        self.assertEqual(failed, 1)
+        self.assertEqual(
+            stream.getvalue(),
+            f"==> {self.paths[0]} <==\n15\n"
+            f"==> {self.paths[1]} <==\nError: Undeclared identifier 'x'\n",
+        )
+
+    def test_command_line(self):
+        stdout = io.StringIO()
+        stdin = io.StringIO("\n".join(self.paths[2:]))
+        with contextlib.redirect_stdout(stdout), unittest.mock.patch(
+            "sys.stdin", stdin
+        ):
+            status = myrpal.main(["--batch", "--no-cache"])
+        self.assertEqual(status, 1)
+        self.assertEqual(stdout.getvalue().count("==> "), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
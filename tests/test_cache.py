@@ -0,0 +1,114 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+import unittest.mock
+from src import cache, myrpal
+from src.cache import MAGIC, ProgramCache, source_key
+from src.cse_machine import Machine, compile_tree
+from src.parser import parse
+from src.standardizer import standardize
+from tests.test_parser import SUM_PROGRAM
+
+
+def compile_source(code):
+    return compile_tree(standardize(parse(code)))
+
+
+def output_of(program):
+    output = io.StringIO()
+    Machine(program, output).run()
+    return output.getvalue()
+
+
+class TestProgramCache(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = ProgramCache(directory.name)
+
+    def test_round_trip(self):
+        code = (
+            "let rec f n = n eq 0 -> 'x' | Conc 'a' (f (n - 1))"
+            " in Print (f 3, nil, true, 12345678901234567890, (fn (a, b). a) (1, 2))"
+        )
+        program = compile_source(code)
+        key = source_key(code.encode())
+        self.assertTrue(self.cache.store(key, program))
+        loaded = self.cache.load(key)
+        self.assertIsNotNone(loaded)
+        self.assertEqual(output_of(loaded), output_of(program))
+
+    def test_keys_depend_on_source(self):
+        self.assertNotEqual(source_key(b"Print 1"), source_key(b"Print 2"))
+        self.assertEqual(source_key(b"Print 1"), source_key(b"Print 1"))
+
+    def test_missing_entry(self):
+        self.assertIsNone(self.cache.load(source_key(b"Print 1")))
+
+    def test_damaged_entries_are_misses(self):
+        key = source_key(b"Print 1")
+        self.cache.store(key, compile_source("Print 1"))
+        path = self.cache.path(key)
+        for data in (b"", b"garbage", MAGIC, MAGIC + b"\x00\x01"):
+            with self.subTest(data=data):
+                with open(path, "wb") as entry:
+                    entry.write(data)
+                self.assertIsNone(self.cache.load(key))
+
+    def test_entry_under_another_key_is_a_miss(self):
+        key = source_key(b"Print 1")
+        other = source_key(b"Print 2")
+        self.cache.store(key, compile_source("Print 1"))
+        os.makedirs(os.path.dirname(self.cache.path(other)), exist_ok=True)
+        os.replace(self.cache.path(key), self.cache.path(other))
+        self.assertIsNone(self.cache.load(other))
+
+    def test_too_deep_to_store(self):
+        code = "let x = 1 in " + "x eq 0 -> 0 | " * 3000 + "1"
+        program = compile_source(code)
+        self.assertFalse(self.cache.store(source_key(code.encode()), program))
+
+
+class TestCommandLine(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.cache_dir = os.path.join(self.directory, "cache")
+        self.source = os.path.join(self.directory, "sum.rpal")
+        with open(self.source, "w") as source:
+            source.write(SUM_PROGRAM)
+
+    def run_main(self, *args):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            status = myrpal.main([*args, self.source])
+        return status, stdout.getvalue()
+
+    def cached_files(self):
+        return [name for _, _, names in os.walk(self.cache_dir) for name in names]
+
+    def test_warm_run_uses_the_cache(self):
+        self.assertEqual(self.run_main("--cache-dir", self.cache_dir), (0, "15\n"))
+        self.assertEqual(len(self.cached_files()), 1)
+        with unittest.mock.patch.object(cache, "_compile") as parse_mock:
+            self.assertEqual(self.run_main("--cache-dir", self.cache_dir), (0, "15\n"))
+        parse_mock.assert_not_called()
+
+    def test_no_cache(self):
+        args = ("--no-cache", "--cache-dir", self.cache_dir)
+        self.assertEqual(self.run_main(*args), (0, "15\n"))
+        self.assertEqual(self.cached_files(), [])
+
+    def test_changed_source_is_recompiled(self):
+        self.run_main("--cache-dir", self.cache_dir)
+        with open(self.source, "w") as source:
+            source.write("Print 'changed'")
+        self.assertEqual(self.run_main("--cache-dir", self.cache_dir), (0, "changed\n"))
+        self.assertEqual(len(self.cached_files()), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,408 @@
+import io
+import math
+import sys
+import tracemalloc
+import unittest
+import unittest.mock
+from array import array
+from src import cse_machine
+from src.cse_machine import (
+    DUMMY,
+    LOAD,
+    LOAD_LOCAL,
+    NIL,
+    CSEError,
+    Machine,
+    String,
+    Tuple,
+    _stem,
+    _stern,
+    compile_tree,
+    evaluate,
+    format_value,
+    parse_integer,
+)
+from src.parser import parse
+from src.standardizer import standardize
+from tests.test_parser import SUM_PROGRAM
+
+
+def run(code, memo_size=0):
+    output = io.StringIO()
+    evaluate(standardize(parse(code)), output, memo_size)
+    return output.getvalue()
+
+
+class TestCompiler(unittest.TestCase):
+    def test_variables_resolve_to_slots(self):
+        program = compile_tree(standardize(parse("fn x. fn y. x + y")))
+        inner = program.codes[2].instructions
+        self.assertIn((LOAD_LOCAL, 1), inner)
+        self.assertIn((LOAD, (1, 1)), inner)
+
+    def test_program_can_be_linked_twice(self):
+        program = compile_tree(standardize(parse("Print (Conc 'a' 'b')")))
+        first = io.StringIO()
+        second = io.StringIO()
+        Machine(program, first).run()
+        Machine(program, second).run()
+        self.assertEqual(first.getvalue(), "ab")
+        self.assertEqual(second.getvalue(), "ab")
+
+
+class TestMachine(unittest.TestCase):
+    def test_sum_program(self):
+        self.assertEqual(run(SUM_PROGRAM), "15")
+
+    def test_factorial(self):
+        code = "let rec f n = n eq 0 -> 1 | n * f (n - 1) in Print (f 20)"
+        self.assertEqual(run(code), "2432902008176640000")
+
+    def test_large_integers(self):
+        code = "let rec f n = n eq 0 -> 1 | n * f (n - 1) in Print (ItoS (f 2000))"
+        self.assertEqual(len(run(code)), 5736)
+        self.assertEqual(run("Print ({} + 1)".format("9" * 5000)), "1" + "0" * 5000)
+
+    @unittest.skipUnless(hasattr(sys, "set_int_max_str_digits"), "no digit limit")
+    def test_large_integers_leave_the_digit_limit_alone(self):
+        limit = sys.get_int_max_str_digits()
+        self.addCleanup(sys.set_int_max_str_digits, limit)
+        sys.set_int_max_str_digits(640)
+        self.assertEqual(run("Print (-{} - 1)".format("9" * 5000)), "-1" + "0" * 5000)
+        code = "let rec f n = n eq 0 -> 1 | n * f (n - 1) in Print (f 2000)"
+        self.assertEqual(parse_integer(run(code)), math.factorial(2000))
+        self.assertEqual(sys.get_int_max_str_digits(), 640)
+
+    def test_fibonacci(self):
+        code = (
+            "let rec fib n = n ls 2 -> n | fib (n - 1) + fib (n - 2) in Print (fib 15)"
+        )
+        self.assertEqual(run(code), "610")
+
+    def test_arithmetic(self):
+        code = "Print (-7 / 2, 7 / 2, 2 ** 10, 2 ** (-1), 5 - 3 - 1, 3 gr 2, 2 le 1)"
+        self.assertEqual(run(code), "(-3, 3, 1024, 0, 1, true, false)")
+
+    def test_negative_powers(self):
+        code = "Print ((-1) ** (-3), (-1) ** (-2), 1 ** (-5), (-2) ** (-1), 0 ** 0)"
+        self.assertEqual(run(code), "(-1, 1, 1, 0, 1)")
+        with self.assertRaisesRegex(CSEError, "Division by zero"):
+            run("Print (0 ** (-1))")
+
+    def test_logic(self):
+        code = "Print (not true or false, true & false, 'a' eq 'a', 1 ne 1)"
+        self.assertEqual(run(code), "(false, false, true, false)")
+
+    def test_tuples(self):
+        code = "let t = nil aug 1 aug (2, 3) in Print (t, Order t, t 2 1, Null nil)"
+        self.assertEqual(run(code), "((1, (2, 3)), 2, 2, true)")
+
+    def test_strings(self):
+        code = "Print (Conc 'ab' 'cd', Stem 'xy', Stern 'xy', ItoS 42, 'a\\tb')"
+        self.assertEqual(run(code), "(abcd, x, y, 42, a\tb)")
+
+    def test_type_tests(self):
+        code = (
+            "Print (Isinteger 1, Istruthvalue true, Isstring 'a', Istuple nil,"
+            " Isfunction Print, Isdummy dummy, Isinteger true)"
+        )
+        self.assertEqual(run(code), "(true, true, true, true, true, true, false)")
+
+    def test_closures(self):
+        self.assertEqual(
+            run("Print ((fn x. x), Print)"),
+            "([lambda closure: x: 1], [primitive function: Print])",
+        )
+
+    def test_tuple_parameters(self):
+        code = "let f (x, y) = x - y and g () = 7 in Print (f (5, 2), g nil)"
+        self.assertEqual(run(code), "(3, 7)")
+
+    def test_simultaneous_recursion(self):
+        code = (
+            "let rec (even n = n eq 0 -> true | odd (n - 1)"
+            " and odd n = n eq 0 -> false | even (n - 1))"
+            " in Print (even 10, odd 10)"
+        )
+        self.assertEqual(run(code), "(true, false)")
+
+    def test_nested_scopes(self):
+        code = "let x = 1 in let f y = x + y in let x = 10 in Print (f x)"
+        self.assertEqual(run(code), "11")
+
+    def test_result_value(self):
+        machine = Machine(compile_tree(standardize(parse("1, dummy"))))
+        self.assertEqual(machine.run(), Tuple([1, DUMMY]))
+
+    def test_deep_recursion(self):
+        code = "let rec f n = n eq 0 -> 0 | 1 + f (n - 1) in Print (f 100000)"
+        self.assertEqual(run(code), "100000")
+
+    def test_tail_calls_run_in_constant_memory(self):
+        code = (
+            "let rec loop (n, total) = n eq 0 -> total | loop (n - 1, total + n)"
+            " in Print (loop ({}, 0))"
+        )
+        peaks = []
+        for count in (5000, 50000):
+            program = compile_tree(standardize(parse(code.format(count))))
+            output = io.StringIO()
+            tracemalloc.start()
+            Machine(program, output).run()
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            self.assertEqual(output.getvalue(), str(count * (count + 1) // 2))
+        self.assertLess(peaks[1], peaks[0] * 2)
+
+    def test_tail_calls_through_let_and_conditionals(self):
+        code = (
+            "let rec f n = let m = n - 1 in m le 0 -> 'done' | not (m eq 5) -> f m"
+            " | f (m - 1) in Print (f 100000)"
+        )
+        self.assertEqual(run(code), "done")
+
+    def test_deeply_nested_tuples(self):
+        code = (
+            "let rec nest n = n eq 0 -> nil | (nest (n - 1), n)"
+            " and rec depth t = Null t -> 0 | 1 + depth (t 1)"
+            " in Print (depth (nest 100000))"
+        )
+        self.assertEqual(run(code), "100000")
+
+    def test_format_nested_tuples(self):
+        value = Tuple([1, Tuple([String("a"), NIL]), Tuple([True])])
+        self.assertEqual(format_value(value), "(1, (a, nil), (true))")
+
+    def test_errors(self):
+        cases = [
+            ("Print x", "Undeclared identifier 'x'"),
+            ("Print (1 + true)", "Invalid operands for +"),
+            ("Print (1 / 0)", "Division by zero"),
+            ("Print ((1, 2) 3)", "Tuple index 3 out of range"),
+            ("Print (1 -> 2 | 3)", "Condition must be a truth value"),
+            ("Print (1 2)", "Cannot apply 1"),
+            ("let f (x, y) = x in f 1", "Expected a tuple of 2 values for (x, y)"),
+            ("Stem 1", "Stem expects a string"),
+        ]
+        for code, message in cases:
+            with self.subTest(code=code):
+                with self.assertRaises(CSEError) as context:
+                    run(code)
+                self.assertEqual(str(context.exception), message)
+
+
+class TestValues(unittest.TestCase):
+    def test_aug_shares_prefixes(self):
+        t = NIL.aug(1).aug(2)
+        a = t.aug(3)
+        b = t.aug(4)
+        self.assertIs(a.items, t.items)
+        self.assertEqual((list(t), list(a), list(b)), ([1, 2], [1, 2, 3], [1, 2, 4]))
+        self.assertEqual(list(NIL), [])
+
+    def test_aug_on_a_shared_prefix(self):
+        code = (
+            "let t = nil aug 1 aug 2 in let a = t aug 3 in let b = t aug 4"
+            " in Print (t, a, b, Aug t 5)"
+        )
+        self.assertEqual(run(code), "((1, 2), (1, 2, 3), (1, 2, 4), (1, 2, 5))")
+
+    def test_long_lists(self):
+        code = (
+            "let rec build (t, n) = n eq 0 -> t | build (t aug n, n - 1)"
+            " and rec total (t, i) = i eq 0 -> 0 | t i + total (t, i - 1)"
+            " in let t = build (nil, 200000) in Print (Order t, total (t, Order t))"
+        )
+        self.assertEqual(run(code), "(200000, 20000100000)")
+
+    def test_stern_does_not_copy(self):
+        s = String("abc")
+        rest = _stern(_stern(s))
+        self.assertIs(rest.text, s.text)
+        self.assertEqual((str(rest), str(_stem(rest))), ("c", "c"))
+        self.assertEqual(str(_stern(_stern(rest))), "")
+        self.assertEqual(String("xbc", 1), String("bc"))
+        self.assertNotEqual(String("xbc", 1), String("b"))
+
+    def test_long_strings(self):
+        code = (
+            "let rec count s = s eq '' -> 0 | (Stem s eq 'a' -> 1 | 0) + count (Stern s)"
+            " in Print (count (Conc 'x' '{}'))"
+        )
+        self.assertEqual(run(code.format("ab" * 50000)), "50000")
+
+
+def _has_numpy():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def tuple_of(values):
+    result = NIL
+    for value in values:
+        result = result.aug(value)
+    return result
+
+
+class TestIntegerTuples(unittest.TestCase):
+    def test_integers_are_kept_in_an_array(self):
+        t = tuple_of([1, 2, 3])
+        self.assertIs(type(t.items), array)
+        self.assertIs(t.aug(4).items, t.items)
+
+    def test_other_values_fall_back_to_a_list(self):
+        t = tuple_of([1, 2])
+        for value in (True, 2**63, String("a"), NIL):
+            with self.subTest(value=value):
+                mixed = t.aug(value)
+                self.assertIs(type(mixed.items), list)
+                self.assertEqual(list(mixed), [1, 2, value])
+        # The array and the views sharing it are untouched
+        self.assertEqual(list(t.aug(3)), [1, 2, 3])
+        self.assertIs(type(tuple_of([True, 1]).items), list)
+
+    def test_equality_across_representations(self):
+        listed = Tuple([1, 2, 3])
+        self.assertEqual(tuple_of([1, 2, 3]), listed)
+        self.assertEqual(hash(tuple_of([1, 2, 3])), hash(listed))
+        self.assertNotEqual(tuple_of([1, 2]), listed)
+
+    def test_programs(self):
+        code = (
+            "let rec build n t = n eq 0 -> t | build (n - 1) (t aug n)"
+            " within t = build 1000 nil"
+            " in let rec total i = i gr Order t -> 0 | t i + total (i + 1)"
+            " in Print (Order t, t 1, total 1, Sum t, Null (t aug 'x'), t aug 'x')"
+        )
+        output = run(code)
+        self.assertTrue(
+            output.startswith("(1000, 1000, 500500, 500500, false, (1000, ")
+        )
+        self.assertTrue(output.endswith(", 2, 1, x))"))
+        self.assertEqual(run(code, memo_size=100), output)
+
+    def test_sum(self):
+        self.assertEqual(
+            run("Print (Sum nil, Sum (1, 2, -3), Sum (nil aug 5))"), "(0, 0, 5)"
+        )
+        for code in ("Sum (1, 'a')", "Sum 1", "Sum (nil aug 1 aug true)"):
+            with self.subTest(code=code), self.assertRaises(CSEError):
+                run(code)
+
+    def test_map(self):
+        code = (
+            "let t = nil aug 7 aug (-7) aug 2 in"
+            " Print (Map '+' t 1, Map '*' t t, Map '/' t 2, Map 'gr' t 0,"
+            " Map 'eq' ('a', 'b') 'a', Map '**' t 2, Map '-' nil 1)"
+        )
+        self.assertEqual(
+            run(code),
+            "((8, -6, 3), (49, 49, 4), (3, -3, 1), (true, false, true),"
+            " (true, false), (49, 49, 4), nil)",
+        )
+        for code, message in (
+            ("Map '/' (1, 2) 0", "Division by zero"),
+            ("Map '+' (1, 2) (1, 2, 3)", "Map expects tuples of equal length"),
+            ("Map 'aug' (1, 2) 1", "Map expects an operator name such as '+'"),
+            ("Map '+' 1 1", "Map expects a tuple"),
+            ("Map 'or' (nil aug 1) true", "or and & expect truth values"),
+        ):
+            with self.subTest(code=code), self.assertRaises(CSEError) as raised:
+                run(code)
+            self.assertEqual(str(raised.exception), message)
+
+    def test_literals_are_packed_by_sum_and_map(self):
+        code = (
+            "Print (Sum (1, 2, 3), Map '+' (1, 2, 3) 1, Map '*' (1, 2) (3, 4),"
+            " Sum (1, 2 ** 70))"
+        )
+        self.assertEqual(run(code), f"(6, (2, 3, 4), (3, 8), {2**70 + 1})")
+        with self.assertRaises(CSEError):
+            run("Map '+' (1, true) 1")
+        for module in (None, False):
+            # None imports numpy on first use; False has none
+            with unittest.mock.patch.object(cse_machine, "_numpy_module", module):
+                literal = Tuple([1, 2, 3])
+                others = Tuple([4, 5, 6])
+                self.assertEqual(cse_machine._sum(literal), 6)
+                self.assertEqual(
+                    list(cse_machine._map(String("+"), literal, others)), [5, 7, 9]
+                )
+                # Only a machine with numpy keeps the literals in arrays
+                packed = module is None and _has_numpy()
+                for t in (literal, others):
+                    self.assertIs(type(t.items), array if packed else list)
+        mixed = Tuple([1, 2**63, 3])
+        self.assertEqual(cse_machine._sum(mixed), 2**63 + 4)
+        self.assertIs(type(mixed.items), list)
+        # A view packs only its own items
+        view = Tuple([1, 2, 3], 2)
+        self.assertEqual(cse_machine._sum(view), 3)
+        self.assertEqual(list(view.aug(9)), [1, 2, 9])
+
+    def test_results_do_not_overflow(self):
+        big = 2**62
+        code = f"Print (Sum (nil aug {big} aug {big}), Map '*' (nil aug {big}) 4)"
+        self.assertEqual(run(code), f"({2 * big}, ({4 * big}))")
+
+    @unittest.skipUnless(_has_numpy(), "numpy is not installed")
+    def test_numpy_matches_python(self):
+        values = tuple_of(range(-500, 500, 3))
+        others = tuple_of(range(1, 1001, 3))
+        for name in ("+", "-", "*", "/", "gr", "ge", "ls", "le", "eq", "ne"):
+            for other in (others, -7, 2**62):
+                with self.subTest(name=name, other=other):
+                    results = []
+                    for module in (None, False):
+                        # None imports numpy on first use; False has none
+                        with unittest.mock.patch.object(
+                            cse_machine, "_numpy_module", module
+                        ):
+                            results.append(
+                                cse_machine._map(String(name), values, other)
+                            )
+                    self.assertEqual(results[0], results[1])
+        self.assertEqual(cse_machine._sum(values), sum(range(-500, 500, 3)))
+
+
+class TestMemo(unittest.TestCase):
+    def test_exponential_recursion_becomes_linear(self):
+        code = (
+            "let rec fib n = n ls 2 -> n | fib (n - 1) + fib (n - 2) in Print (fib 300)"
+        )
+        self.assertEqual(
+            run(code, memo_size=1000),
+            "222232244629420445529739893461909967206666939096499764990979600",
+        )
+
+    def test_curried_calls(self):
+        code = (
+            "let rec paths x y = x eq 0 or y eq 0 -> 1"
+            " | paths (x - 1) y + paths x (y - 1) in Print (paths 30 30)"
+        )
+        self.assertEqual(run(code, memo_size=10000), "118264581564861424")
+
+    def test_calls_that_print_are_not_cached(self):
+        code = "let f x = Print x in (f 1, f 1, f 1)"
+        self.assertEqual(run(code, memo_size=10), "111")
+
+    def test_cache_is_bounded(self):
+        code = "let rec f n = n eq 0 -> 0 | 1 + f (n - 1) in f 100"
+        machine = Machine(compile_tree(standardize(parse(code))), memo_size=10)
+        self.assertEqual(machine.run(), 100)
+        self.assertEqual(len(machine.memo), 10)
+
+    def test_truth_values_are_not_integers(self):
+        code = "let f x = Isinteger x in Print (f 1, f true, f (1, 2), f (true, 2))"
+        self.assertEqual(run(code, memo_size=10), "(true, false, false, false)")
+
+    def test_disabled_by_default(self):
+        machine = Machine(compile_tree(standardize(parse("1"))))
+        self.assertIsNone(machine.memo)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,314 @@
+import difflib
+import hashlib
+import json
+import os
+import signal
+import tempfile
+import unittest
+import unittest.mock
+from src.batch import find_programs, run_program
+from src.cache import default_directory
+from src.optimizer import LEVELS
+
+# Golden tests: every name.rpal under GOLDEN_DIRS is run at each of LEVELS
+# and what it prints, with "Error: message" for an error as --batch writes
+# it, must equal name.out beside it. Programs run in worker processes with
+# a timeout each. A passing (program, expected output, level, interpreter
+# source) combination is remembered in the file named by RPAL_GOLDEN_CACHE
+# (default golden.json in the program cache directory) and skipped until
+# one of them changes. With RPAL_GOLDEN_UPDATE=1 the .out files of failing
+# and new programs are rewritten instead.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN_DIRS = (os.path.join(ROOT, "tests", "golden"), os.path.join(ROOT, "samples"))
+EXPECTED = ".out"
+
+# Seconds one program may run at one level
+TIMEOUT = 10
+
+# Longest diff line shown; longer ones are cut around their first difference
+DIFF_WIDTH = 160
+
+
+class Failure:
+    # A program whose output at an optimization level is not the expected
+    # output; expected is None when there is no .out file and actual is None
+    # when the program timed out
+    def __init__(self, path, level, expected, actual):
+        self.path = path
+        self.level = level
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        header = f"{os.path.relpath(self.path, ROOT)} (-O{self.level})"
+        if self.actual is None:
+            return f"{header}: timed out"
+        if self.expected is None:
+            return f"{header}: no expected output in {_expected_path(self.path)}"
+        return f"{header}:\n{diff(self.expected, self.actual)}"
+
+
+def discover(directories=GOLDEN_DIRS):
+    # (program, expected output or None) for every program, in sorted order
+    existing = [directory for directory in directories if os.path.isdir(directory)]
+    for path in find_programs(existing):
+        try:
+            with open(_expected_path(path), encoding="utf-8") as expected:
+                yield path, expected.read()
+        except FileNotFoundError:
+            yield path, None
+
+
+def _expected_path(path):
+    return os.path.splitext(path)[0] + EXPECTED
+
+
+def interpreter_hash():
+    # Hash of every interpreter source, so any change to them reruns all
+    digest = hashlib.sha256()
+    directory = os.path.join(ROOT, "src")
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py"):
+            digest.update(name.encode())
+            with open(os.path.join(directory, name), "rb") as source:
+                digest.update(source.read())
+    return digest.hexdigest()
+
+
+def case_key(path, expected, level, interpreter):
+    digest = hashlib.sha256(interpreter.encode())
+    digest.update(b"-O%d\0" % level)
+    with open(path, "rb") as source:
+        digest.update(source.read())
+    digest.update(b"\0")
+    digest.update(expected.encode())
+    return digest.hexdigest()
+
+
+def cache_path():
+    return os.environ.get("RPAL_GOLDEN_CACHE") or os.path.join(
+        default_directory(), "golden.json"
+    )
+
+
+def load_passes(path):
+    # Keys of the cases that passed last time; a missing or damaged file
+    # only means running everything again
+    try:
+        with open(path, encoding="utf-8") as cache:
+            return set(json.load(cache))
+    except (OSError, ValueError, TypeError):
+        return set()
+
+
+def save_passes(path, keys):
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as cache:
+            json.dump(sorted(keys), cache)
+        os.replace(temporary, path)
+    except OSError:
+        pass
+
+
+class _Timeout(BaseException):
+    # Not an Exception, so run_program does not take it for the program's
+    # own error
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise _Timeout
+
+
+def run_case(case):
+    # What the program prints at level, or None if it ran out of time. The
+    # timer needs SIGALRM; elsewhere programs run without a limit.
+    path, level, timeout = case
+    timed = hasattr(signal, "setitimer")
+    if timed:
+        previous = signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        result = run_program(path, None, 0, level)
+    except _Timeout:
+        return None
+    finally:
+        if timed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    if result.ok:
+        return result.output
+    return f"{result.output}Error: {result.error}\n"
+
+
+def run_cases(cases, jobs=None):
+    # Outputs in the order of cases, from a pool of jobs worker processes
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1 or len(cases) <= 1:
+        return [run_case(case) for case in cases]
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = min(jobs, len(cases))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_case, cases, chunksize=-(-len(cases) // workers // 4)))
+
+
+def check(
+    directories=GOLDEN_DIRS,
+    levels=LEVELS,
+    jobs=None,
+    timeout=TIMEOUT,
+    cache=None,
+    update=False,
+):
+    # Runs every golden program not known to pass; returns the failures and
+    # the number of (program, level) cases run
+    cache = cache or cache_path()
+    passed = load_passes(cache)
+    interpreter = interpreter_hash()
+    keys = []
+    pending = []
+    for path, expected in discover(directories):
+        for level in levels:
+            key = (
+                None
+                if expected is None
+                else case_key(path, expected, level, interpreter)
+            )
+            keys.append(key)
+            if key not in passed:
+                pending.append((path, level, expected, key))
+    outputs = run_cases([(path, level, timeout) for path, level, _, _ in pending], jobs)
+
+    failures = []
+    for (path, level, expected, key), actual in zip(pending, outputs):
+        if actual is not None and actual == expected:
+            passed.add(key)
+        else:
+            failures.append(Failure(path, level, expected, actual))
+    if update:
+        for failure in failures:
+            if failure.actual is not None:
+                with open(_expected_path(failure.path), "w", encoding="utf-8") as out:
+                    out.write(failure.actual)
+                key = case_key(failure.path, failure.actual, failure.level, interpreter)
+                keys.append(key)
+                passed.add(key)
+    # Only what this corpus still has, so the file does not grow forever
+    save_passes(cache, passed.intersection(keys))
+    return failures, len(pending)
+
+
+def diff(expected, actual):
+    # The changed lines only, each removed line followed by the line that
+    # replaced it
+    lines = []
+    removed = []
+    for line in difflib.unified_diff(
+        expected.splitlines(), actual.splitlines(), n=0, lineterm=""
+    ):
+        if line.startswith(("---", "+++")):
+            continue
+        if line.startswith("-"):
+            removed.append(line[1:])
+            continue
+        if line.startswith("+"):
+            old = removed.pop(0) if removed else None
+            start = 0 if old is None else len(os.path.commonprefix([old, line[1:]]))
+            if old is not None:
+                lines.append("-" + _cut(old, start))
+            lines.append("+" + _cut(line[1:], start))
+            continue
+        lines.extend("-" + _cut(old, 0) for old in removed)
+        removed = []
+        lines.append(line)
+    lines.extend("-" + _cut(old, 0) for old in removed)
+    if expected.endswith("\n") != actual.endswith("\n"):
+        lines.append("(the final newline differs)")
+    return "\n".join(lines)
+
+
+def _cut(line, start):
+    # At most DIFF_WIDTH characters of line, from a little before start
+    if len(line) <= DIFF_WIDTH:
+        return line
+    begin = max(0, min(start - DIFF_WIDTH // 4, len(line) - DIFF_WIDTH))
+    end = begin + DIFF_WIDTH
+    return (
+        ("..." if begin else "") + line[begin:end] + ("..." if end < len(line) else "")
+    )
+
+
+class TestGolden(unittest.TestCase):
+    def test_golden_programs(self):
+        update = os.environ.get("RPAL_GOLDEN_UPDATE") == "1"
+        failures, _ = check(update=update)
+        if failures and not update:
+            self.fail("\n\n".join(map(str, failures)))
+
+
+class TestHarness(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.cache = os.path.join(self.directory, "cache", "golden.json")
+        self.write("a.rpal", "Print (1 + 1)")
+        self.write("a.out", "2\n")
+        self.write("b.rpal", "Print x")
+        self.write("b.out", "Error: Undeclared identifier 'x'\n")
+
+    def write(self, name, text):
+        with open(os.path.join(self.directory, name), "w") as file:
+            file.write(text)
+
+    def check(self, **options):
+        options.setdefault("levels", (0, 2))
+        return check([self.directory], jobs=2, cache=self.cache, **options)
+
+    def test_passing_cases_are_cached(self):
+        self.assertEqual(self.check(), ([], 4))
+        self.assertEqual(self.check(), ([], 0))
+        self.write("a.out", "3\n")
+        failures, ran = self.check()
+        self.assertEqual(ran, 2)
+        self.assertEqual([failure.level for failure in failures], [0, 2])
+        self.assertEqual(str(failures[0]).splitlines()[1:], ["@@ -1 +1 @@", "-3", "+2"])
+        with unittest.mock.patch(f"{__name__}.interpreter_hash", return_value="x"):
+            self.assertEqual(self.check()[1], 4)
+
+    def test_missing_expected_output(self):
+        self.write("c.rpal", "Print 'new'")
+        failures, _ = self.check(levels=(0,))
+        self.assertEqual(len(failures), 1)
+        self.assertIn("no expected output", str(failures[0]))
+        self.check(levels=(0,), update=True)
+        self.assertEqual(self.check(levels=(0,)), ([], 0))
+        with open(os.path.join(self.directory, "c.out")) as expected:
+            self.assertEqual(expected.read(), "new\n")
+
+    @unittest.skipUnless(hasattr(signal, "setitimer"), "needs SIGALRM")
+    def test_timeout(self):
+        self.write("c.rpal", "let rec f x = f x in f 1")
+        self.write("c.out", "")
+        failures, _ = self.check(levels=(0,), timeout=0.2)
+        self.assertEqual([os.path.basename(f.path) for f in failures], ["c.rpal"])
+        self.assertIn("timed out", str(failures[0]))
+
+    def test_diff_shows_where_long_lines_differ(self):
+        expected = "(" + ", ".join(map(str, range(1000))) + ")\nsame\n"
+        actual = expected.replace("500, 501", "500, 0")
+        lines = diff(expected, actual).splitlines()
+        self.assertEqual(lines[0], "@@ -1 +1 @@")
+        self.assertTrue(lines[1].startswith("-...") and lines[2].startswith("+..."))
+        self.assertIn("500, 501", lines[1])
+        self.assertIn("500, 0", lines[2])
+        self.assertLessEqual(len(lines[1]), DIFF_WIDTH + 7)
+        self.assertEqual(diff("a\n", "a"), "(the final newline differs)")
+
+
+if __name__ == "__main__":
+    unittest.main()
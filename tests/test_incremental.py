@@ -0,0 +1,136 @@
+import random
+import unittest
+import unittest.mock
+from src.ast import format_tree
+from src.incremental import Document
+from src.lexer import LexerError
+from src.parser import ParserError, parse
+from tests.test_parser import SUM_PROGRAM
+
+PROGRAM = SUM_PROGRAM.replace(
+    "in Print",
+    "in let f x = x + 1 and g (a, b) = a * b\n"
+    "within h = fn y. g (y, f y)\n"
+    "in let rec fact n = n eq 0 -> 1 | n * fact (n - 1) // factorial\n"
+    "in Print",
+)
+
+# Pieces inserted by the random edits; they make and break every kind of
+# definition, group and token
+PIECES = [
+    "x",
+    "1",
+    " + ",
+    " ",
+    "\n",
+    "(",
+    ")",
+    "let",
+    " in ",
+    "=",
+    "fact",
+    ",",
+    "where",
+    "and",
+    "'s'",
+    " -> ",
+    "|",
+    "rec ",
+    "//c\n",
+]
+
+
+def _parsed(text):
+    try:
+        return format_tree(parse(text))
+    except (LexerError, ParserError):
+        return "error"
+
+
+class TestDocument(unittest.TestCase):
+    def test_edit_inside_a_definition(self):
+        document = Document(PROGRAM)
+        offset = PROGRAM.index("x + 1")
+        with unittest.mock.patch.object(Document, "_parse") as full_parse:
+            root = document.edit(offset, 5, "x * (x - 2)")
+        full_parse.assert_not_called()
+        self.assertEqual(document.text, PROGRAM.replace("x + 1", "x * (x - 2)"))
+        self.assertEqual(format_tree(root), _parsed(document.text))
+
+    def test_edit_that_changes_the_structure(self):
+        document = Document(PROGRAM)
+        offset = PROGRAM.index("within")
+        root = document.edit(offset, 6, "and")
+        self.assertEqual(format_tree(root), _parsed(document.text))
+
+    def test_errors(self):
+        document = Document(PROGRAM)
+        offset = PROGRAM.index("x + 1")
+        with self.assertRaises(LexerError):
+            document.edit(offset, 1, "?\r")
+        self.assertEqual(document.text, PROGRAM)
+        with self.assertRaises(ParserError):
+            document.edit(offset, 1, "let")
+        root = document.edit(offset, 3, "z")
+        self.assertEqual(format_tree(root), _parsed(document.text))
+
+    def test_random_edits_match_a_full_parse(self):
+        rng = random.Random(1818)
+        for _ in range(40):
+            document = Document(PROGRAM)
+            text = PROGRAM
+            for _ in range(20):
+                offset = rng.randint(0, len(text))
+                removed = rng.randint(0, min(4, len(text) - offset))
+                inserted = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 2)))
+                edited = text[:offset] + inserted + text[offset + removed :]
+                expected = _parsed(edited)
+                try:
+                    result = format_tree(document.edit(offset, removed, inserted))
+                except LexerError:
+                    # The document keeps the text it had
+                    self.assertEqual(expected, "error")
+                    continue
+                except ParserError:
+                    result = "error"
+                with self.subTest(text=text, edit=(offset, removed, inserted)):
+                    self.assertEqual(result, expected)
+                text = edited
+
+    def test_edits_do_not_parse_the_whole_program(self):
+        text = "".join(f"let f{i} x = x + {i} in\n" for i in range(2000)) + "f1 0"
+        document = Document(text)
+        offset = text.index("x + 1000")
+        with unittest.mock.patch.object(Document, "_parse") as full_parse:
+            for _ in range(10):
+                document.edit(offset, 1, "(x)")
+                document.edit(offset, 3, "x")
+        full_parse.assert_not_called()
+        self.assertEqual(document.text, text)
+
+    def test_spans_follow_edits(self):
+        text = "".join(
+            f"let f{i} x = x + {i} where g y = (y, {i}) in\n" for i in range(300)
+        )
+        text += "f1 0"
+        document = Document(text)
+        rng = random.Random(18)
+        with unittest.mock.patch.object(Document, "_parse") as full_parse:
+            for _ in range(50):
+                offset = text.index(f", {rng.randrange(300)})")
+                inserted = rng.choice([" + y", " * (2)", " y"])
+                document.edit(offset, 0, inserted)
+                text = text[:offset] + inserted + text[offset:]
+        full_parse.assert_not_called()
+        fresh = Document(text)
+        spans = range(len(fresh.span_firsts))
+        self.assertEqual(
+            [(document.first_of(i), document.end_of(i)) for i in spans],
+            [(fresh.first_of(i), fresh.end_of(i)) for i in spans],
+        )
+        self.assertEqual(document.span_depths, fresh.span_depths)
+        self.assertEqual(format_tree(document.root), _parsed(text))
+
+
+if __name__ == "__main__":
+    unittest.main()
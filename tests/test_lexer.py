@@ -1,4 +1,9 @@
+import io
+import os
+import random
+import tempfile
 import unittest
+from src.diagnostics import Diagnostics
 from src.lexer import Lexer, TokenType, LexerError
 
 
@@ -265,5 +270,371 @@ class TestLexer(unittest.TestCase):
             lexer.tokenize()
 
 
+def _lex(code, engine):
+    try:
+        tokens = Lexer(code, engine=engine).tokenize()
+    except LexerError as ex:
+        return ("error", str(ex), ex.line, ex.column)
+    return [(t.type, t.value, t.line, t.column) for t in tokens]
+
+
+class TestFastEngine(unittest.TestCase):
+    # Fragments that exercise every token class and the tricky boundaries
+    # between them (operator runs containing '/', strings with escapes and raw
+    # newlines, comments at end of input, invalid characters)
+    FRAGMENTS = [
+        "let",
+        "in",
+        "x",
+        "Psum",
+        "a_1",
+        "123",
+        "0",
+        " ",
+        "  ",
+        "\t",
+        "\n",
+        "(",
+        ")",
+        ";",
+        ",",
+        "+",
+        "-",
+        "->",
+        "**",
+        ">=",
+        "|",
+        "@",
+        "/",
+        "//",
+        "// note\n",
+        "'abc'",
+        "'a\\tb'",
+        "'\\''",
+        "'multi\nline'",
+        "_",
+        "\r",
+        "'open",
+        "'\\q'",
+        "\\",
+        "'\\\\'",
+        "é",
+        "x²",
+        "=",
+        ".",
+    ]
+
+    def test_matches_reference_on_samples(self):
+        samples = [
+            "",
+            "let Sum(A) = Psum (A,Order A )\n"
+            "where rec Psum (T,N) = N eq 0 -> 0\n"
+            "  | Psum(T,N-1)+T N\n"
+            "in Print ( Sum (1,2,3,4,5) )\n",
+            "x // trailing comment",
+            "a+//b\nc",
+            "'raw\nnewline' y",
+            "12ab",
+            "x\ty\n\n  z",
+        ]
+        for code in samples:
+            with self.subTest(code=code):
+                self.assertEqual(_lex(code, "fast"), _lex(code, "reference"))
+
+    def test_matches_reference_on_random_input(self):
+        rng = random.Random(3513)
+        for _ in range(2000):
+            code = "".join(
+                rng.choice(self.FRAGMENTS) for _ in range(rng.randint(0, 30))
+            )
+            with self.subTest(code=code):
+                self.assertEqual(_lex(code, "fast"), _lex(code, "reference"))
+
+    def test_error_messages_match(self):
+        for code in ["x\n  'abc", "'ok' '\\m'", "a ? b \r", "\n\n  ¬"]:
+            with self.subTest(code=code):
+                result = _lex(code, "fast")
+                self.assertEqual(result[0], "error")
+                self.assertEqual(result, _lex(code, "reference"))
+
+    def test_recovery_matches_reference(self):
+        rng = random.Random(1717)
+        for _ in range(500):
+            code = "".join(
+                rng.choice(self.FRAGMENTS) for _ in range(rng.randint(0, 30))
+            )
+            results = []
+            for scan in ("fast", "reference", "columnar"):
+                diagnostics = Diagnostics()
+                lexer = Lexer(
+                    code,
+                    "reference" if scan == "reference" else "fast",
+                    diagnostics=diagnostics,
+                )
+                tokens = (
+                    lexer.tokenize_columnar()
+                    if scan == "columnar"
+                    else (lexer.tokenize())
+                )
+                results.append(
+                    (
+                        [(t.type, t.value, t.line, t.column) for t in tokens],
+                        [str(d) for d in diagnostics],
+                    )
+                )
+            with self.subTest(code=code):
+                self.assertEqual(results[0], results[1])
+                self.assertEqual(results[2], results[1])
+                expected = _lex(code, "reference")
+                if expected[0] == "error":
+                    self.assertEqual(results[1][1][0], expected[1])
+                else:
+                    self.assertEqual((results[1][0], results[1][1]), (expected, []))
+
+    def test_recovery_stops_when_full(self):
+        diagnostics = Diagnostics(limit=3)
+        tokens = Lexer("a ? b \r c \r d \r e", diagnostics=diagnostics).tokenize()
+        self.assertEqual(len(diagnostics), 3)
+        self.assertEqual(
+            [t.value for t in tokens], ["a", "?", "b", "\r", "c", "\r", "d", ""]
+        )
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            Lexer("x", engine="bogus")
+
+
+def _split(code, rng):
+    chunks = []
+    while code:
+        size = rng.randint(0, 5)
+        chunks.append(code[:size])
+        code = code[size:]
+    return chunks
+
+
+def _stream(chunks):
+    try:
+        tokens = list(Lexer(chunks).iter_tokens())
+    except LexerError as ex:
+        return ("error", str(ex), ex.line, ex.column)
+    return [(t.type, t.value, t.line, t.column) for t in tokens]
+
+
+class TestIterTokens(unittest.TestCase):
+    def test_string_source(self):
+        code = "let x = 'a\\tb' in x // done\n"
+        self.assertEqual(_stream(code), _lex(code, "reference"))
+
+    def test_file_source(self):
+        code = "Print (1, 'two', x ** 3)\n" * 5000
+        self.assertEqual(_stream(io.StringIO(code)), _lex(code, "reference"))
+
+    def test_tokens_across_chunk_boundaries(self):
+        chunks = ["let ab", "c = 'x y", "\\", "'' -", ">", " 1", "2 /", "/ c", "\nz"]
+        self.assertEqual(_stream(chunks), _lex("".join(chunks), "reference"))
+
+    def test_random_chunking_matches_reference(self):
+        rng = random.Random(42)
+        for _ in range(1000):
+            code = "".join(
+                rng.choice(TestFastEngine.FRAGMENTS) for _ in range(rng.randint(0, 30))
+            )
+            with self.subTest(code=code):
+                self.assertEqual(_stream(_split(code, rng)), _lex(code, "reference"))
+
+    def test_is_lazy(self):
+        consumed = []
+
+        def chunks():
+            for i in range(1000):
+                consumed.append(i)
+                yield f"x{i} "
+
+        tokens = Lexer(chunks()).iter_tokens()
+        first = next(tokens)
+        self.assertEqual((first.value, first.line, first.column), ("x0", 1, 1))
+        self.assertLess(len(consumed), 5)
+
+    def test_error_before_end_of_input(self):
+        consumed = []
+
+        def chunks():
+            yield "x \r y"
+            for i in range(1000):
+                consumed.append(i)
+                yield " z"
+
+        with self.assertRaises(LexerError) as cm:
+            list(Lexer(chunks()).iter_tokens())
+        self.assertEqual((cm.exception.line, cm.exception.column), (1, 3))
+        self.assertLess(len(consumed), 5)
+
+
+class TestCompactTokens(unittest.TestCase):
+    CODE = "let f x = x + 1 // add\nin f 'a\\nb' // call\n"
+
+    def test_token_has_no_dict(self):
+        token = Lexer("x").tokenize()[0]
+        self.assertFalse(hasattr(token, "__dict__"))
+
+    def test_names_and_operators_are_interned(self):
+        tokens = Lexer("".join(["ab", "c -", "> abc ", "-", ">"])).tokenize()
+        self.assertIs(tokens[0].value, tokens[2].value)
+        self.assertIs(tokens[1].value, tokens[3].value)
+
+    def test_skip_comments(self):
+        for engine in ("fast", "reference"):
+            with self.subTest(engine=engine):
+                tokens = Lexer(self.CODE, engine=engine, skip_comments=True)
+                expected = [
+                    t for t in _lex(self.CODE, engine) if t[0] != TokenType.COMMENT
+                ]
+                self.assertEqual(
+                    [(t.type, t.value, t.line, t.column) for t in tokens.tokenize()],
+                    expected,
+                )
+
+    def test_columnar_matches_tokenize(self):
+        for code in [self.CODE, "", "x\n\n  é 'ü'", "'a\\'b' 12 ** c"]:
+            with self.subTest(code=code):
+                buffer = Lexer(code).tokenize_columnar()
+                self.assertEqual(
+                    [(t.type, t.value, t.line, t.column) for t in buffer],
+                    _lex(code, "reference"),
+                )
+
+    def test_columnar_values_are_lazy(self):
+        buffer = Lexer(self.CODE, skip_comments=True).tokenize_columnar()
+        self.assertEqual(len(buffer), 11)
+        self.assertEqual(buffer.values, {})
+        self.assertEqual(buffer[-2].value, "'a\nb'")
+        self.assertEqual(buffer[-1].type, TokenType.EOF)
+        with self.assertRaises(IndexError):
+            buffer[len(buffer)]
+
+    def test_columnar_errors_match(self):
+        for code in ["x 'abc", "a\n \r"]:
+            with self.subTest(code=code):
+                with self.assertRaises(LexerError) as cm:
+                    Lexer(code).tokenize_columnar()
+                self.assertEqual(str(cm.exception), _lex(code, "reference")[1])
+
+
+def _tokens(buffer):
+    return [(t.type, t.value, t.line, t.column) for t in buffer]
+
+
+class TestEdits(unittest.TestCase):
+    CODE = "let f x = x + 1 // add\nin f 'a\\nb' // call\n  (g 2)\n"
+
+    def test_edit_matches_full_scan(self):
+        for skip_comments in (False, True):
+            buffer = Lexer(self.CODE, skip_comments=skip_comments).tokenize_columnar()
+            edited = self.CODE.replace("x + 1", "xy+\n 12")
+            offset = self.CODE.index("x + 1")
+            first, old_stop, new_stop = buffer.edit(offset, 5, "xy+\n 12")
+            with self.subTest(skip_comments=skip_comments):
+                expected = Lexer(edited, skip_comments=skip_comments).tokenize()
+                self.assertEqual(_tokens(buffer), _tokens(expected))
+                self.assertEqual(buffer.source, edited)
+                self.assertEqual((first, old_stop, new_stop), (4, 7, 7))
+
+    def test_only_touched_tokens_are_scanned(self):
+        code = "x = 1 + 2\n" * 1000
+        buffer = Lexer(code).tokenize_columnar()
+        self.assertEqual(buffer.edit(5008, 1, "33"), (2504, 2505, 2505))
+        self.assertEqual(buffer.edit(5010, 0, "\n\n"), (2505, 2505, 2505))
+        buffer.settle()
+        expected = Lexer(code[:5008] + "33\n\n" + code[5009:]).tokenize_columnar()
+        self.assertEqual(_tokens(buffer), _tokens(expected))
+        self.assertEqual(list(buffer.starts), list(expected.starts))
+        self.assertEqual(list(buffer.lines), list(expected.lines))
+
+    def test_random_edits(self):
+        fragments = [f for f in TestFastEngine.FRAGMENTS if f.isascii()]
+        rng = random.Random(1818)
+        for _ in range(300):
+            code = "".join(rng.choice(fragments) for _ in range(rng.randint(0, 30)))
+            try:
+                buffer = Lexer(code, skip_comments=True).tokenize_columnar()
+            except LexerError:
+                continue
+            for _ in range(5):
+                offset = rng.randint(0, len(code))
+                removed = rng.randint(0, min(5, len(code) - offset))
+                inserted = "".join(rng.choice(fragments) for _ in range(3))
+                edited = code[:offset] + inserted + code[offset + removed :]
+                with self.subTest(code=code, edited=edited):
+                    try:
+                        expected = _tokens(
+                            Lexer(edited, skip_comments=True).tokenize_columnar()
+                        )
+                    except LexerError:
+                        with self.assertRaises(LexerError):
+                            buffer.edit(offset, removed, inserted)
+                        self.assertEqual(buffer.source, code)
+                        continue
+                    buffer.edit(offset, removed, inserted)
+                    self.assertEqual(_tokens(buffer), expected)
+                code = edited
+
+    def test_non_ascii_edits_scan_everything(self):
+        buffer = Lexer("a b c").tokenize_columnar()
+        self.assertEqual(buffer.edit(2, 1, "é"), (0, 4, 4))
+        self.assertEqual(_tokens(buffer), _lex("a é c", "reference"))
+
+
+class TestMappedFiles(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".rpal")
+        os.close(handle)
+        self.addCleanup(os.unlink, self.path)
+
+    def _mapped(self, code):
+        with open(self.path, "w", encoding="utf-8", newline="") as source:
+            source.write(code)
+        try:
+            tokens = Lexer(None).tokenize_mapped(self.path)
+        except LexerError as ex:
+            return ("error", str(ex), ex.line, ex.column)
+        return [(t.type, t.value, t.line, t.column) for t in tokens]
+
+    def test_matches_reference(self):
+        samples = [TestCompactTokens.CODE, "", "x\n\n  é 'ü'", "'a\\'b' 12 ** c"]
+        for code in samples:
+            with self.subTest(code=code):
+                self.assertEqual(self._mapped(code), _lex(code, "reference"))
+
+    def test_matches_reference_on_random_input(self):
+        rng = random.Random(1606)
+        for _ in range(300):
+            code = "".join(
+                rng.choice(TestFastEngine.FRAGMENTS) for _ in range(rng.randint(0, 30))
+            )
+            with self.subTest(code=code):
+                self.assertEqual(self._mapped(code), _lex(code, "reference"))
+
+    def test_values_are_decoded_lazily(self):
+        self._mapped("x 'a\\tb' 12")
+        buffer = Lexer(None).tokenize_mapped(self.path)
+        self.assertIsInstance(buffer.source[0:1], bytes)
+        self.assertEqual(buffer.values, {})
+        self.assertEqual(buffer[1].value, "'a\tb'")
+
+    def test_edits(self):
+        code = TestEdits.CODE
+        self._mapped(code)
+        buffer = Lexer(None).tokenize_mapped(self.path)
+        offset = code.index("x + 1")
+        self.assertEqual(buffer.edit(offset, 5, "xy+\n 12"), (4, 7, 7))
+        edited = code.replace("x + 1", "xy+\n 12")
+        self.assertEqual(buffer.source, edited)
+        self.assertEqual(_tokens(buffer), _tokens(Lexer(edited).tokenize()))
+        with self.assertRaises(LexerError):
+            buffer.edit(0, 0, "'")
+        self.assertEqual(_tokens(buffer), _tokens(Lexer(edited).tokenize()))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,172 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from src import myrpal
+from src.ast import format_tree
+from src.cache import source_key
+from src.cse_machine import CSEError, Machine, compile_tree
+from src.optimizer import optimize
+from src.parser import parse
+from src.standardizer import standardize
+from tests.test_batch import PROGRAMS
+from tests.test_parser import SUM_PROGRAM
+
+# Programs run at every level; each must print the same at all of them
+CORPUS = [
+    SUM_PROGRAM,
+    *(code for name, code in PROGRAMS.items() if name in ("b.rpal", "c.rpal")),
+    "let rec f n = n eq 0 -> 1 | n * f (n - 1) in Print (f 20)",
+    "Print (-7 / 2, 7 / 2, 2 ** 10, 2 ** (-1), 5 - 3 - 1, 3 gr 2, 2 le 1)",
+    "Print (not true or false, true & false, 'a' eq 'a', 1 ne 1)",
+    "let t = nil aug 1 aug (2, 3) in Print (t, Order t, t 2 1, Null nil)",
+    "Print (Conc 'ab' 'cd', Stem 'xy', Stern 'xy', ItoS 42, 'a\\tb')",
+    "let f (x, y) = x - y and g () = 7 in Print (f (5, 2), g nil)",
+    "let x = 1 in let f y = x + y in let x = 10 in Print (f x)",
+    "let f x = Print x in (f 1, f 1, f 1)",
+    "let unused = fn x. x in let g = fn y. y in Print (g, (fn z. z) 1)",
+    "let x = 1 / 0 in Print 1",
+    "let x = Print 'side effect' in Print 2",
+    "let x = y in Print 3",
+    "Print (true -> 1 + 2 | 1 / 0, 1 gr 2 -> 'no' | Conc 'ye' 's')",
+    "let Conc x y = x in Print (Conc 'a' 'b')",
+    "Print (1 eq true)",
+]
+
+
+def run(code, level):
+    tree = standardize(parse(code))
+    if level:
+        tree = optimize(tree, level)
+    output = io.StringIO()
+    try:
+        Machine(compile_tree(tree), output).run()
+    except CSEError as error:
+        return output.getvalue(), str(error)
+    return output.getvalue(), None
+
+
+def optimized(code, level=2):
+    return format_tree(optimize(standardize(parse(code)), level))
+
+
+def standard(code):
+    return format_tree(standardize(parse(code)))
+
+
+class TestFolding(unittest.TestCase):
+    def test_operators_on_literals(self):
+        code = "Print (1 + 2 * 3, -(2 ** 3), 7 / (-2), 'a' ls 'b', not (1 eq 2))"
+        self.assertEqual(
+            optimized(code, 1),
+            "gamma\n.<ID:Print>\n.tau\n..<INT:7>\n..<INT:-8>\n..<INT:-3>"
+            "\n..<true>\n..<true>",
+        )
+
+    def test_failing_operations_are_left(self):
+        for code in ("1 / 0", "1 + 'a'", "1 eq true", "not 1"):
+            with self.subTest(code=code):
+                self.assertEqual(optimized(code), standard(code))
+        self.assertEqual(optimized("0 ** (1 - 2)"), "**\n.<INT:0>\n.<INT:-1>")
+
+    def test_large_results_are_left(self):
+        code = "false -> 9 ** 9 ** 9 | 1"
+        # ** groups to the right, and 9 ** 9 is small enough
+        self.assertEqual(optimized("9 ** 9 ** 9"), standard("9 ** 387420489"))
+        self.assertEqual(optimized(code), "<INT:1>")
+
+    def test_aug_builds_a_tuple(self):
+        self.assertEqual(
+            optimized("nil aug 1 aug x aug (2, 3)"), standard("(1, x, (2, 3))")
+        )
+        self.assertEqual(optimized("(1, 2) aug 3"), standard("(1, 2, 3)"))
+        self.assertEqual(optimized("x aug 3"), standard("x aug 3"))
+
+    def test_conc(self):
+        self.assertEqual(optimized("Conc 'a\\n' 'b'"), "<STR:'a\\nb'>")
+        code = "let Conc x y = x in Conc 'a' 'b'"
+        self.assertIn("<STR:'b'>", optimized(code))
+
+    def test_conditionals(self):
+        self.assertEqual(optimized("1 ls 2 -> x | y"), "<ID:x>")
+        self.assertEqual(optimized("'a' eq 'b' -> x | y"), "<ID:y>")
+        self.assertEqual(optimized("x -> 1 | 2"), standard("x -> 1 | 2"))
+
+
+class TestDeadBindings(unittest.TestCase):
+    def test_unused_bindings_are_dropped(self):
+        code = (
+            "let rec f n = f n in let g x = x within h = 1 in "
+            "let a = (1, 'b', true) in let b = a in Print 5 where c = Print"
+        )
+        self.assertEqual(optimized(code), standard("Print 5"))
+
+    def test_bindings_kept(self):
+        for code in (
+            "let x = 1 in x",
+            "let x = Print 1 in 2",
+            "let x = 1 / 0 in 2",
+            "let x = y in 2",
+            "let x = 1 + 2 * y in 2",
+            "let x, y = 1, 2 in 3",
+            "let rec f, g = Print 1, 2 in 3",
+        ):
+            with self.subTest(code=code):
+                self.assertEqual(optimized(code, 2), optimized(code, 1))
+
+    def test_level_one_keeps_bindings(self):
+        code = "let x = 1 + 1 in 3"
+        self.assertEqual(optimized(code, 1), standard("let x = 2 in 3"))
+        self.assertEqual(optimized(code, 0), standard(code))
+
+    def test_shadowed_names(self):
+        code = "let x = 1 in let x = 2 in x"
+        self.assertEqual(optimized(code), standard("let x = 2 in x"))
+        code = "let x = 1 in ((let x = 2 in 3), x)"
+        self.assertEqual(optimized(code), standard("let x = 1 in (3, x)"))
+
+    def test_long_chains(self):
+        code = (
+            "let a0 = 1 in "
+            + "".join(f"let a{i + 1} = a{i} in " for i in range(5000))
+            + "Print 5"
+        )
+        self.assertEqual(optimized(code), standard("Print 5"))
+
+
+class TestOutput(unittest.TestCase):
+    def test_corpus_prints_the_same_at_every_level(self):
+        for code in CORPUS:
+            expected = run(code, 0)
+            for level in (1, 2):
+                with self.subTest(code=code, level=level):
+                    self.assertEqual(run(code, level), expected)
+
+    def test_closures_keep_their_numbers(self):
+        code = "let f = fn x. x in let g = (fn y. y) 1 in Print (fn z. z)"
+        self.assertEqual(run(code, 2), ("[lambda closure: z: 3]", None))
+
+    def test_command_line(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "program.rpal")
+        with open(path, "w") as source:
+            source.write("let x = 2 ** 10 in Print (Conc 'a' 'b')")
+        cache_dir = os.path.join(directory.name, "cache")
+        outputs = []
+        for flags in ([], ["-O"], ["-O2"], ["-O2", "-st"]):
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                status = myrpal.main([*flags, "--cache-dir", cache_dir, path])
+            self.assertEqual(status, 0)
+            outputs.append(stdout.getvalue())
+        self.assertEqual(outputs[:3], ["ab\n"] * 3)
+        self.assertEqual(outputs[3], "gamma\n.<ID:Print>\n.<STR:'ab'>\n")
+        # Each level is cached under its own key
+        keys = {source_key(b"x", level) for level in (0, 1, 2)}
+        self.assertEqual(len(keys), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,338 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from src import myrpal
+from src.ast import format_tree
+from src.diagnostics import Diagnostic, Diagnostics
+from src.lexer import Lexer, LexerError
+from src.parser import Parser, ParserError, check, parse, parse_file
+
+SUM_PROGRAM = """let Sum(A) = Psum (A,Order A )
+where rec Psum (T,N) = N eq 0 -> 0
+ | Psum(T,N-1)+T N
+in Print ( Sum (1,2,3,4,5) )
+"""
+
+SUM_AST = """let
+.function_form
+..<ID:Sum>
+..<ID:A>
+..where
+...gamma
+....<ID:Psum>
+....tau
+.....<ID:A>
+.....gamma
+......<ID:Order>
+......<ID:A>
+...rec
+....function_form
+.....<ID:Psum>
+.....,
+......<ID:T>
+......<ID:N>
+.....->
+......eq
+.......<ID:N>
+.......<INT:0>
+......<INT:0>
+......+
+.......gamma
+........<ID:Psum>
+........tau
+.........<ID:T>
+.........-
+..........<ID:N>
+..........<INT:1>
+.......gamma
+........<ID:T>
+........<ID:N>
+.gamma
+..<ID:Print>
+..gamma
+...<ID:Sum>
+...tau
+....<INT:1>
+....<INT:2>
+....<INT:3>
+....<INT:4>
+....<INT:5>"""
+
+
+def _ast(code):
+    return format_tree(parse(code)).split("\n")
+
+
+class TestParser(unittest.TestCase):
+    def test_sample_program(self):
+        self.assertEqual(format_tree(parse(SUM_PROGRAM)), SUM_AST)
+
+    def test_parse_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".rpal", delete=False) as source:
+            source.write(SUM_PROGRAM)
+        self.addCleanup(os.unlink, source.name)
+        self.assertEqual(format_tree(parse_file(source.name)), SUM_AST)
+
+    def test_arithmetic_precedence(self):
+        self.assertEqual(
+            _ast("-a * b + c - d"),
+            ["-", ".+", "..neg", "...*", "....<ID:a>", "....<ID:b>"]
+            + ["..<ID:c>", ".<ID:d>"],
+        )
+
+    def test_power_is_right_associative(self):
+        self.assertEqual(
+            _ast("x ** y ** z"),
+            ["**", ".<ID:x>", ".**", "..<ID:y>", "..<ID:z>"],
+        )
+
+    def test_boolean_precedence(self):
+        self.assertEqual(
+            _ast("a & not b < c or d"),
+            ["or", ".&", "..<ID:a>", "..not", "...ls"]
+            + ["....<ID:b>", "....<ID:c>", ".<ID:d>"],
+        )
+
+    def test_comparison_symbols(self):
+        for symbol, label in [
+            ("gr", "gr"),
+            (">", "gr"),
+            ("ge", "ge"),
+            (">=", "ge"),
+            ("ls", "ls"),
+            ("<", "ls"),
+            ("le", "le"),
+            ("<=", "le"),
+            ("eq", "eq"),
+            ("ne", "ne"),
+        ]:
+            with self.subTest(symbol=symbol):
+                self.assertEqual(_ast(f"a {symbol} b")[0], label)
+
+    def test_application_and_infix(self):
+        self.assertEqual(
+            _ast("f x @ g y z"),
+            ["@", ".gamma", "..<ID:f>", "..<ID:x>", ".<ID:g>"]
+            + [".gamma", "..<ID:y>", "..<ID:z>"],
+        )
+
+    def test_conditional_chain(self):
+        self.assertEqual(
+            _ast("a -> b | c -> d | e"),
+            ["->", ".<ID:a>", ".<ID:b>", ".->", "..<ID:c>", "..<ID:d>", "..<ID:e>"],
+        )
+
+    def test_tuples_and_aug(self):
+        self.assertEqual(
+            _ast("nil aug 1, 'two', true"),
+            ["tau", ".aug", "..<nil>", "..<INT:1>", ".<STR:'two'>", ".<true>"],
+        )
+
+    def test_lambda_variables(self):
+        self.assertEqual(
+            _ast("fn (a, b) () c. dummy"),
+            ["lambda", ".,", "..<ID:a>", "..<ID:b>", ".()", ".<ID:c>", ".<dummy>"],
+        )
+
+    def test_definitions(self):
+        self.assertEqual(
+            _ast("let rec f x = x and a, b = t within c = 3 in c"),
+            [
+                "let",
+                ".within",
+                "..and",
+                "...rec",
+                "....function_form",
+                ".....<ID:f>",
+                ".....<ID:x>",
+                ".....<ID:x>",
+                "...=",
+                "....,",
+                ".....<ID:a>",
+                ".....<ID:b>",
+                "....<ID:t>",
+                "..=",
+                "...<ID:c>",
+                "...<INT:3>",
+                ".<ID:c>",
+            ],
+        )
+
+    def test_string_escapes_are_printed_as_written(self):
+        self.assertEqual(_ast("'a\\nb\\t\\'c\\''"), ["<STR:'a\\nb\\t\\'c\\''>"])
+
+    def test_comments_are_ignored(self):
+        tokens = Lexer("f // call\n x").tokenize()
+        self.assertEqual(format_tree(Parser(tokens).parse()), "gamma\n.<ID:f>\n.<ID:x>")
+
+    def test_consumes_tokens_lazily(self):
+        seen = []
+
+        def tokens():
+            for token in Lexer("a b c ) d").iter_tokens():
+                seen.append(token.value)
+                yield token
+
+        with self.assertRaises(ParserError):
+            Parser(tokens()).parse()
+        self.assertEqual(seen, ["a", "b", "c", ")"])
+
+    def test_deep_chains_do_not_recurse(self):
+        depth = 20000
+        code = "let x = 1 in " * depth + "x"
+        tree = parse(code)
+        self.assertEqual(tree.label, "let")
+        code = "a -> b | " * depth + "c"
+        self.assertEqual(parse(code).label, "->")
+        code = "fn x. " * depth + "x"
+        self.assertEqual(parse(code).label, "lambda")
+        code = " + ".join(["1"] * depth)
+        self.assertEqual(parse(code).label, "+")
+        code = "let d = 1 " + "within d = 1 " * depth + "in d"
+        self.assertEqual(parse(code).label, "let")
+
+    def test_errors(self):
+        cases = [
+            ("let x = 1 x", "Expected 'in'", 1, 12),
+            ("(a, b", "Expected ')'", 1, 6),
+            ("a b )", "Expected end of input", 1, 5),
+            ("let in = 3 in 4", "Expected an identifier", 1, 5),
+            ("a * -b", "Expected an operand", 1, 5),
+            ("a < b < c", "Expected end of input", 1, 7),
+            ("fn . x", "Expected an identifier", 1, 4),
+        ]
+        for code, message, line, column in cases:
+            with self.subTest(code=code):
+                with self.assertRaises(ParserError) as cm:
+                    parse(code)
+                self.assertIn(message, str(cm.exception))
+                self.assertEqual(
+                    (cm.exception.line, cm.exception.column), (line, column)
+                )
+
+    def test_deep_nesting_does_not_recurse(self):
+        depth = 20000
+        tree = parse("Print " + "(" * depth + "1" + ")" * depth)
+        self.assertEqual(_ast("Print ((1))"), ["gamma", ".<ID:Print>", ".<INT:1>"])
+        self.assertEqual(tree.label, "gamma")
+        tree = parse("(" * depth + "1, 2" + ")" * depth)
+        self.assertEqual(tree.label, "tau")
+        tree = parse("(x where x = " * depth + "1" + ")" * depth)
+        self.assertEqual(tree.label, "where")
+        code = "let x = " + "(y where y = " * depth + "1" + ")" * depth + " in x"
+        self.assertEqual(parse(code).label, "let")
+        code = " ** ".join(["2"] * depth)
+        self.assertEqual(parse(code).label, "**")
+        self.assertEqual(parse("not (" * depth + "a" + ")" * depth).label, "not")
+        self.assertEqual(parse("-(" * depth + "a" + ")" * depth).label, "neg")
+        code = "let " + "(" * depth + "x = 1" + ")" * depth + " in x"
+        self.assertEqual(parse(code).label, "let")
+
+    def test_deep_nesting_errors(self):
+        depth = 20000
+        with self.assertRaises(ParserError) as cm:
+            parse("(" * depth + "1" + ")" * (depth - 1))
+        self.assertIn("Expected ')'", str(cm.exception))
+        code = "(" * depth + "1 +" + ")" * depth + " ; 2 +"
+        self.assertEqual(
+            [(d.column, d.message) for d in check(code, 10)],
+            [
+                (depth + 4, "Expected an operand but found ')'"),
+                (2 * depth + 5, "Expected end of input but found ';'"),
+                (2 * depth + 10, "Expected an operand but found end of input"),
+            ],
+        )
+
+
+class TestRecovery(unittest.TestCase):
+    def _check(self, code, limit=100):
+        return [(d.line, d.column, d.message) for d in check(code, limit)]
+
+    def test_valid_program(self):
+        self.assertEqual(check(SUM_PROGRAM), [])
+
+    def test_reports_every_error(self):
+        code = (
+            "let a = 1 and b = ) and c = 2\n"
+            "in (a + * b) + c 'x\\q' + Print ((1 +), 2 ** )"
+        )
+        self.assertEqual(
+            self._check(code),
+            [
+                (1, 19, "Expected an operand but found ')'"),
+                (2, 10, "Expected an operand but found '*'"),
+                (2, 21, "Invalid escape sequence '\\q'"),
+                (2, 38, "Expected an operand but found ')'"),
+                (2, 46, "Expected an operand but found ')'"),
+            ],
+        )
+
+    def test_resynchronizes_at_in_and_semicolon(self):
+        code = "let x = 1 in\n let y = x +\n in y ; z w ; 1 +"
+        self.assertEqual(
+            self._check(code),
+            [
+                (3, 3, "Expected an operand but found 'in'"),
+                (3, 8, "Expected end of input but found ';'"),
+                (3, 14, "Expected end of input but found ';'"),
+                (3, 19, "Expected an operand but found end of input"),
+            ],
+        )
+
+    def test_lexer_errors_are_not_repeated(self):
+        code = "let s = 'open\nin s \r\r + 1"
+        self.assertEqual(
+            self._check(code),
+            [(1, 9, "Unterminated string"), (2, 7, "Invalid character '\r'")],
+        )
+
+    def test_messages_match_the_first_error(self):
+        for code in ["let x = 1 x", "(a, b", "a b )", "fn . x", "x 'a\\m'"]:
+            with self.subTest(code=code):
+                try:
+                    parse(code)
+                except (ParserError, LexerError) as error:
+                    expected = str(error)
+                self.assertEqual(str(check(code)[0]), expected)
+
+    def test_error_nodes(self):
+        diagnostics = Diagnostics()
+        lexer = Lexer("f (1 +) ²", skip_comments=True, diagnostics=diagnostics)
+        tree = Parser(lexer.iter_tokens(), diagnostics).parse()
+        self.assertEqual(
+            format_tree(tree).splitlines(),
+            ["gamma", ".gamma", "..<ID:f>", "..<error>", ".<INT:²>"],
+        )
+
+    def test_bounded(self):
+        code = "let f x = (x + ) in g ) ;\n" * 5000
+        self.assertEqual(len(check(code, limit=7)), 7)
+        self.assertEqual(len(check(code, limit=10**6)), 10001)
+        self.assertEqual(
+            check("x +", 1),
+            [Diagnostic("Expected an operand but found end of input", 1, 4)],
+        )
+
+    def test_command_line(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for name, code in [("good.rpal", SUM_PROGRAM), ("bad.rpal", "(1 +) (")]:
+            with open(os.path.join(directory, name), "w") as source:
+                source.write(code)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            status = myrpal.main(["--check", directory])
+        self.assertEqual(status, 1)
+        bad = os.path.join(directory, "bad.rpal")
+        self.assertEqual(
+            stdout.getvalue(),
+            f"{bad}:1:5: Expected an operand but found ')'\n"
+            f"{bad}:1:8: Expected an operand but found end of input\n",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
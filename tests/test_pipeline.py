@@ -0,0 +1,108 @@
+import contextlib
+import io
+import os
+import pickle
+import tempfile
+import unittest
+from src import myrpal
+from src.ast import format_tree
+from src.cache import ProgramCache, source_key
+from src.parser import parse
+from src.pipeline import chunks, process_file, run_front_end
+from src.standardizer import standardize
+from tests.test_batch import PROGRAMS
+
+
+def _key(result):
+    value = result.value
+    if hasattr(value, "root"):
+        value = format_tree(value.node(value.root))
+    return result.path, value, result.error
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.paths = []
+        for name, code in sorted(PROGRAMS.items()):
+            if not name.endswith(".rpal"):
+                continue
+            path = os.path.join(self.directory, name.replace("/", "_"))
+            with open(path, "w") as source:
+                source.write(code)
+            self.paths.append(path)
+
+    def test_results_match_the_single_file_front_end(self):
+        results = list(run_front_end(self.paths, "st", jobs=1, text=True))
+        self.assertEqual([result.path for result in results], self.paths)
+        self.assertEqual([result.ok for result in results], [1, 1, 1, 0, 1])
+        self.assertEqual(
+            results[0].value, format_tree(standardize(parse(PROGRAMS["a.rpal"])))
+        )
+        self.assertIn("Expected an operand", results[3].error)
+
+    def test_jobs_keep_order(self):
+        for stage in ("ast", "st", "compile"):
+            serial = run_front_end(self.paths, stage, jobs=1, cache_dir=None)
+            pooled = run_front_end(self.paths, stage, jobs=3, cache_dir=None)
+            self.assertEqual(list(map(_key, pooled)), list(map(_key, serial)))
+
+    def test_missing_file(self):
+        result = process_file(os.path.join(self.directory, "missing.rpal"))
+        self.assertFalse(result.ok)
+        with self.assertRaises(ValueError):
+            process_file(self.paths[0], "run")
+
+    def test_results_are_flat(self):
+        # The AST comes back as a few arrays, not an object per node
+        result = process_file(self.paths[0], "ast")
+        nodes = len(result.value)
+        self.assertLess(len(pickle.dumps(result, -1)), 40 * nodes)
+        restored = pickle.loads(pickle.dumps(result, -1))
+        self.assertEqual(
+            format_tree(restored.value.node(restored.value.root)),
+            format_tree(parse(PROGRAMS["a.rpal"])),
+        )
+
+    def test_chunks(self):
+        with open(self.paths[0], "a") as source:
+            source.write("\n" * 300_000)
+        grouped = list(chunks(self.paths, 2))
+        # The big file is a chunk of its own; the small ones share one
+        self.assertEqual(grouped, [self.paths[:1], self.paths[1:]])
+        self.assertEqual(list(chunks(self.paths[1:], 8)), [self.paths[1:]])
+
+    def test_command_line(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            status = myrpal.main(["--batch", "-st", "--jobs", "2", *self.paths[:3]])
+        self.assertEqual(status, 0)
+        expected = io.StringIO()
+        with contextlib.redirect_stdout(expected):
+            myrpal.main(["-st", self.paths[0]])
+        self.assertTrue(
+            stdout.getvalue().startswith(
+                f"==> {self.paths[0]} <==\n{expected.getvalue()}==> "
+            )
+        )
+
+    def test_warm_cache(self):
+        cache_dir = os.path.join(self.directory, "cache")
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            myrpal.main(["--warm-cache", "--no-cache", "--batch", *self.paths])
+        with contextlib.redirect_stderr(stderr):
+            status = myrpal.main(
+                ["--batch", "--warm-cache", "--cache-dir", cache_dir, *self.paths]
+            )
+        self.assertEqual(status, 1)
+        self.assertEqual(stderr.getvalue().count("myrpal: "), 1)
+        cache = ProgramCache(cache_dir)
+        with open(self.paths[2], "rb") as source:
+            self.assertIsNotNone(cache.load(source_key(source.read())))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from src import myrpal
+from src.cse_machine import Machine
+from src.profiling import (
+    PHASES,
+    Profiler,
+    format_json,
+    format_report,
+    profile_source,
+)
+from tests.test_parser import SUM_PROGRAM
+
+
+class TestProfiler(unittest.TestCase):
+    def test_phases_and_counts(self):
+        output = io.StringIO()
+        profiler = profile_source(SUM_PROGRAM, output)
+        self.assertEqual(output.getvalue(), "15")
+        report = profiler.report()
+        self.assertEqual([phase["name"] for phase in report["phases"]], list(PHASES))
+        for phase in report["phases"]:
+            self.assertGreaterEqual(phase["seconds"], 0)
+            self.assertGreaterEqual(phase["peak_memory"], 0)
+        counts = report["counts"]
+        self.assertEqual(counts["tokens"], 56)
+        self.assertEqual(counts["ast_nodes"], 44)
+        self.assertEqual(counts["standardized_nodes"], 49)
+        self.assertEqual(counts["control_structures"], 6)
+        self.assertEqual(counts["instructions"], 42)
+        self.assertEqual(counts["cse_steps"], 111)
+        self.assertEqual(counts["closures_created"], 4)
+        # The let of Sum, the call of Sum, the where of Psum and six calls of Psum
+        self.assertEqual(counts["environment_frames"], 9)
+        self.assertEqual(counts["memo_hits"], 0)
+        self.assertEqual(counts["max_stack_depth"], 7)
+        self.assertEqual(counts["max_control_depth"], 22)
+
+    def test_environment_frames(self):
+        code = (
+            "let rec fib n = n ls 2 -> n | fib (n - 1) + fib (n - 2) in Print (fib 10)"
+        )
+        counts = profile_source(code, io.StringIO()).counts
+        # The let of fib and its 177 calls
+        self.assertEqual((counts["environment_frames"], counts["memo_hits"]), (178, 0))
+        # Answers from the memo bind no frame: the let and fib 0 to fib 10
+        counts = profile_source(code, io.StringIO(), memo_size=100).counts
+        self.assertEqual((counts["environment_frames"], counts["memo_hits"]), (12, 8))
+        code = (
+            "let rec (even n = n eq 0 -> true | odd (n - 1)"
+            " and odd n = n eq 0 -> false | even (n - 1)) in Print (even 4)"
+        )
+        # The let, the frame Y* ties for even and odd, and five calls
+        self.assertEqual(
+            profile_source(code, io.StringIO()).counts["environment_frames"], 7
+        )
+
+    def test_counts_are_deterministic(self):
+        first = profile_source(SUM_PROGRAM, io.StringIO()).counts
+        second = profile_source(SUM_PROGRAM, io.StringIO()).counts
+        self.assertEqual(first, second)
+
+    def test_subscribers(self):
+        events = []
+        profiler = Profiler(trace_memory=False)
+        profiler.subscribe(events.append)
+        profile_source("Print 1", io.StringIO(), profiler=profiler)
+        self.assertEqual([event.name for event in events], list(PHASES))
+        self.assertTrue(all(event.peak_memory is None for event in events))
+        profiler.unsubscribe(events.append)
+        with profiler.phase("custom"):
+            pass
+        self.assertEqual(len(events), len(PHASES))
+        self.assertEqual(profiler.events[-1].name, "custom")
+
+    def test_reports(self):
+        report = profile_source("Print (1, 2)", io.StringIO()).report()
+        self.assertEqual(json.loads(format_json(report))["counts"], report["counts"])
+        text = format_report(report)
+        for name in PHASES:
+            self.assertIn(name, text)
+        self.assertIn("cse steps", text)
+
+    def test_plain_machines_are_not_instrumented(self):
+        self.assertEqual(Machine._stacks.__qualname__, "Machine._stacks")
+
+
+class TestCommandLine(unittest.TestCase):
+    def test_json_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sum.rpal")
+            with open(path, "w") as source:
+                source.write(SUM_PROGRAM)
+            stdout = io.StringIO()
+            stderr = io.StringIO()
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                status = myrpal.main(["--profile", "--profile-format", "json", path])
+        self.assertEqual(status, 0)
+        self.assertEqual(stdout.getvalue(), "15\n")
+        report = json.loads(stderr.getvalue())
+        self.assertEqual(report["counts"]["control_structures"], 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+import unittest
+from src import ast
+from src.ast import format_tree
+from src.parser import parse
+from src.standardizer import Standardizer, StandardizerError, standardize
+from tests.test_parser import SUM_PROGRAM
+
+SUM_ST = """gamma
+.lambda
+..<ID:Sum>
+..gamma
+...<ID:Print>
+...gamma
+....<ID:Sum>
+....tau
+.....<INT:1>
+.....<INT:2>
+.....<INT:3>
+.....<INT:4>
+.....<INT:5>
+.lambda
+..<ID:A>
+..gamma
+...lambda
+....<ID:Psum>
+....gamma
+.....<ID:Psum>
+.....tau
+......<ID:A>
+......gamma
+.......<ID:Order>
+.......<ID:A>
+...gamma
+....<Y*>
+....lambda
+.....<ID:Psum>
+.....lambda
+......,
+.......<ID:T>
+.......<ID:N>
+......->
+.......eq
+........<ID:N>
+........<INT:0>
+.......<INT:0>
+.......+
+........gamma
+.........<ID:Psum>
+.........tau
+..........<ID:T>
+..........-
+...........<ID:N>
+...........<INT:1>
+........gamma
+.........<ID:T>
+.........<ID:N>"""
+
+
+def _st(code):
+    return format_tree(standardize(parse(code))).split("\n")
+
+
+class TestStandardizer(unittest.TestCase):
+    def test_sample_program(self):
+        self.assertEqual(format_tree(standardize(parse(SUM_PROGRAM))), SUM_ST)
+
+    def test_let(self):
+        self.assertEqual(
+            _st("let x = 1 in x"),
+            ["gamma", ".lambda", "..<ID:x>", "..<ID:x>", ".<INT:1>"],
+        )
+
+    def test_where(self):
+        self.assertEqual(_st("x where x = 1"), _st("let x = 1 in x"))
+
+    def test_function_form(self):
+        self.assertEqual(
+            _st("let f x (a, b) = x in f"),
+            [
+                "gamma",
+                ".lambda",
+                "..<ID:f>",
+                "..<ID:f>",
+                ".lambda",
+                "..<ID:x>",
+                "..lambda",
+                "...,",
+                "....<ID:a>",
+                "....<ID:b>",
+                "...<ID:x>",
+            ],
+        )
+
+    def test_multi_parameter_lambda(self):
+        self.assertEqual(
+            _st("fn x () y. x"),
+            ["lambda", ".<ID:x>", ".lambda", "..()", "..lambda"]
+            + ["...<ID:y>", "...<ID:x>"],
+        )
+
+    def test_within(self):
+        self.assertEqual(
+            _st("let a = 1 within b = a in b"),
+            [
+                "gamma",
+                ".lambda",
+                "..<ID:b>",
+                "..<ID:b>",
+                ".gamma",
+                "..lambda",
+                "...<ID:a>",
+                "...<ID:a>",
+                "..<INT:1>",
+            ],
+        )
+
+    def test_rec(self):
+        self.assertEqual(
+            _st("let rec f = f in f"),
+            [
+                "gamma",
+                ".lambda",
+                "..<ID:f>",
+                "..<ID:f>",
+                ".gamma",
+                "..<Y*>",
+                "..lambda",
+                "...<ID:f>",
+                "...<ID:f>",
+            ],
+        )
+
+    def test_and(self):
+        self.assertEqual(
+            _st("let a = 1 and b = 2 and c = 3 in a"),
+            [
+                "gamma",
+                ".lambda",
+                "..,",
+                "...<ID:a>",
+                "...<ID:b>",
+                "...<ID:c>",
+                "..<ID:a>",
+                ".tau",
+                "..<INT:1>",
+                "..<INT:2>",
+                "..<INT:3>",
+            ],
+        )
+
+    def test_at(self):
+        self.assertEqual(
+            _st("a @ f b"),
+            ["gamma", ".gamma", "..<ID:f>", "..<ID:a>", ".<ID:b>"],
+        )
+
+    def test_other_nodes_unchanged(self):
+        code = "a -> not b & c | (-d, e aug f, g ** 2)"
+        self.assertEqual(_st(code), format_tree(parse(code)).split("\n"))
+
+    def test_rewrites_in_place(self):
+        root = parse("let x = 1 in x where y = 2")
+        size = len(root.tree)
+        result = standardize(root)
+        self.assertEqual(result.index, root.index)
+        self.assertEqual(len(root.tree), size)
+
+    def test_deep_nesting(self):
+        depth = 50000
+        root = parse("let x = 1 in " * depth + "x")
+        size = len(root.tree)
+        standardize(root)
+        self.assertEqual(len(root.tree), size)
+        tree = root.tree
+        self.assertEqual(tree.kinds[tree.root], ast.GAMMA)
+        self.assertEqual(tree.kinds[tree.first_child[tree.root]], ast.LAMBDA)
+
+    def test_error(self):
+        tree = parse("let x = 1 in x").tree
+        tree.kinds[tree.first_child[tree.root]] = ast.MINUS
+        with self.assertRaises(StandardizerError):
+            Standardizer(tree).standardize()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE = os.path.join(ROOT, "samples", "factorial.rpal")
+
+# Modules the plain `myrpal.py file.rpal` run must not load once the program
+# is cached: option parsing, the front end, batch mode and heavy optional
+# dependencies
+FORBIDDEN = (
+    "argparse",
+    "src.lexer",
+    "src.parser",
+    "src.standardizer",
+    "src.batch",
+    "concurrent.futures",
+    "tempfile",
+    "numpy",
+    "graphviz",
+)
+
+# Generous bound on the import time of the whole warm path, in microseconds
+IMPORT_BUDGET = 300000
+
+
+def import_times(*args, cache_dir):
+    # module -> cumulative microseconds, from python -X importtime
+    environment = dict(os.environ, RPAL_CACHE_DIR=cache_dir)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join(ROOT, "myrpal.py"), *args],
+        capture_output=True,
+        text=True,
+        env=environment,
+        cwd=ROOT,
+        timeout=60,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:") :].split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = (int(cumulative), len(name) - len(name.lstrip()))
+    return completed, times
+
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_dir = directory.name
+
+    def test_warm_run_imports(self):
+        cold, _ = import_times(SAMPLE, cache_dir=self.cache_dir)
+        self.assertEqual(cold.returncode, 0, cold.stderr)
+        warm, times = import_times(SAMPLE, cache_dir=self.cache_dir)
+        self.assertEqual(warm.returncode, 0, warm.stderr)
+        self.assertEqual(warm.stdout, cold.stdout)
+        self.assertIn("src.cse_machine", times)
+        for module in FORBIDDEN:
+            self.assertNotIn(module, times)
+        # Top-level entries carry the cumulative time of everything below
+        total = sum(time for time, depth in times.values() if depth == 1)
+        self.assertLess(total, IMPORT_BUDGET)
+
+    def test_tree_printing_skips_the_machine(self):
+        completed, times = import_times("-ast", SAMPLE, cache_dir=self.cache_dir)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        self.assertIn("src.parser", times)
+        self.assertNotIn("src.cache", times)
+        self.assertNotIn("src.batch", times)
+
+
+if __name__ == "__main__":
+    unittest.main()